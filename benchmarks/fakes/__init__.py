@@ -0,0 +1,19 @@
+"""
+Local fake Notion and Google Tasks APIs for load testing.
+
+Start both servers and point the app at them with NOTION_API_URL,
+GOOGLE_TASKS_API_URL and a token_uri of <google url>/token:
+
+    python -m benchmarks.fakes --items 1000 --latency 0.05 --rate-limit 3
+"""
+
+from benchmarks.fakes.common import FakeUpstream, FakeUpstreamConfig
+from benchmarks.fakes.google_tasks import FakeGoogleTasksAPI
+from benchmarks.fakes.notion import FakeNotionAPI
+
+__all__ = [
+    "FakeGoogleTasksAPI",
+    "FakeNotionAPI",
+    "FakeUpstream",
+    "FakeUpstreamConfig",
+]
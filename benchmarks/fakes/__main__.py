@@ -0,0 +1,60 @@
+import argparse
+import asyncio
+
+from aiohttp import web
+
+from benchmarks.fakes import FakeGoogleTasksAPI, FakeNotionAPI, FakeUpstreamConfig
+
+
+async def serve(args: argparse.Namespace) -> None:
+    config = FakeUpstreamConfig(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        rate_limit=args.rate_limit,
+        rate_limit_burst=args.rate_limit_burst,
+        error_rate=args.error_rate,
+        token_ttl=args.token_ttl,
+        seed=args.seed,
+    )
+
+    notion = FakeNotionAPI(config)
+    notion.add_database(args.database_id)
+    notion.seed(args.database_id, args.items)
+
+    google_tasks = FakeGoogleTasksAPI(config)
+    google_tasks.add_task_list(args.tasks_list_id)
+    google_tasks.seed(args.tasks_list_id, args.items)
+
+    runners = []
+    for upstream, port in ((notion, args.notion_port), (google_tasks, args.google_port)):
+        runner = web.AppRunner(upstream.create_app())
+        await runner.setup()
+        await web.TCPSite(runner, args.host, port).start()
+        runners.append(runner)
+
+    print(f"NOTION_API_URL=http://{args.host}:{args.notion_port}")
+    print(f"GOOGLE_TASKS_API_URL=http://{args.host}:{args.google_port}")
+    print(f"token_uri=http://{args.host}:{args.google_port}/token")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run fake Notion and Google Tasks APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--notion-port", type=int, default=8081)
+    parser.add_argument("--google-port", type=int, default=8082)
+    parser.add_argument("--database-id", default="fake-database")
+    parser.add_argument("--tasks-list-id", default="fake-tasks-list")
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument("--rate-limit-burst", type=int, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--token-ttl", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    asyncio.run(serve(parser.parse_args()))
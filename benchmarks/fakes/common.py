@@ -0,0 +1,135 @@
+import asyncio
+import datetime
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+from aiohttp import web
+
+
+@dataclass(slots=True)
+class FakeUpstreamConfig:
+    # seconds added to every response, plus uniform random jitter
+    latency: float = 0.0
+    latency_jitter: float = 0.0
+    # requests per second per access token, None disables rate limiting
+    rate_limit: Optional[float] = None
+    rate_limit_burst: int = 10
+    # share of requests answered with 500
+    error_rate: float = 0.0
+    # seconds an access token is valid, None means tokens never expire
+    token_ttl: Optional[float] = None
+    seed: Optional[int] = None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int) -> None:
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take one token. Return 0 on success, else seconds to wait."""
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self._rate
+
+
+class FakeUpstream:
+    """
+    Base of the fake upstream APIs.
+    Adds latency, per token rate limits (429), expiring tokens (401) and
+    injected errors (500) in front of the endpoint handlers, and counts
+    calls per route and status.
+    """
+
+    def __init__(self, config: Optional[FakeUpstreamConfig] = None) -> None:
+        self.config = config or FakeUpstreamConfig()
+        self.calls: Counter = Counter()
+        self._random = random.Random(self.config.seed)
+        self._buckets: dict[str, TokenBucket] = {}
+        self._token_issued_at: dict[str, float] = {}
+
+    def create_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware])
+        self.add_routes(app)
+        return app
+
+    def add_routes(self, app: web.Application) -> None:
+        raise NotImplementedError
+
+    def issue_token(self, token: str) -> None:
+        self._token_issued_at[token] = time.monotonic()
+
+    def reset_stats(self) -> None:
+        self.calls.clear()
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def is_public(self, request: web.Request) -> bool:
+        return False
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler) -> web.StreamResponse:
+        route = request.match_info.route.resource
+        route_name = route.canonical if route is not None else request.path
+        response = await self._handle(request, handler)
+        self.calls[(request.method, route_name, response.status)] += 1
+        return response
+
+    async def _handle(self, request: web.Request, handler) -> web.StreamResponse:
+        config = self.config
+        if config.latency or config.latency_jitter:
+            await asyncio.sleep(
+                config.latency + self._random.uniform(0, config.latency_jitter)
+            )
+
+        if self.is_public(request):
+            return await handler(request)
+
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not token or self._is_expired(token):
+            return web.json_response(
+                {"status": 401, "code": "unauthorized", "message": "Invalid token"},
+                status=401,
+            )
+
+        if config.rate_limit:
+            bucket = self._buckets.setdefault(
+                token, TokenBucket(config.rate_limit, config.rate_limit_burst)
+            )
+            retry_after = bucket.take()
+            if retry_after:
+                return web.json_response(
+                    {"status": 429, "code": "rate_limited", "message": "Slow down"},
+                    status=429,
+                    headers={"Retry-After": str(max(1, round(retry_after)))},
+                )
+
+        if config.error_rate and self._random.random() < config.error_rate:
+            return web.json_response(
+                {"status": 500, "code": "internal_server_error", "message": "Injected"},
+                status=500,
+            )
+
+        return await handler(request)
+
+    def _is_expired(self, token: str) -> bool:
+        if self.config.token_ttl is None:
+            return False
+        issued_at = self._token_issued_at.setdefault(token, time.monotonic())
+        return time.monotonic() - issued_at > self.config.token_ttl
+
+
+def utc_now_iso() -> str:
+    now = datetime.datetime.now(datetime.UTC)
+    return now.isoformat(timespec="milliseconds").replace("+00:00", "Z")
@@ -0,0 +1,209 @@
+import email.parser
+import email.policy
+import json
+from http import HTTPStatus
+from typing import Optional
+from uuid import uuid4
+
+from aiohttp import web
+
+from benchmarks.fakes.common import FakeUpstream, FakeUpstreamConfig, utc_now_iso
+
+DEFAULT_MAX_RESULTS = 20
+MAX_RESULTS = 100
+NOT_FOUND = {"error": {"code": 404, "message": "Not Found", "status": "NOT_FOUND"}}
+
+
+class FakeGoogleTasksAPI(FakeUpstream):
+    """
+    In-memory stand-in for the Google Tasks endpoints used by GTasksList and
+    GTasksProfiler: task lists, tasks with page token pagination, task
+    create, read, update, batch requests and the OAuth refresh token grant.
+    """
+
+    def __init__(self, config: Optional[FakeUpstreamConfig] = None) -> None:
+        super().__init__(config)
+        # tasks list id -> {"title": str, "tasks": {task id -> task}}
+        self.task_lists: dict[str, dict] = {}
+
+    def add_routes(self, app: web.Application) -> None:
+        app.router.add_post("/token", self.refresh_token)
+        app.router.add_get("/tasks/v1/users/@me/lists/", self.get_task_lists)
+        app.router.add_get("/tasks/v1/lists/{list_id}/tasks", self.get_tasks)
+        app.router.add_post("/tasks/v1/lists/{list_id}/tasks", self.create_task)
+        app.router.add_get("/tasks/v1/lists/{list_id}/tasks/{task_id}", self.get_task)
+        app.router.add_put(
+            "/tasks/v1/lists/{list_id}/tasks/{task_id}", self.update_task
+        )
+        app.router.add_patch(
+            "/tasks/v1/lists/{list_id}/tasks/{task_id}", self.update_task
+        )
+        app.router.add_post("/batch/tasks/v1", self.batch)
+
+    def is_public(self, request: web.Request) -> bool:
+        return request.path == "/token"
+
+    def add_task_list(self, list_id: str, title: str = "Tasks") -> None:
+        self.task_lists.setdefault(list_id, {"title": title, "tasks": {}})
+
+    def add_task(self, list_id: str, title: str, completed: bool = False) -> dict:
+        self.add_task_list(list_id)
+        task = {
+            "kind": "tasks#task",
+            "id": str(uuid4()),
+            "title": title,
+            "status": "completed" if completed else "needsAction",
+            "updated": utc_now_iso(),
+        }
+        self.task_lists[list_id]["tasks"][task["id"]] = task
+        return task
+
+    def seed(self, list_id: str, count: int, prefix: str = "Task") -> None:
+        for number in range(count):
+            self.add_task(list_id, f"{prefix} {number}")
+
+    def touch(self, list_id: str, count: int, start: int = 0) -> None:
+        """Complete or reopen `count` tasks as a user would, bumping updated."""
+        tasks = list(self.task_lists[list_id]["tasks"].values())
+        for task in tasks[start : start + count]:
+            task["status"] = (
+                "needsAction" if task["status"] == "completed" else "completed"
+            )
+            task["updated"] = utc_now_iso()
+
+    async def refresh_token(self, request: web.Request) -> web.Response:
+        data = await request.post()
+        if data.get("grant_type") != "refresh_token" or not data.get("refresh_token"):
+            return web.json_response({"error": "invalid_grant"}, status=400)
+
+        token = f"fake-{uuid4()}"
+        self.issue_token(token)
+        return web.json_response(
+            {
+                "access_token": token,
+                "expires_in": int(self.config.token_ttl or 3600),
+                "token_type": "Bearer",
+            }
+        )
+
+    async def get_task_lists(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "kind": "tasks#taskLists",
+                "items": [
+                    {"kind": "tasks#taskList", "id": list_id, "title": task_list["title"]}
+                    for list_id, task_list in self.task_lists.items()
+                ],
+            }
+        )
+
+    async def get_tasks(self, request: web.Request) -> web.Response:
+        task_list = self.task_lists.get(request.match_info["list_id"])
+        if task_list is None:
+            return self._not_found()
+
+        max_results = min(
+            int(request.query.get("maxResults", DEFAULT_MAX_RESULTS)), MAX_RESULTS
+        )
+        start = int(request.query.get("pageToken") or 0)
+
+        tasks = list(task_list["tasks"].values())
+        if request.query.get("showCompleted") == "false":
+            tasks = [task for task in tasks if task["status"] != "completed"]
+
+        data = {"kind": "tasks#tasks", "items": tasks[start : start + max_results]}
+        if start + max_results < len(tasks):
+            data["nextPageToken"] = str(start + max_results)
+        return web.json_response(data)
+
+    async def create_task(self, request: web.Request) -> web.Response:
+        status, data = self._create_task(
+            request.match_info["list_id"], await request.json()
+        )
+        return web.json_response(data, status=status)
+
+    async def get_task(self, request: web.Request) -> web.Response:
+        task = self._find_task(request)
+        if task is None:
+            return self._not_found()
+        return web.json_response(task)
+
+    async def update_task(self, request: web.Request) -> web.Response:
+        status, data = self._update_task(
+            request.match_info["list_id"],
+            request.match_info["task_id"],
+            await request.json(),
+        )
+        return web.json_response(data, status=status)
+
+    async def batch(self, request: web.Request) -> web.Response:
+        """multipart/mixed batch of task creates and updates."""
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            f"Content-Type: {request.headers['Content-Type']}\r\n\r\n".encode()
+            + await request.read()
+        )
+
+        boundary = f"batch_{uuid4().hex}"
+        lines = []
+        for part in message.iter_parts():
+            head, _, body = (
+                part.get_payload(decode=True)
+                .decode()
+                .replace("\r\n", "\n")
+                .partition("\n\n")
+            )
+            method, path = head.split("\n", 1)[0].split()[:2]
+            status, data = self._dispatch(method, path, json.loads(body or "{}"))
+            content_id = part.get("Content-ID", "").strip("<>")
+            lines += [
+                f"--{boundary}",
+                "Content-Type: application/http",
+                f"Content-ID: <response-{content_id}>",
+                "",
+                f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+                "Content-Type: application/json",
+                "",
+                json.dumps(data),
+            ]
+        lines += [f"--{boundary}--", ""]
+        return web.Response(
+            body="\r\n".join(lines).encode(),
+            headers={"Content-Type": f"multipart/mixed; boundary={boundary}"},
+        )
+
+    def _dispatch(self, method: str, path: str, body: dict) -> tuple[int, dict]:
+        # /tasks/v1/lists/{list_id}/tasks[/{task_id}]
+        segments = path.split("?", 1)[0].strip("/").split("/")
+        if method == "POST" and len(segments) == 5:
+            return self._create_task(segments[3], body)
+        if method in ("PATCH", "PUT") and len(segments) == 6:
+            return self._update_task(segments[3], segments[5], body)
+        return 400, {"error": {"code": 400, "message": "Unsupported batch part"}}
+
+    def _create_task(self, list_id: str, body: dict) -> tuple[int, dict]:
+        if list_id not in self.task_lists:
+            return 404, NOT_FOUND
+        task = self.add_task(
+            list_id, body.get("title", ""), body.get("status") == "completed"
+        )
+        return 200, task
+
+    def _update_task(self, list_id: str, task_id: str, body: dict) -> tuple[int, dict]:
+        task = self.task_lists.get(list_id, {}).get("tasks", {}).get(task_id)
+        if task is None:
+            return 404, NOT_FOUND
+
+        for field in ("title", "status", "notes", "due"):
+            if field in body:
+                task[field] = body[field]
+        task["updated"] = utc_now_iso()
+        return 200, task
+
+    def _find_task(self, request: web.Request) -> Optional[dict]:
+        task_list = self.task_lists.get(request.match_info["list_id"])
+        if task_list is None:
+            return None
+        return task_list["tasks"].get(request.match_info["task_id"])
+
+    def _not_found(self) -> web.Response:
+        return web.json_response(NOT_FOUND, status=404)
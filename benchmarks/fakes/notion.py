@@ -0,0 +1,152 @@
+from typing import Optional
+from uuid import uuid4
+
+from aiohttp import web
+
+from benchmarks.fakes.common import FakeUpstream, FakeUpstreamConfig, utc_now_iso
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 100
+
+
+class FakeNotionAPI(FakeUpstream):
+    """
+    In-memory stand-in for the Notion endpoints used by NotionDB and
+    NotionProfiler: database query with cursor pagination, page create,
+    read and update, and database search.
+    """
+
+    def __init__(
+        self,
+        config: Optional[FakeUpstreamConfig] = None,
+        title_prop_name: str = "Name",
+    ) -> None:
+        super().__init__(config)
+        self.title_prop_name = title_prop_name
+        # database id -> {"title": str, "pages": {page id -> page}}
+        self.databases: dict[str, dict] = {}
+
+    def add_routes(self, app: web.Application) -> None:
+        app.router.add_post("/v1/databases/{database_id}/query", self.query_database)
+        app.router.add_post("/v1/pages", self.create_page)
+        app.router.add_get("/v1/pages/{page_id}", self.get_page)
+        app.router.add_patch("/v1/pages/{page_id}", self.update_page)
+        app.router.add_post("/v1/search", self.search)
+
+    def add_database(self, database_id: str, title: str = "External tasks") -> None:
+        self.databases.setdefault(database_id, {"title": title, "pages": {}})
+
+    def add_page(self, database_id: str, name: str, checked: bool = False) -> dict:
+        self.add_database(database_id)
+        page = {
+            "object": "page",
+            "id": str(uuid4()),
+            "parent": {"type": "database_id", "database_id": database_id},
+            "last_edited_time": utc_now_iso(),
+            "properties": self._properties(name, checked),
+        }
+        self.databases[database_id]["pages"][page["id"]] = page
+        return page
+
+    def seed(self, database_id: str, count: int, prefix: str = "Task") -> None:
+        for number in range(count):
+            self.add_page(database_id, f"{prefix} {number}")
+
+    def touch(self, database_id: str, count: int, start: int = 0) -> None:
+        """Edit `count` pages as a user would, bumping last_edited_time."""
+        pages = list(self.databases[database_id]["pages"].values())
+        for page in pages[start : start + count]:
+            checkbox = page["properties"]["Checkbox"]
+            checkbox["checkbox"] = not checkbox["checkbox"]
+            page["last_edited_time"] = utc_now_iso()
+
+    async def query_database(self, request: web.Request) -> web.Response:
+        database = self.databases.get(request.match_info["database_id"])
+        if database is None:
+            return self._not_found("database")
+
+        body = await request.json() if request.can_read_body else {}
+        page_size = min(body.get("page_size", DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE)
+        start = int(body.get("start_cursor") or 0)
+
+        pages = list(database["pages"].values())
+        results = pages[start : start + page_size]
+        has_more = start + page_size < len(pages)
+        return web.json_response(
+            {
+                "object": "list",
+                "results": results,
+                "has_more": has_more,
+                "next_cursor": str(start + page_size) if has_more else None,
+            }
+        )
+
+    async def create_page(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        database_id = body.get("parent", {}).get("database_id")
+        if database_id not in self.databases:
+            return self._not_found("database")
+
+        page = {
+            "object": "page",
+            "id": str(uuid4()),
+            "parent": {"type": "database_id", "database_id": database_id},
+            "last_edited_time": utc_now_iso(),
+            "properties": body.get("properties", {}),
+        }
+        self.databases[database_id]["pages"][page["id"]] = page
+        return web.json_response(page)
+
+    async def get_page(self, request: web.Request) -> web.Response:
+        page = self._find_page(request.match_info["page_id"])
+        if page is None:
+            return self._not_found("page")
+        return web.json_response(page)
+
+    async def update_page(self, request: web.Request) -> web.Response:
+        page = self._find_page(request.match_info["page_id"])
+        if page is None:
+            return self._not_found("page")
+
+        body = await request.json()
+        page["properties"].update(body.get("properties", {}))
+        page["last_edited_time"] = utc_now_iso()
+        return web.json_response(page)
+
+    async def search(self, request: web.Request) -> web.Response:
+        results = [
+            {
+                "object": "database",
+                "id": database_id,
+                "title": [{"plain_text": database["title"]}],
+            }
+            for database_id, database in self.databases.items()
+        ]
+        return web.json_response(
+            {"object": "list", "results": results, "has_more": False}
+        )
+
+    def _find_page(self, page_id: str) -> Optional[dict]:
+        for database in self.databases.values():
+            if page_id in database["pages"]:
+                return database["pages"][page_id]
+        return None
+
+    def _properties(self, name: str, checked: bool) -> dict:
+        return {
+            "Checkbox": {"checkbox": checked},
+            self.title_prop_name: {
+                "title": [{"text": {"content": name}, "plain_text": name}]
+            },
+        }
+
+    def _not_found(self, object_name: str) -> web.Response:
+        return web.json_response(
+            {
+                "object": "error",
+                "status": 404,
+                "code": "object_not_found",
+                "message": f"Could not find {object_name}",
+            },
+            status=404,
+        )
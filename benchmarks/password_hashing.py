@@ -0,0 +1,73 @@
+"""
+Event loop lag under concurrent logins.
+
+Runs a burst of password verifications while a ticker coroutine measures how
+late it wakes up. Compare the blocking ``verify_password`` with the
+thread pool backed ``verify_password_async``:
+
+    SALT=salt python -m benchmarks.password_hashing --logins 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from utils.crypt_utils import create_password, verify_password, verify_password_async
+
+TICK_INTERVAL = 0.005
+
+
+async def _measure_lag(stop: asyncio.Event) -> list[float]:
+    lags = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_INTERVAL)
+        lags.append(time.perf_counter() - started - TICK_INTERVAL)
+    return lags
+
+
+async def _blocking_login(password: str, hashed_password: str) -> bool:
+    return verify_password(password, hashed_password)
+
+
+async def _run(login, logins: int, hashed_password: str) -> dict:
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_measure_lag(stop))
+    await asyncio.sleep(TICK_INTERVAL)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login("password", hashed_password) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    lags = await ticker
+    lags.sort()
+    return {
+        "total_s": elapsed,
+        "max_lag_ms": lags[-1] * 1000,
+        "p99_lag_ms": lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000,
+        "mean_lag_ms": statistics.mean(lags) * 1000,
+    }
+
+
+async def main(logins: int) -> None:
+    hashed_password = create_password("password")
+    for name, login in (
+        ("blocking", _blocking_login),
+        ("executor", verify_password_async),
+    ):
+        result = await _run(login, logins, hashed_password)
+        print(
+            f"{name:>9}: {logins} logins in {result['total_s']:.2f}s, "
+            f"loop lag max {result['max_lag_ms']:.1f}ms "
+            f"p99 {result['p99_lag_ms']:.1f}ms "
+            f"mean {result['mean_lag_ms']:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins))
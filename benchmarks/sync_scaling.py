@@ -0,0 +1,358 @@
+"""
+End-to-end benchmark of NotionTasksSynchronizer cycles.
+
+Runs real sync cycles against the in-process fake upstream servers
+(benchmarks.fakes) and a database of your choice, sweeping item and tenant
+counts. The first cycle of every tenant is the initial sync, following
+`--cycles` cycles run with `--change-rate` of items edited on both sides
+before each one.
+
+    SALT=salt SQLALCHEMY_DATABASE_URL=sqlite+aiosqlite:///bench.db \\
+        python -m benchmarks.sync_scaling --items 100 1000 --tenants 1 10 \\
+        --output results.json --compare baseline.json
+
+Results are written as JSON, `--compare` prints the change against a
+previous run and exits with 1 when p99 cycle latency regressed more than
+`--max-regression`.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass
+from uuid import uuid4
+
+from aiohttp import web
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from benchmarks.fakes import FakeGoogleTasksAPI, FakeNotionAPI, FakeUpstreamConfig
+from config import SQLALCHEMY_DATABASE_URL
+from models.models import BaseModel, SyncingService, User
+from services.google_tasks.google_tasks import GTasksList
+from services.notion.notion_db import NotionDB
+from synchronizers.notion_tasks_synchronizer import NotionTasksSynchronizer
+
+
+@dataclass(slots=True)
+class ScenarioResult:
+    items: int
+    tenants: int
+    change_rate: float
+    cycles: int
+    initial_p50: float
+    initial_p99: float
+    cycle_p50: float
+    cycle_p99: float
+    upstream_calls_per_cycle: float
+    sql_queries_per_cycle: float
+    max_rss_mb: float
+
+
+def percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+def max_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return max_rss / 1024 / 1024
+    return max_rss / 1024
+
+
+class QueryCounter:
+    def __init__(self, engine: AsyncEngine) -> None:
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args, **kwargs) -> None:
+        self.count += 1
+
+
+class Upstreams:
+    """Fake servers running in this process, with service classes pointed at them."""
+
+    def __init__(self, config: FakeUpstreamConfig) -> None:
+        self.notion = FakeNotionAPI(config)
+        self.google_tasks = FakeGoogleTasksAPI(config)
+        self._runners: list[web.AppRunner] = []
+        self.google_url = ""
+
+    async def start(self) -> None:
+        notion_url = await self._serve(self.notion)
+        self.google_url = await self._serve(self.google_tasks)
+
+        NotionDB.DATABASE_URL_FORMAT = notion_url + "/v1/databases/{}/query"
+        NotionDB.CREATE_PAGE_URL = notion_url + "/v1/pages"
+        NotionDB.PAGE_URL_FORMAT = notion_url + "/v1/pages/{}"
+        GTasksList.GOOGLE_TASKS_GET_ALL_URL = (
+            self.google_url
+            + "/tasks/v1/lists/{}/tasks?showCompleted=true&showHidden=true"
+        )
+        GTasksList.GOOGLE_TASKS_UPDATE_URL = (
+            self.google_url + "/tasks/v1/lists/{}/tasks/{}"
+        )
+        GTasksList.GOOGLE_TASKS_ADD_URL = self.google_url + "/tasks/v1/lists/{}/tasks"
+        GTasksList.GOOGLE_TASKS_BATCH_URL = self.google_url + "/batch/tasks/v1"
+
+    async def stop(self) -> None:
+        for runner in self._runners:
+            await runner.cleanup()
+
+    @property
+    def total_calls(self) -> int:
+        return self.notion.total_calls + self.google_tasks.total_calls
+
+    async def _serve(self, upstream) -> str:
+        runner = web.AppRunner(upstream.create_app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        self._runners.append(runner)
+        host, port = runner.addresses[0][:2]
+        return f"http://{host}:{port}"
+
+
+class Tenant:
+    def __init__(self, syncing_service_id: str, session, upstreams: Upstreams) -> None:
+        self.syncing_service_id = syncing_service_id
+        self.database_id = f"database-{syncing_service_id}"
+        self.tasks_list_id = f"tasks-list-{syncing_service_id}"
+        self.session = session
+
+        notion_db = NotionDB(
+            syncing_service_id=syncing_service_id,
+            database_id=self.database_id,
+            token=f"notion-{syncing_service_id}",
+            title_prop_name="Name",
+            db=session,
+        )
+        google_tasks = GTasksList(
+            syncing_service_id=syncing_service_id,
+            client_config={
+                "tasks_list_id": self.tasks_list_id,
+                "token": f"google-{syncing_service_id}",
+                "token_uri": upstreams.google_url + "/token",
+                "client_id": "client_id",
+                "client_secret": "client_secret",
+                "refresh_token": f"refresh-{syncing_service_id}",
+            },
+            db=session,
+        )
+        self.services = (notion_db, google_tasks)
+        self.synchronizer = NotionTasksSynchronizer(notion_db, google_tasks, session)
+
+    async def cycle(self) -> float:
+        started = time.perf_counter()
+        notion_rows, google_tasks_list = await self.synchronizer.fetch()
+        await self.synchronizer.apply(
+            self.synchronizer.diff(notion_rows, google_tasks_list)
+        )
+        return time.perf_counter() - started
+
+    async def close(self) -> None:
+        for service in self.services:
+            await service._session.close()
+        await self.session.close()
+
+
+async def create_tenants(
+    sessionmaker, upstreams: Upstreams, count: int, items: int
+) -> list[Tenant]:
+    tenants = []
+    async with sessionmaker() as session:
+        for _ in range(count):
+            # rows are added directly, User.save would hash a password per tenant
+            user = User(id=str(uuid4()), email=f"{uuid4()}@bench", password="-")
+            service = SyncingService(id=str(uuid4()), user_id=user.id, ready=True)
+            session.add_all([user, service])
+            tenants.append(service.id)
+        await session.commit()
+
+    result = []
+    for syncing_service_id in tenants:
+        tenant = Tenant(syncing_service_id, sessionmaker(), upstreams)
+        upstreams.notion.add_database(tenant.database_id)
+        upstreams.notion.seed(tenant.database_id, items)
+        upstreams.google_tasks.add_task_list(tenant.tasks_list_id)
+        result.append(tenant)
+    return result
+
+
+async def run_cycles(tenants: list[Tenant], concurrency: int) -> list[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def cycle(tenant: Tenant) -> float:
+        async with semaphore:
+            return await tenant.cycle()
+
+    return list(await asyncio.gather(*(cycle(tenant) for tenant in tenants)))
+
+
+async def run_scenario(
+    engine: AsyncEngine,
+    items: int,
+    tenants_count: int,
+    args: argparse.Namespace,
+) -> ScenarioResult:
+    sessionmaker = async_sessionmaker(
+        bind=engine, autoflush=False, expire_on_commit=False
+    )
+    upstreams = Upstreams(
+        FakeUpstreamConfig(latency=args.latency, error_rate=args.error_rate, seed=1)
+    )
+    await upstreams.start()
+    queries = QueryCounter(engine)
+    tenants = await create_tenants(sessionmaker, upstreams, tenants_count, items)
+
+    try:
+        initial = await run_cycles(tenants, args.concurrency)
+
+        upstream_calls = upstreams.total_calls
+        sql_queries = queries.count
+        latencies = []
+        changed = max(1, int(items * args.change_rate)) if args.change_rate else 0
+        for _ in range(args.cycles):
+            for tenant in tenants:
+                if changed:
+                    upstreams.notion.touch(tenant.database_id, changed)
+                    # edit other items than on notion side
+                    upstreams.google_tasks.touch(
+                        tenant.tasks_list_id, changed, start=items // 2
+                    )
+            latencies.extend(await run_cycles(tenants, args.concurrency))
+
+        cycles = max(1, args.cycles * tenants_count)
+        return ScenarioResult(
+            items=items,
+            tenants=tenants_count,
+            change_rate=args.change_rate,
+            cycles=args.cycles,
+            initial_p50=percentile(initial, 50),
+            initial_p99=percentile(initial, 99),
+            cycle_p50=percentile(latencies, 50),
+            cycle_p99=percentile(latencies, 99),
+            upstream_calls_per_cycle=(upstreams.total_calls - upstream_calls) / cycles,
+            sql_queries_per_cycle=(queries.count - sql_queries) / cycles,
+            max_rss_mb=max_rss_mb(),
+        )
+    finally:
+        for tenant in tenants:
+            await tenant.close()
+        await upstreams.stop()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: list[dict], baseline: dict, max_regression: float) -> bool:
+    """Print change against baseline, return False on p99 regression."""
+    baseline_results = {
+        (result["items"], result["tenants"]): result for result in baseline["results"]
+    }
+    ok = True
+    print(f"\ncompared with {baseline.get('commit', 'unknown')}:")
+    for result in results:
+        previous = baseline_results.get((result["items"], result["tenants"]))
+        if not previous:
+            continue
+        for metric in ("cycle_p99", "upstream_calls_per_cycle", "sql_queries_per_cycle"):
+            if not previous[metric]:
+                continue
+            change = (result[metric] - previous[metric]) / previous[metric]
+            print(
+                f"  items={result['items']:>6} tenants={result['tenants']:>5} "
+                f"{metric:<25} {previous[metric]:>10.3f} -> "
+                f"{result[metric]:>10.3f} ({change:+.1%})"
+            )
+            if metric == "cycle_p99" and change > max_regression:
+                ok = False
+    return ok
+
+
+async def main(args: argparse.Namespace) -> int:
+    engine = create_async_engine(args.database_url, poolclass=NullPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(BaseModel.metadata.drop_all)
+        await conn.run_sync(BaseModel.metadata.create_all)
+
+    results = []
+    try:
+        for tenants in args.tenants:
+            for items in args.items:
+                result = await run_scenario(engine, items, tenants, args)
+                results.append(asdict(result))
+                print(
+                    f"items={items:>6} tenants={tenants:>5} "
+                    f"initial p50={result.initial_p50:.3f}s "
+                    f"cycle p50={result.cycle_p50:.3f}s p99={result.cycle_p99:.3f}s "
+                    f"upstream/cycle={result.upstream_calls_per_cycle:.1f} "
+                    f"sql/cycle={result.sql_queries_per_cycle:.1f} "
+                    f"rss={result.max_rss_mb:.0f}MB"
+                )
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(BaseModel.metadata.drop_all)
+        await engine.dispose()
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.datetime.now(datetime.UTC).isoformat(),
+        "python": platform.python_version(),
+        "database": engine.dialect.name,
+        "parameters": {
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "change_rate": args.change_rate,
+            "cycles": args.cycles,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            if not compare(results, json.load(file), args.max_regression):
+                return 1
+    return 0
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark sync cycles")
+    parser.add_argument("--items", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--tenants", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--change-rate", type=float, default=0.01)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--database-url", default=SQLALCHEMY_DATABASE_URL)
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -9,6 +9,14 @@ GOOGLE_CLIENT_SECRET_FILE = os.getenv("GOOGLE_CLIENT_SECRET_FILE")
 GOOGLE_API_SCOPES = os.getenv("GOOGLE_API_SCOPES")
 NOTION_TITLE_PROP_NAME = os.getenv("NOTION_TITLE_PROP_NAME")
 NOTION_VERSION = os.getenv("NOTION_VERSION") or "2022-02-22"
+NOTION_API_URL = os.getenv("NOTION_API_URL") or "https://api.notion.com"
+GOOGLE_TASKS_API_URL = os.getenv("GOOGLE_TASKS_API_URL") or "https://tasks.googleapis.com"
+# Google API batch requests take at most 1000 parts, keep them smaller
+GOOGLE_TASKS_BATCH_SIZE = int(os.getenv("GOOGLE_TASKS_BATCH_SIZE") or 100)
+# parts of a batch which failed on their own are retried one by one
+GOOGLE_TASKS_RETRY_CONCURRENCY = int(
+    os.getenv("GOOGLE_TASKS_RETRY_CONCURRENCY") or 4
+)
 
 SQLALCHEMY_DATABASE_URL = os.getenv("SQLALCHEMY_DATABASE_URL")
 SQLALCHEMY_TEST_DATABASE_URL = os.getenv("SQLALCHEMY_TEST_DATABASE_URL")
@@ -18,11 +26,82 @@ FRONT_END_HOST = os.getenv("FRONT_END_HOST")
 ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES") or 90
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM") or "HS256"
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL") or 30)
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE") or 10000)
 SALT = os.getenv("SALT").encode("utf-8")
 ENCODING_ITERATIONS = os.getenv("ENCODING_ITERATIONS") or 100000
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS") or 4)
+PASSWORD_HASH_MAX_CONCURRENCY = int(os.getenv("PASSWORD_HASH_MAX_CONCURRENCY") or 8)
 
-SYNC_WAIT_TIME = os.getenv("SYNC_WAIT_TIME") or 10
+SYNC_WAIT_TIME = float(os.getenv("SYNC_WAIT_TIME") or 10)
+SYNC_SAFETY_NET_TIME = int(os.getenv("SYNC_SAFETY_NET_TIME") or 300)
+WEBHOOK_COALESCE_TIME = float(os.getenv("WEBHOOK_COALESCE_TIME") or 1)
+WEBHOOK_DEDUPE_TTL = int(os.getenv("WEBHOOK_DEDUPE_TTL") or 3600)
+NOTION_WEBHOOK_VERIFICATION_TOKEN = os.getenv("NOTION_WEBHOOK_VERIFICATION_TOKEN")
+GOOGLE_CHANNEL_SECRET = os.getenv("GOOGLE_CHANNEL_SECRET") or SECRET_KEY
+# pub/sub channel relaying webhook triggers to the process syncing the service
+SYNC_TRIGGER_CHANNEL = os.getenv("SYNC_TRIGGER_CHANNEL") or "sync_triggers"
+SYNC_PIPELINE_ENABLED = os.getenv("SYNC_PIPELINE_ENABLED") == "True"
+SYNC_STREAM_PREFIX = os.getenv("SYNC_STREAM_PREFIX") or "sync"
+SYNC_STREAM_MAXLEN = int(os.getenv("SYNC_STREAM_MAXLEN") or 10000)
+SYNC_STREAM_BLOCK_MS = int(os.getenv("SYNC_STREAM_BLOCK_MS") or 1000)
+SYNC_STREAM_CLAIM_IDLE_MS = int(os.getenv("SYNC_STREAM_CLAIM_IDLE_MS") or 60000)
+# messages failing this many deliveries are acked and dropped
+SYNC_STREAM_MAX_DELIVERIES = int(os.getenv("SYNC_STREAM_MAX_DELIVERIES") or 5)
+SYNC_FETCH_CONCURRENCY = int(os.getenv("SYNC_FETCH_CONCURRENCY") or 4)
+SYNC_DIFF_CONCURRENCY = int(os.getenv("SYNC_DIFF_CONCURRENCY") or 2)
+SYNC_APPLY_CONCURRENCY = int(os.getenv("SYNC_APPLY_CONCURRENCY") or 8)
+SYNC_CYCLE_TTL = int(os.getenv("SYNC_CYCLE_TTL") or 300)
+# a cycle stops fetching pages and starting write batches once it spent
+# this many seconds or items, the rest continues in the next cycle
+SYNC_CYCLE_TIME_BUDGET = float(os.getenv("SYNC_CYCLE_TIME_BUDGET") or 30)
+SYNC_CYCLE_ITEM_BUDGET = int(os.getenv("SYNC_CYCLE_ITEM_BUDGET") or 5000)
+# cycles running at once in this process, and per syncing service
+SYNC_WORKERS = int(os.getenv("SYNC_WORKERS") or 16)
+SYNC_TENANT_CONCURRENCY = int(os.getenv("SYNC_TENANT_CONCURRENCY") or 1)
+# delay after a failed cycle, doubled per consecutive failure up to the max
+SYNC_BACKOFF_BASE = float(os.getenv("SYNC_BACKOFF_BASE") or 10)
+SYNC_BACKOFF_MAX = float(os.getenv("SYNC_BACKOFF_MAX") or 3600)
+# the watchdog checks sync loops every interval and restarts those whose
+# heartbeat is overdue by more than the grace time
+SYNC_WATCHDOG_INTERVAL = float(os.getenv("SYNC_WATCHDOG_INTERVAL") or 30)
+SYNC_WATCHDOG_GRACE = float(os.getenv("SYNC_WATCHDOG_GRACE") or 120)
+# /health/ready fails while the scheduler lags behind more than this
+SYNC_READY_MAX_LAG = float(os.getenv("SYNC_READY_MAX_LAG") or 30)
+# over cycles started in the last this many seconds
+SYNC_READY_LAG_WINDOW = float(os.getenv("SYNC_READY_LAG_WINDOW") or 300)
+# sync loops restarted at boot are loaded in pages, start their first cycle
+# at a random point of the window and run at most this many first cycles at once
+SYNC_WARMUP_PAGE_SIZE = int(os.getenv("SYNC_WARMUP_PAGE_SIZE") or 100)
+SYNC_WARMUP_WINDOW = float(os.getenv("SYNC_WARMUP_WINDOW") or 60)
+SYNC_WARMUP_CONCURRENCY = int(os.getenv("SYNC_WARMUP_CONCURRENCY") or 4)
+SYNC_OUTBOX_BATCH_SIZE = int(os.getenv("SYNC_OUTBOX_BATCH_SIZE") or 500)
+# planned writes failing this many times are moved to the dead-letter store
+SYNC_OUTBOX_MAX_ATTEMPTS = int(os.getenv("SYNC_OUTBOX_MAX_ATTEMPTS") or 5)
+PROFILERS_TIMEOUT = float(os.getenv("PROFILERS_TIMEOUT") or 5)
+AVAILABLE_LISTS_CACHE_TTL = int(os.getenv("AVAILABLE_LISTS_CACHE_TTL") or 300)
+AVAILABLE_LISTS_STALE_TTL = int(os.getenv("AVAILABLE_LISTS_STALE_TTL") or 3600)
+AVAILABLE_LISTS_CACHE_SIZE = int(os.getenv("AVAILABLE_LISTS_CACHE_SIZE") or 1024)
+# in-process copies are kept this long, other processes' invalidations
+# are seen at most this late
+AVAILABLE_LISTS_LOCAL_TTL = float(os.getenv("AVAILABLE_LISTS_LOCAL_TTL") or 5)
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS") or 50)
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL") or 30)
+REDIS_RETRIES = int(os.getenv("REDIS_RETRIES") or 3)
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_JSON = os.getenv("LOG_JSON") == "True"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE") or 10000)
+# records tagged with syncing_service_id, per service and call site
+LOG_SAMPLE_LIMIT = int(os.getenv("LOG_SAMPLE_LIMIT") or 10)
+LOG_SAMPLE_WINDOW = float(os.getenv("LOG_SAMPLE_WINDOW") or 60)
+
+# "" disables tracing, "file" writes spans to TRACING_FILE, "memory" keeps
+# them in process, anything else is an import path of a SpanExporter class
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "")
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE") or 0.1)
 
 TESTING = os.getenv("TESTING") == "True"
@@ -1,18 +1,148 @@
+import atexit
+import json
 import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
 
+from cachetools import TTLCache
+
+from config import (
+    LOG_JSON,
+    LOG_LEVEL,
+    LOG_QUEUE_SIZE,
+    LOG_SAMPLE_LIMIT,
+    LOG_SAMPLE_WINDOW,
+)
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# attributes every LogRecord has, anything else was passed in `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_setup_lock = threading.Lock()
+_listener: QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "name": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        data.update(
+            {
+                key: value
+                for key, value in vars(record).items()
+                if key not in _RECORD_ATTRIBUTES
+            }
+        )
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+class TenantSamplingFilter(logging.Filter):
+    """
+    Let through at most `limit` records per `window` seconds for every
+    syncing service and call site. Records without syncing_service_id
+    always pass. The first record of the next window tells how many were
+    dropped.
+    """
+
+    def __init__(self, limit: int, window: float, maxsize: int = 100_000) -> None:
+        super().__init__()
+        self._limit = limit
+        self._window = window
+        self._lock = threading.Lock()
+        # (syncing service id, path, line) -> [window start, passed, dropped]
+        self._counters: TTLCache = TTLCache(maxsize=maxsize, ttl=window * 2)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        syncing_service_id = getattr(record, "syncing_service_id", None)
+        if syncing_service_id is None or self._limit <= 0:
+            return True
+
+        key = (syncing_service_id, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None or now - counter[0] >= self._window:
+                dropped = counter[2] if counter else 0
+                self._counters[key] = [now, 1, 0]
+            elif counter[1] < self._limit:
+                counter[1] += 1
+                dropped = 0
+            else:
+                counter[2] += 1
+                return False
+
+        if dropped:
+            record.msg = f"{record.getMessage()} ({dropped} similar messages dropped)"
+            record.args = None
+        return True
 
-def get_logger(name):
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
 
-    ch = logging.StreamHandler()
-    ch.setLevel(logging.DEBUG)
+class _DroppingQueueHandler(QueueHandler):
+    """Drop records instead of blocking when the logging thread falls behind."""
 
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    ch.setFormatter(formatter)
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
 
-    logger.addHandler(ch)
 
-    return logger
+def setup_logging() -> None:
+    """
+    Route all records through a queue to a handler running in its own
+    thread, so logging never blocks the event loop. Safe to call many times.
+    """
+    global _listener
+
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        handler = logging.StreamHandler()
+        handler.setFormatter(
+            JsonFormatter() if LOG_JSON else logging.Formatter(TEXT_FORMAT)
+        )
+
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        queue_handler = _DroppingQueueHandler(log_queue)
+        queue_handler.addFilter(
+            TenantSamplingFilter(LOG_SAMPLE_LIMIT, LOG_SAMPLE_WINDOW)
+        )
+
+        root = logging.getLogger()
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(queue_handler)
+
+        _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the logging thread."""
+    global _listener
+
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener = None
+
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            if isinstance(handler, _DroppingQueueHandler):
+                root.removeHandler(handler)
+
+
+def get_logger(name):
+    setup_logging()
+    return logging.getLogger(name)
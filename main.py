@@ -4,18 +4,35 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse
 
-from config import FRONT_END_HOST, TESTING
+from config import FRONT_END_HOST, SYNC_PIPELINE_ENABLED, TESTING
 from logger import get_logger
 from models.models import create_all_tables
+from redis_client import RedisClient
+from utils.metrics import metrics_middleware
+from utils.tracing import tracer
 
 
 async def lifespan(the_app):
     logger.info("Starting application")
+    warm_up = None
     if not TESTING:
         await create_all_tables()
-        await restart_sync()
+        if SYNC_PIPELINE_ENABLED:
+            await sync_pipeline.start()
+        # sync loops restart in the background, the API is ready meanwhile
+        warm_up = asyncio.create_task(restart_sync())
+        sync_watchdog.start()
+        sync_triggers.start()
     yield
     logger.info("Shutting down application")
+    if warm_up is not None:
+        warm_up.cancel()
+    await sync_watchdog.stop()
+    await sync_triggers.stop()
+    if SYNC_PIPELINE_ENABLED and not TESTING:
+        await sync_pipeline.stop()
+    await RedisClient.close_all()
+    tracer.set_exporter(None)
 
 
 app = FastAPI(lifespan=lifespan)
@@ -25,15 +42,23 @@ redirect_to_home = RedirectResponse(FRONT_END_HOST)
 
 
 from routes.google_auth import router as google_auth_router
+from routes.health import router as health_router
+from routes.metrics import router as metrics_router
 from routes.notion_auth import router as notion_auth_router
-from routes.sync import restart_sync
+from routes.sync import restart_sync, sync_pipeline
 from routes.sync import router as sync_router
 from routes.user import router as user_router
+from routes.webhooks import router as webhooks_router
+from synchronizers.triggers import sync_triggers
+from synchronizers.watchdog import sync_watchdog
 
 app.include_router(notion_auth_router, prefix="/notion")
 app.include_router(google_auth_router, prefix="/google_tasks")
 app.include_router(sync_router, prefix="/sync")
 app.include_router(user_router, prefix="/user")
+app.include_router(webhooks_router, prefix="/webhooks")
+app.include_router(metrics_router, prefix="/metrics")
+app.include_router(health_router, prefix="/health")
 
 origins = [
     "http://localhost",
@@ -47,6 +72,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.middleware("http")(metrics_middleware)
 
 
 if __name__ == "__main__":
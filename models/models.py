@@ -1,8 +1,20 @@
 import asyncio
+import weakref
 from abc import abstractmethod
+from typing import Optional
 from uuid import uuid4
 
-from sqlalchemy import ForeignKey, event, select, update
+from sqlalchemy import (
+    ForeignKey,
+    UniqueConstraint,
+    bindparam,
+    delete,
+    event,
+    inspect,
+    select,
+    text,
+    update,
+)
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.pool import NullPool
@@ -11,9 +23,14 @@ from config import SQLALCHEMY_DATABASE_URL
 from logger import get_logger
 from schemas.services_auth_data import GoogleAuthData, NotionAuthData
 from schemas.Item import Item
-from utils.crypt_utils import create_password, decode_dict, decode_str, encode
+from utils.auth_cache import invalidate_user
+from utils.crypt_utils import create_password_async, decode_dict, decode_str, encode
+from utils.metrics import count_sql_statements
+from utils.tracing import trace_sql_statements
 
 engine = create_async_engine(SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+count_sql_statements(engine.sync_engine)
+trace_sql_statements(engine.sync_engine)
 SessionLocal = async_sessionmaker(
     autocommit=False,
     autoflush=False,
@@ -22,6 +39,25 @@ SessionLocal = async_sessionmaker(
 )
 logger = get_logger(__name__)
 
+_session_locks: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def session_lock(db: AsyncSession) -> asyncio.Lock:
+    """
+    Lock of a session, AsyncSession is not safe for concurrent use.
+
+    The writes of a cycle run concurrently on the synchronizer's session,
+    without the lock their flushes and commits interleave (duplicate
+    inserts, PendingRollbackError). Model queries and commits take it.
+
+    Every sync loop has its own session, the lock only serialises the work
+    of one service.
+    """
+    lock = _session_locks.get(db)
+    if lock is None:
+        lock = _session_locks[db] = asyncio.Lock()
+    return lock
+
 
 async def get_db():
     async with SessionLocal() as session:
@@ -35,11 +71,12 @@ class BaseModel(DeclarativeBase):
         if not db:
             raise ValueError("Database session is required")
 
-        if not self.id:
-            self.id = str(uuid4())
-        db.add(self)
-        await db.commit()
-        await db.refresh(self)
+        async with session_lock(db):
+            if not self.id:
+                self.id = str(uuid4())
+            db.add(self)
+            await db.commit()
+            await db.refresh(self)
 
         return self
 
@@ -47,8 +84,9 @@ class BaseModel(DeclarativeBase):
         if not db:
             raise ValueError("Database session is required")
 
-        await db.delete(self)
-        await db.commit()
+        async with session_lock(db):
+            await db.delete(self)
+            await db.commit()
 
 
 class User(BaseModel):
@@ -65,8 +103,14 @@ class User(BaseModel):
     )
 
     async def save(self, db: AsyncSession = None):
-        self.password = create_password(self.password)
-        return await super().save(db)
+        self.password = await create_password_async(self.password)
+        user = await super().save(db)
+        invalidate_user(user.id)
+        return user
+
+    async def delete(self, db: AsyncSession):
+        await super().delete(db)
+        invalidate_user(self.id)
 
     @classmethod
     async def get_by_id(cls, id_: str, db: AsyncSession) -> "User":
@@ -143,6 +187,18 @@ class NotionData(Data):
             syncing_service_id=syncing_service_id,
         )
 
+    @classmethod
+    async def get_syncing_service_ids_by_database_id(
+        cls, database_id: str, db: AsyncSession
+    ) -> list[str]:
+        # duplicated_template_id is stored encoded, see encode_sensitive_fields
+        result = await db.execute(
+            select(cls.syncing_service_id).where(
+                cls.duplicated_template_id == encode(database_id)
+            )
+        )
+        return list(result.scalars().all())
+
 
 class GoogleTasksData(Data):
     __tablename__ = "google_tasks_datas"
@@ -195,6 +251,8 @@ class SyncingService(BaseModel):
     user_id: Mapped[str] = mapped_column(ForeignKey("users.id"))
     ready: Mapped[bool] = mapped_column(default=False)
     is_active: Mapped[bool] = mapped_column(default=False)
+    # FailureKind of a permanent failure, sync stays stopped until reconnect
+    quarantine_reason: Mapped[Optional[str]] = mapped_column(default=None)
 
     user: Mapped["User"] = relationship(
         back_populates="syncing_services", lazy="selectin"
@@ -232,10 +290,25 @@ class SyncingService(BaseModel):
 
         return service
 
+    @classmethod
+    async def get_by_id(cls, id_: str, db: AsyncSession) -> "SyncingService":
+        result = await db.execute(
+            select(SyncingService).where(SyncingService.id == id_)
+        )
+        service = result.scalars().first()
+
+        if service is not None:
+            await db.refresh(service)
+
+        return service
+
     @classmethod
     async def get_ready_services(cls, db: AsyncSession) -> list["SyncingService"]:
         results = await db.execute(
-            select(SyncingService).where(SyncingService.ready == True)
+            select(SyncingService).where(
+                SyncingService.ready == True,
+                SyncingService.quarantine_reason.is_(None),
+            )
         )
         services = results.scalars().all()
 
@@ -245,6 +318,26 @@ class SyncingService(BaseModel):
 
         return services
 
+    @classmethod
+    async def get_ready_services_page(
+        cls, db: AsyncSession, limit: int, after: str = ""
+    ) -> list["SyncingService"]:
+        """Page of ready, not quarantined services ordered by id, after `after`."""
+        async with session_lock(db):
+            results = await db.execute(
+                select(SyncingService)
+                .where(
+                    SyncingService.ready == True,
+                    SyncingService.quarantine_reason.is_(None),
+                    SyncingService.id > after,
+                )
+                .order_by(SyncingService.id)
+                .limit(limit)
+                # services already in the session get fresh connection data
+                .execution_options(populate_existing=True)
+            )
+            return list(results.scalars().all())
+
     @classmethod
     async def get_service_by_user_id(
         cls, user_id: str, db: AsyncSession
@@ -259,6 +352,22 @@ class SyncingService(BaseModel):
 
         return service
 
+    @classmethod
+    async def quarantine(cls, id_: str, reason: str, db: AsyncSession) -> None:
+        """Stop syncing a service which fails permanently until it reconnects."""
+        async with session_lock(db):
+            await db.execute(
+                update(SyncingService)
+                .where(SyncingService.id == id_)
+                .values(quarantine_reason=reason, is_active=False)
+                .execution_options(synchronize_session="fetch")
+            )
+            await db.commit()
+
+    @property
+    def quarantined(self) -> bool:
+        return self.quarantine_reason is not None
+
     async def ready_to_start_sync(self, db: AsyncSession) -> bool:
         if not self.google_tasks_data or not self.notion_data:
             return False
@@ -287,6 +396,13 @@ class SyncedItem(BaseModel):
     google_task_id: Mapped[str] = mapped_column()
     syncing_service_id: Mapped[str] = mapped_column(ForeignKey("syncing_services.id"))
 
+    # upstream versions (updated time) left by our last write to the pair,
+    # changes carrying these versions are our own echoes
+    notion_version: Mapped[Optional[str]] = mapped_column(nullable=True)
+    google_task_version: Mapped[Optional[str]] = mapped_column(nullable=True)
+    # Item.fingerprint of the content both items had after our last write
+    fingerprint: Mapped[Optional[str]] = mapped_column(nullable=True)
+
     syncing_service: Mapped["SyncingService"] = relationship(lazy="selectin")
 
     @classmethod
@@ -298,25 +414,478 @@ class SyncedItem(BaseModel):
             cls.get_column_by_name(key) == value for key, value in kwargs.items()
         ]
 
-        result = await db.execute(select(SyncedItem).filter(*filters))
-        item = result.scalars().first()
+        async with session_lock(db):
+            result = await db.execute(select(SyncedItem).filter(*filters))
+            item = result.scalars().first()
 
-        if item is not None:
-            await db.refresh(item)
+            if item is not None:
+                await db.refresh(item)
 
         return item
 
+    @classmethod
+    async def get_all_by_service(
+        cls, db: AsyncSession, syncing_service_id: str
+    ) -> list["SyncedItem"]:
+        """Synced pairs of the service, in one query."""
+        async with session_lock(db):
+            result = await db.execute(
+                select(SyncedItem)
+                .where(cls.syncing_service_id == syncing_service_id)
+                # pairs already in the session get versions written since
+                .execution_options(populate_existing=True)
+            )
+            return list(result.scalars().all())
+
+    @classmethod
+    async def get_synced_ids(
+        cls,
+        db: AsyncSession,
+        syncing_service_id: str,
+        column_name: str,
+        ids: list[str],
+    ) -> set[str]:
+        """Those of `ids` that already have a synced pair."""
+        if not ids:
+            return set()
+
+        column = cls.get_column_by_name(column_name)
+        async with session_lock(db):
+            result = await db.execute(
+                select(column).where(
+                    cls.syncing_service_id == syncing_service_id, column.in_(ids)
+                )
+            )
+            return set(result.scalars().all())
+
     @classmethod
     def get_column_by_name(cls, column_name: str):
         return SyncedItem.__table__.columns[column_name]
 
     @classmethod
-    def create_from_item(cls, item: Item, syncing_service_id: str) -> "SyncedItem":
+    def create_from_item(
+        cls,
+        item: Item,
+        syncing_service_id: str,
+        notion_version: Optional[str] = None,
+        google_task_version: Optional[str] = None,
+    ) -> "SyncedItem":
         return cls(
             notion_id=item.notion_id,
             google_task_id=item.google_task_id,
             syncing_service_id=syncing_service_id,
+            notion_version=notion_version or None,
+            google_task_version=google_task_version or None,
+            fingerprint=item.fingerprint,
+        )
+
+    @classmethod
+    async def save_many(cls, items: list["SyncedItem"], db: AsyncSession) -> None:
+        """Insert many items in one transaction."""
+        if not items:
+            return
+
+        async with session_lock(db):
+            for item in items:
+                if not item.id:
+                    item.id = str(uuid4())
+            db.add_all(items)
+            await db.commit()
+
+    @classmethod
+    async def record_versions(
+        cls,
+        db: AsyncSession,
+        syncing_service_id: str,
+        notion_id: str,
+        notion_version: Optional[str],
+        google_task_version: Optional[str],
+        fingerprint: Optional[str] = None,
+    ) -> None:
+        """
+        Remember upstream versions of both items and the fingerprint of the
+        written content after writing one of them.
+        """
+        await cls.record_versions_many(
+            db,
+            syncing_service_id,
+            [
+                {
+                    "notion_id": notion_id,
+                    "notion_version": notion_version,
+                    "google_task_version": google_task_version,
+                    "fingerprint": fingerprint,
+                }
+            ],
+        )
+
+    @classmethod
+    async def record_versions_many(
+        cls, db: AsyncSession, syncing_service_id: str, versions: list[dict]
+    ) -> None:
+        """record_versions for many items, dicts hold its keyword arguments."""
+        if not versions:
+            return
+
+        table = cls.__table__
+        statement = (
+            update(table)
+            .where(
+                table.c.syncing_service_id == syncing_service_id,
+                table.c.notion_id == bindparam("b_notion_id"),
+            )
+            .values(
+                notion_version=bindparam("b_notion_version"),
+                google_task_version=bindparam("b_google_task_version"),
+                fingerprint=bindparam("b_fingerprint"),
+            )
         )
+        async with session_lock(db):
+            await db.execute(
+                statement,
+                [
+                    {
+                        "b_notion_id": version["notion_id"],
+                        "b_notion_version": version["notion_version"] or None,
+                        "b_google_task_version": version["google_task_version"]
+                        or None,
+                        "b_fingerprint": version.get("fingerprint"),
+                    }
+                    for version in versions
+                ],
+            )
+            await db.commit()
+
+
+class OutboxEntry(BaseModel):
+    """
+    Write planned by a sync diff, deleted once it was applied upstream.
+    A service has at most one entry per target, operation and item.
+    """
+
+    __tablename__ = "sync_outbox"
+    __table_args__ = (
+        UniqueConstraint("syncing_service_id", "target", "operation", "item_key"),
+    )
+
+    id: Mapped[str] = mapped_column(primary_key=True, index=True)
+    syncing_service_id: Mapped[str] = mapped_column(
+        ForeignKey("syncing_services.id"), index=True
+    )
+    # "google_tasks" or "notion"
+    target: Mapped[str] = mapped_column()
+    # "add" or "update"
+    operation: Mapped[str] = mapped_column()
+    # id of the source item for adds, of the written item for updates
+    item_key: Mapped[str] = mapped_column()
+    # item serialized with item_to_dict
+    payload: Mapped[str] = mapped_column()
+    attempts: Mapped[int] = mapped_column(default=0)
+    last_error: Mapped[Optional[str]] = mapped_column(default=None)
+
+    @classmethod
+    async def enqueue(
+        cls, db: AsyncSession, syncing_service_id: str, entries: list[dict]
+    ) -> None:
+        """
+        Store planned writes in one transaction. Entries already planned
+        for the same item get the newer payload instead of a duplicate.
+        """
+        if not entries:
+            return
+
+        async with session_lock(db):
+            result = await db.execute(
+                select(cls).where(cls.syncing_service_id == syncing_service_id)
+            )
+            pending = {
+                (entry.target, entry.operation, entry.item_key): entry
+                for entry in result.scalars().all()
+            }
+            for data in entries:
+                key = (data["target"], data["operation"], data["item_key"])
+                entry = pending.get(key)
+                if entry is not None:
+                    entry.payload = data["payload"]
+                    continue
+                pending[key] = entry = cls(
+                    id=str(uuid4()), syncing_service_id=syncing_service_id, **data
+                )
+                db.add(entry)
+            await db.commit()
+
+    @classmethod
+    async def get_pending(
+        cls,
+        db: AsyncSession,
+        syncing_service_id: str,
+        limit: int,
+        after: str = "",
+    ) -> list["OutboxEntry"]:
+        """Page of pending entries ordered by id, starting after `after`."""
+        async with session_lock(db):
+            result = await db.execute(
+                select(cls)
+                .where(cls.syncing_service_id == syncing_service_id, cls.id > after)
+                .order_by(cls.id)
+                .limit(limit)
+            )
+            return list(result.scalars().all())
+
+    @classmethod
+    async def has_pending(cls, db: AsyncSession, syncing_service_id: str) -> bool:
+        async with session_lock(db):
+            result = await db.execute(
+                select(cls.id)
+                .where(cls.syncing_service_id == syncing_service_id)
+                .limit(1)
+            )
+            return result.first() is not None
+
+    @classmethod
+    async def complete(
+        cls,
+        db: AsyncSession,
+        done: list[str],
+        failed: list[str],
+        errors: Optional[dict[str, str]] = None,
+    ) -> None:
+        """
+        Delete applied entries and count an attempt of failed ones,
+        recording their error from `errors` by entry id.
+        """
+        if not done and not failed:
+            return
+
+        # entries of a failed batch mostly share their error
+        by_error: dict[Optional[str], list[str]] = {}
+        for entry_id in failed:
+            by_error.setdefault((errors or {}).get(entry_id), []).append(entry_id)
+
+        async with session_lock(db):
+            if done:
+                await db.execute(delete(cls).where(cls.id.in_(done)))
+            for error, ids in by_error.items():
+                await db.execute(
+                    update(cls)
+                    .where(cls.id.in_(ids))
+                    .values(attempts=cls.attempts + 1, last_error=error)
+                )
+            await db.commit()
+
+
+class DeadLetter(BaseModel):
+    """
+    Planned write that kept failing, moved out of the outbox with its error.
+    Diffs leave its item out until it is replayed or the item changes.
+    """
+
+    __tablename__ = "dead_letter"
+    __table_args__ = (
+        UniqueConstraint("syncing_service_id", "target", "operation", "item_key"),
+    )
+
+    id: Mapped[str] = mapped_column(primary_key=True, index=True)
+    syncing_service_id: Mapped[str] = mapped_column(
+        ForeignKey("syncing_services.id"), index=True
+    )
+    # target, operation, item_key and payload of the OutboxEntry
+    target: Mapped[str] = mapped_column()
+    operation: Mapped[str] = mapped_column()
+    item_key: Mapped[str] = mapped_column()
+    payload: Mapped[str] = mapped_column()
+    # Item.fingerprint of the payload, a changed item is planned again
+    fingerprint: Mapped[str] = mapped_column()
+    attempts: Mapped[int] = mapped_column()
+    error: Mapped[Optional[str]] = mapped_column(default=None)
+
+    @classmethod
+    async def bury(
+        cls,
+        db: AsyncSession,
+        entries: list[OutboxEntry],
+        fingerprints: dict[str, str],
+        errors: dict[str, str],
+    ) -> None:
+        """
+        Move outbox entries to the dead-letter store, in one transaction.
+        `fingerprints` and `errors` are keyed by entry id.
+        """
+        if not entries:
+            return
+
+        async with session_lock(db):
+            for entry in entries:
+                # a letter of the same write replaced by the newer failure
+                await db.execute(
+                    delete(cls).where(
+                        cls.syncing_service_id == entry.syncing_service_id,
+                        cls.target == entry.target,
+                        cls.operation == entry.operation,
+                        cls.item_key == entry.item_key,
+                    )
+                )
+                db.add(
+                    cls(
+                        id=str(uuid4()),
+                        syncing_service_id=entry.syncing_service_id,
+                        target=entry.target,
+                        operation=entry.operation,
+                        item_key=entry.item_key,
+                        payload=entry.payload,
+                        fingerprint=fingerprints[entry.id],
+                        attempts=entry.attempts + 1,
+                        error=errors.get(entry.id),
+                    )
+                )
+            await db.execute(
+                delete(OutboxEntry).where(
+                    OutboxEntry.id.in_([entry.id for entry in entries])
+                )
+            )
+            await db.commit()
+
+    @classmethod
+    async def get_all(
+        cls, db: AsyncSession, syncing_service_id: str
+    ) -> list["DeadLetter"]:
+        async with session_lock(db):
+            result = await db.execute(
+                select(cls)
+                .where(cls.syncing_service_id == syncing_service_id)
+                .order_by(cls.id)
+            )
+            return list(result.scalars().all())
+
+    @classmethod
+    async def delete_many(cls, db: AsyncSession, ids: list[str]) -> None:
+        if not ids:
+            return
+
+        async with session_lock(db):
+            await db.execute(delete(cls).where(cls.id.in_(ids)))
+            await db.commit()
+
+    @classmethod
+    async def replay(
+        cls,
+        db: AsyncSession,
+        syncing_service_id: str,
+        ids: Optional[list[str]] = None,
+    ) -> int:
+        """
+        Move letters back to the outbox with no attempts, all of the
+        service's or those with `ids`. Return the number replayed.
+        """
+        query = select(cls).where(cls.syncing_service_id == syncing_service_id)
+        if ids is not None:
+            query = query.where(cls.id.in_(ids))
+
+        async with session_lock(db):
+            letters = list((await db.execute(query)).scalars().all())
+            if not letters:
+                return 0
+
+            pending = {
+                (entry.target, entry.operation, entry.item_key): entry
+                for entry in (
+                    await db.execute(
+                        select(OutboxEntry).where(
+                            OutboxEntry.syncing_service_id == syncing_service_id
+                        )
+                    )
+                )
+                .scalars()
+                .all()
+            }
+            for letter in letters:
+                # a write planned since keeps its newer payload
+                if (letter.target, letter.operation, letter.item_key) in pending:
+                    continue
+                db.add(
+                    OutboxEntry(
+                        id=str(uuid4()),
+                        syncing_service_id=syncing_service_id,
+                        target=letter.target,
+                        operation=letter.operation,
+                        item_key=letter.item_key,
+                        payload=letter.payload,
+                    )
+                )
+            await db.execute(
+                delete(cls).where(cls.id.in_([letter.id for letter in letters]))
+            )
+            await db.commit()
+            return len(letters)
+
+
+class PendingAdd(BaseModel):
+    """
+    Ledger of adds sent upstream whose created item is not linked yet.
+    While an add is in the ledger it is not sent again, the next diff
+    either finds the created item and links it or plans the add anew.
+    """
+
+    __tablename__ = "pending_add"
+    __table_args__ = (UniqueConstraint("syncing_service_id", "idempotency_key"),)
+
+    id: Mapped[str] = mapped_column(primary_key=True, index=True)
+    syncing_service_id: Mapped[str] = mapped_column(
+        ForeignKey("syncing_services.id"), index=True
+    )
+    # Item.idempotency_key of the source item
+    idempotency_key: Mapped[str] = mapped_column()
+
+    @classmethod
+    async def get_keys(
+        cls, db: AsyncSession, syncing_service_id: str, keys: list[str]
+    ) -> set[str]:
+        """Those of `keys` that are in the ledger."""
+        if not keys:
+            return set()
+
+        async with session_lock(db):
+            result = await db.execute(
+                select(cls.idempotency_key).where(
+                    cls.syncing_service_id == syncing_service_id,
+                    cls.idempotency_key.in_(keys),
+                )
+            )
+            return set(result.scalars().all())
+
+    @classmethod
+    async def add_many(
+        cls, db: AsyncSession, syncing_service_id: str, keys: list[str]
+    ) -> None:
+        if not keys:
+            return
+
+        async with session_lock(db):
+            db.add_all(
+                cls(
+                    id=str(uuid4()),
+                    syncing_service_id=syncing_service_id,
+                    idempotency_key=key,
+                )
+                for key in keys
+            )
+            await db.commit()
+
+    @classmethod
+    async def delete_many(
+        cls, db: AsyncSession, syncing_service_id: str, keys: list[str]
+    ) -> None:
+        if not keys:
+            return
+
+        async with session_lock(db):
+            await db.execute(
+                delete(cls).where(
+                    cls.syncing_service_id == syncing_service_id,
+                    cls.idempotency_key.in_(keys),
+                )
+            )
+            await db.commit()
 
 
 @event.listens_for(Data, "before_insert", propagate=True)
@@ -355,6 +924,36 @@ def decode_sensitive_fields(target, *args, **kwargs):
         setattr(target, field_name, decoded_value)
 
 
+def upgrade_schema(conn) -> None:
+    """
+    Add columns missing in existing tables, create_all only creates tables.
+    Columns added to models since have to be nullable. Idempotent.
+    """
+    inspector = inspect(conn)
+    quote = conn.dialect.identifier_preparer.quote
+    for table in BaseModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                raise RuntimeError(
+                    f"Column {table.name}.{column.name} is missing and not "
+                    "nullable, it has to be added by hand"
+                )
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(
+                text(
+                    f"ALTER TABLE {quote(table.name)} "
+                    f"ADD COLUMN {quote(column.name)} {column_type}"
+                )
+            )
+            logger.info(f"Added column {table.name}.{column.name}")
+
+
 async def create_all_tables():
     async with engine.begin() as conn:
         await conn.run_sync(BaseModel.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
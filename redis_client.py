@@ -1,34 +1,159 @@
-from typing import Optional
+import asyncio
+import weakref
+from typing import Iterable, Optional
 
-import redis
+from redis.asyncio import ConnectionPool, Redis
+from redis.asyncio.client import PubSub
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError, RedisError, ResponseError, TimeoutError
 
+from config import REDIS_HEALTH_CHECK_INTERVAL, REDIS_MAX_CONNECTIONS, REDIS_RETRIES
 from logger import get_logger
 
 logger = get_logger(__name__)
 
 
 class RedisClient:
+    """
+    Async Redis client.
+    All clients with the same url share one connection pool per event loop,
+    connections are health checked and reconnected with backoff on errors.
+    """
+
+    # event loop -> redis url -> client
+    _clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
     def __init__(self, redis_url: str):
         self._redis_url = redis_url
-        self._client: Optional[redis.Redis] = None
 
-    def initialize(self):
-        self._client = redis.from_url(self._redis_url)
+    def initialize(self) -> Redis:
+        pool = ConnectionPool.from_url(
+            self._redis_url,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+            retry=Retry(ExponentialBackoff(cap=1, base=0.05), REDIS_RETRIES),
+            retry_on_error=[ConnectionError, TimeoutError],
+            decode_responses=True,
+        )
+        return Redis(connection_pool=pool)
 
-    def get_client(self) -> redis.Redis:
-        if not self._client:
-            self.initialize()
-        return self._client
+    def get_client(self) -> Redis:
+        # redis connections can not be shared between event loops
+        loop = asyncio.get_running_loop()
+        clients = self._clients.setdefault(loop, {})
+        if self._redis_url not in clients:
+            clients[self._redis_url] = self.initialize()
+        return clients[self._redis_url]
+
+    async def set(self, key: str, value: str, ex: Optional[int] = None):
+        client = self.get_client()
+        await client.set(key, value, ex=ex)
 
-    def set(self, key: str, value: str):
+    async def set_if_absent(
+        self, key: str, value: str, ex: Optional[int] = None
+    ) -> bool:
+        """Set key only if it does not exist. Return True if it was set."""
         client = self.get_client()
-        client.set(key, value)
+        return bool(await client.set(key, value, ex=ex, nx=True))
+
+    async def get(self, key: str) -> Optional[str]:
+        client = self.get_client()
+        return await client.get(key)
+
+    async def delete(self, *keys: str):
+        client = self.get_client()
+        await client.delete(*keys)
+
+    async def get_many(self, keys: Iterable[str]) -> list[Optional[str]]:
+        keys = list(keys)
+        if not keys:
+            return []
+        client = self.get_client()
+        return await client.mget(keys)
+
+    async def publish(self, channel: str, message: str) -> int:
+        """Publish message, return the number of subscribers which got it."""
+        client = self.get_client()
+        return await client.publish(channel, message)
+
+    def pubsub(self) -> PubSub:
+        return self.get_client().pubsub(ignore_subscribe_messages=True)
 
-    def get(self, key: str) -> Optional[str]:
+    async def stream_add(
+        self, stream: str, fields: dict[str, str], maxlen: Optional[int] = None
+    ) -> str:
         client = self.get_client()
-        value = client.get(key)
-        return value.decode("utf-8") if value else None
+        return await client.xadd(stream, fields, maxlen=maxlen, approximate=True)
 
-    def delete(self, key: str):
+    async def stream_ensure_group(self, stream: str, group: str) -> None:
         client = self.get_client()
-        client.delete(key)
+        try:
+            await client.xgroup_create(stream, group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def stream_read_group(
+        self,
+        stream: str,
+        group: str,
+        consumer: str,
+        count: int = 1,
+        block_ms: int = 1000,
+    ) -> list[tuple[str, dict]]:
+        client = self.get_client()
+        response = await client.xreadgroup(
+            group, consumer, {stream: ">"}, count=count, block=block_ms
+        )
+        return [message for _, messages in response or [] for message in messages]
+
+    async def stream_claim_stale(
+        self,
+        stream: str,
+        group: str,
+        consumer: str,
+        min_idle_ms: int,
+        count: int = 1,
+    ) -> list[tuple[str, dict]]:
+        """Take over messages other consumers read but did not ack in time."""
+        client = self.get_client()
+        response = await client.xautoclaim(
+            stream, group, consumer, min_idle_ms, start_id="0-0", count=count
+        )
+        return [message for message in response[1] if message[1]]
+
+    async def stream_ack(self, stream: str, group: str, *ids: str) -> None:
+        client = self.get_client()
+        await client.xack(stream, group, *ids)
+
+    async def stream_delivery_count(
+        self, stream: str, group: str, message_id: str
+    ) -> int:
+        """How many times a pending message was delivered, 0 once acked."""
+        client = self.get_client()
+        pending = await client.xpending_range(
+            stream, group, min=message_id, max=message_id, count=1
+        )
+        return pending[0]["times_delivered"] if pending else 0
+
+    async def stream_group_info(self, stream: str, group: str) -> dict:
+        client = self.get_client()
+        for info in await client.xinfo_groups(stream):
+            if info["name"] == group:
+                return info
+        return {}
+
+    async def ping(self) -> bool:
+        try:
+            return await self.get_client().ping()
+        except RedisError as e:
+            logger.error(f"Redis health check failed: {e}")
+            return False
+
+    @classmethod
+    async def close_all(cls) -> None:
+        clients = cls._clients.pop(asyncio.get_running_loop(), {})
+        for client in clients.values():
+            await client.aclose()
+            await client.connection_pool.disconnect()
@@ -74,7 +74,7 @@ async def save_google_connection(
 async def connect_google_tasks(user: User = Depends(validate_token)):
     logger.info(f"User {user.email} start connecting Google Tasks")
 
-    state = set_user_to_session(user)
+    state = await set_user_to_session(user)
 
     flow = google_auth_oauthlib.flow.Flow.from_client_secrets_file(
         GOOGLE_CLIENT_SECRET_FILE, scopes=GOOGLE_API_SCOPES, state=state
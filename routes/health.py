@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Response, status
+
+from config import REDIS_URL, SYNC_READY_MAX_LAG
+from redis_client import RedisClient
+from synchronizers.scheduler import scheduler
+from synchronizers.warmup import sync_warmup
+from synchronizers.watchdog import sync_watchdog
+
+router = APIRouter()
+
+redis_client = RedisClient(REDIS_URL)
+
+
+@router.get("/ready")
+async def ready(response: Response):
+    """
+    Readiness of this process, with scheduler lag, sync loop counts and the
+    warm-up of loops restarted at boot, which readiness does not wait for.
+    Not ready while Redis is unreachable, or while cycles started or wait
+    more than SYNC_READY_MAX_LAG seconds late, see SyncScheduler.
+    """
+    lag = scheduler.lag()
+    redis_ok = await redis_client.ping()
+    is_ready = redis_ok and lag <= SYNC_READY_MAX_LAG
+    if not is_ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+    return {
+        "ready": is_ready,
+        "scheduler_lag": lag,
+        "redis": redis_ok,
+        **sync_watchdog.stats(),
+        "warmup": sync_warmup.stats(),
+    }
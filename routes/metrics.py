@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from config import SYNC_PIPELINE_ENABLED
+from routes.sync import sync_pipeline
+
+router = APIRouter()
+
+
+@router.get("")
+async def metrics():
+    if SYNC_PIPELINE_ENABLED:
+        await sync_pipeline.export_metrics()
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -66,8 +66,8 @@ async def save_notion_connection(
 
 
 @router.get("/connect")
-def connect_notion(user: User = Depends(validate_token)):
+async def connect_notion(user: User = Depends(validate_token)):
     logger.info(f"User {user.email} start connecting Notion")
 
-    state = set_user_to_session(user)
+    state = await set_user_to_session(user)
     return {f"{NOTION_AUTHORIZATION_URL}&state={state}"}
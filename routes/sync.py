@@ -1,17 +1,34 @@
 import asyncio
+import json
+from contextlib import asynccontextmanager, nullcontext
+from typing import AsyncIterator, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from config import REDIS_URL, SYNC_WAIT_TIME
+from config import (
+    REDIS_URL,
+    SYNC_CYCLE_TIME_BUDGET,
+    SYNC_PIPELINE_ENABLED,
+    SYNC_WARMUP_PAGE_SIZE,
+)
 from logger import get_logger
-from models.models import SyncingService, get_db
+from models.models import DeadLetter, SessionLocal, SyncingService, get_db
 from redis_client import RedisClient
 from schemas.user import User
+from services.errors import classify_failure
 from services.google_tasks.google_tasks import GTasksList
 from services.notion.notion_db import NotionDB
+from synchronizers.backoff import sync_backoff
+from synchronizers.fair_queue import fair_queue
+from synchronizers.pipeline import SyncPipeline
+from synchronizers.scheduler import scheduler
+from synchronizers.synchronizer import Synchronizer
 from synchronizers.synchronizer_fabric import SynchronizerFabric
+from synchronizers.warmup import sync_warmup
+from synchronizers.watchdog import sync_watchdog
 from utils.db_utils import validate_token
+from utils.metrics import ACTIVE_SYNC_TASKS, SYNC_FAILURES, SYNC_QUARANTINED
 
 router = APIRouter()
 logger = get_logger(__name__)
@@ -19,13 +36,12 @@ logger = get_logger(__name__)
 redis_client = RedisClient(REDIS_URL)
 
 
-async def start_sync_notion_google_tasks(
+def build_synchronizer(
     syncing_service_id: str,
     notion_data: dict,
     google_data: dict,
     db: AsyncSession,
-):
-    logger.info(f"Starting sync for service {syncing_service_id}")
+) -> Synchronizer:
     notion_db = NotionDB(
         syncing_service_id=syncing_service_id,
         database_id=notion_data["duplicated_template_id"],
@@ -40,40 +56,235 @@ async def start_sync_notion_google_tasks(
         db=db,
     )
 
-    syncer = SynchronizerFabric(
-        notion_service=notion_db,
-        google_tasks_service=google_tasks,
-    ).get_synchronizer(db)
-    while True:
-        await syncer.sync()
-        await asyncio.sleep(SYNC_WAIT_TIME)
+    return SynchronizerFabric(notion_db, google_tasks).get_synchronizer(db)
+
+
+def get_notion_data(service: SyncingService) -> dict:
+    notion_data = service.notion_data
+    return {
+        **notion_data.data,
+        "duplicated_template_id": notion_data.duplicated_template_id,
+        "title_prop_name": notion_data.title_prop_name,
+    }
+
+
+def get_google_data(service: SyncingService) -> dict:
+    google_data = service.google_tasks_data
+    return {
+        **google_data.data,
+        "tasks_list_id": google_data.tasks_list_id,
+    }
+
+
+@asynccontextmanager
+async def load_synchronizer(
+    syncing_service_id: str,
+) -> AsyncIterator[Synchronizer | None]:
+    """
+    Build synchronizer for a service synced by another process. It and its
+    session are closed when the block exits.
+    """
+    async with SessionLocal() as db:
+        service = await SyncingService.get_by_id(syncing_service_id, db)
+        if not service or not service.ready:
+            yield None
+            return
+
+        syncer = build_synchronizer(
+            syncing_service_id=service.id,
+            notion_data=get_notion_data(service),
+            google_data=get_google_data(service),
+            db=db,
+        )
+        try:
+            yield syncer
+        finally:
+            await syncer.close()
+
+
+async def end_pipeline_cycle(
+    syncing_service_id: str, error: Optional[Exception]
+) -> Optional[float]:
+    """Failure handling of run_sync_cycle for cycles run by the pipeline."""
+    if error is None:
+        sync_backoff.succeeded(syncing_service_id)
+        return 0.0
+    async with SessionLocal() as db:
+        return await handle_cycle_failure(syncing_service_id, error, db)
+
+
+sync_pipeline = SyncPipeline(
+    redis_client,
+    synchronizer_loader=load_synchronizer,
+    cycle_handler=end_pipeline_cycle,
+)
+
+
+async def start_sync_notion_google_tasks(
+    syncing_service_id: str,
+    notion_data: dict,
+    google_data: dict,
+    warm_up: bool = False,
+):
+    """
+    Sync loop of a service, with its first cycle spread by sync_warmup.
+    The loop works on its own session, closed when it stops.
+    """
+    async with SessionLocal() as db:
+        await sync_loop(syncing_service_id, notion_data, google_data, db, warm_up)
+
+
+async def sync_loop(
+    syncing_service_id: str,
+    notion_data: dict,
+    google_data: dict,
+    db: AsyncSession,
+    warm_up: bool,
+):
+    logger.info(f"Starting sync for service {syncing_service_id}")
+    syncer = build_synchronizer(syncing_service_id, notion_data, google_data, db)
+
+    scheduler.register(syncing_service_id)
+    if SYNC_PIPELINE_ENABLED:
+        sync_pipeline.register(syncing_service_id, syncer)
+        # a started service is not quarantined, nor backing off any more
+        await sync_pipeline.finish_cycle(syncing_service_id)
+    ACTIVE_SYNC_TASKS.inc()
+    try:
+        while True:
+            cycle = sync_warmup.first_cycle() if warm_up else nullcontext()
+            warm_up = False
+            async with cycle:
+                if SYNC_PIPELINE_ENABLED:
+                    scheduler.cycle_started(syncing_service_id)
+                    if not await sync_pipeline.submit(
+                        syncing_service_id
+                    ) and await sync_pipeline.quarantined(syncing_service_id):
+                        return
+                elif not await run_sync_cycle(syncing_service_id, syncer, db):
+                    return
+            sync_watchdog.beat(
+                syncing_service_id, scheduler.interval(syncing_service_id)
+            )
+            await scheduler.wait_for_next_cycle(syncing_service_id)
+    finally:
+        # a stopped or restarted loop leaves no cycle running behind it
+        syncer.cancel()
+        ACTIVE_SYNC_TASKS.dec()
+        scheduler.unregister(syncing_service_id)
+        sync_pipeline.unregister(syncing_service_id)
+        fair_queue.forget(syncing_service_id)
+        sync_backoff.succeeded(syncing_service_id)
+
+
+async def run_sync_cycle(
+    syncing_service_id: str, syncer: Synchronizer, db: AsyncSession
+) -> bool:
+    """
+    Run a cycle of the service. A failed cycle delays the next one with
+    exponential backoff, a permanent failure quarantines the service.
+    Return False once the loop should stop.
+    """
+    # waiting for a worker slot is not a stall
+    sync_watchdog.beat(syncing_service_id, None)
+    try:
+        async with fair_queue.slot(syncing_service_id) as usage:
+            scheduler.cycle_started(syncing_service_id)
+            sync_watchdog.beat(syncing_service_id, SYNC_CYCLE_TIME_BUDGET)
+            await syncer.sync()
+            usage.cost = syncer.last_cycle_cost
+    except Exception as e:
+        delay = await handle_cycle_failure(syncing_service_id, e, db)
+        if delay is None:
+            return False
+        sync_watchdog.beat(syncing_service_id, delay)
+        await asyncio.sleep(delay)
+    else:
+        sync_backoff.succeeded(syncing_service_id)
+    return True
+
+
+async def handle_cycle_failure(
+    syncing_service_id: str, error: Exception, db: AsyncSession
+) -> Optional[float]:
+    """
+    Quarantine the service after a permanent failure and return None,
+    else return the backoff delay before its next cycle.
+    """
+    kind = classify_failure(error)
+    SYNC_FAILURES.labels(kind=kind.value).inc()
+    if kind.permanent:
+        logger.error(
+            f"Quarantining service {syncing_service_id} after {kind.value}: {error}",
+            extra={"syncing_service_id": syncing_service_id},
+        )
+        SYNC_QUARANTINED.labels(kind=kind.value).inc()
+        await SyncingService.quarantine(syncing_service_id, kind.value, db)
+        await redis_client.delete(syncing_service_id)
+        return None
+
+    delay = sync_backoff.failed(syncing_service_id)
+    logger.warning(
+        f"Sync cycle of service {syncing_service_id} failed "
+        f"{sync_backoff.failures(syncing_service_id)} times, "
+        f"retrying in {delay:.0f}s: {error!r}",
+        extra={"syncing_service_id": syncing_service_id},
+    )
+    return delay
+
+
+def spawn_sync_task(
+    syncing_service_id: str,
+    notion_data: dict,
+    google_data: dict,
+    warm_up: bool = False,
+) -> asyncio.Task:
+    """Start the sync loop of a service as a task watched by sync_watchdog."""
+    task = asyncio.create_task(
+        start_sync_notion_google_tasks(
+            syncing_service_id=syncing_service_id,
+            notion_data=notion_data,
+            google_data=google_data,
+            warm_up=warm_up,
+        )
+    )
+
+    async def restart() -> None:
+        new_task = spawn_sync_task(syncing_service_id, notion_data, google_data)
+        await redis_client.set(syncing_service_id, str(id(new_task)))
+        logger.info(
+            f"Restarted sync for service {syncing_service_id} "
+            f"with task_id {id(new_task)}"
+        )
+
+    sync_watchdog.watch(syncing_service_id, task, restart)
+    return task
 
 
 async def restart_sync():
-    db_gen = get_db()
-    db = await db_gen.asend(None)
-
-    services = await SyncingService.get_ready_services(db)
-    logger.info(f"Restarting sync for {len(services)} services")
-    for service in services:
-        notion_data = service.notion_data
-        google_data = service.google_tasks_data
-        task = asyncio.create_task(
-            start_sync_notion_google_tasks(
+    """
+    Restart sync loops of ready services, loaded in pages of
+    SYNC_WARMUP_PAGE_SIZE. Their first cycles are spread by sync_warmup.
+    Each loop gets its own session, a page is read on a short-lived one.
+    """
+    after = ""
+    while True:
+        async with SessionLocal() as db:
+            services = await SyncingService.get_ready_services_page(
+                db, SYNC_WARMUP_PAGE_SIZE, after
+            )
+        if not services:
+            break
+        for service in services:
+            spawn_sync_task(
                 syncing_service_id=service.id,
-                notion_data={
-                    **notion_data.data,
-                    "duplicated_template_id": notion_data.duplicated_template_id,
-                    "title_prop_name": notion_data.title_prop_name,
-                },
-                google_data={
-                    **google_data.data,
-                    "tasks_list_id": google_data.tasks_list_id,
-                },
-                db=db,
+                notion_data=get_notion_data(service),
+                google_data=get_google_data(service),
+                warm_up=True,
             )
-        )
-        logger.info(f"Restarted sync for service {service.id} with task_id {id(task)}")
+        sync_warmup.loaded += len(services)
+        after = services[-1].id
+        logger.info(f"Restarted sync for {sync_warmup.loaded} services")
 
 
 @router.post("/start_sync", status_code=status.HTTP_201_CREATED)
@@ -84,26 +295,20 @@ async def start_sync(
     service = await SyncingService.get_service_by_user_id(user.id, db)
     if not service or not await service.ready_to_start_sync(db):
         raise HTTPException(status_code=400, detail="Not all services are connected")
-
-    notion_data = service.notion_data
-    google_data = service.google_tasks_data
-    task = asyncio.create_task(
-        start_sync_notion_google_tasks(
-            syncing_service_id=service.id,
-            notion_data={
-                **notion_data.data,
-                "duplicated_template_id": notion_data.duplicated_template_id,
-                "title_prop_name": notion_data.title_prop_name,
-            },
-            google_data={
-                **google_data.data,
-                "tasks_list_id": google_data.tasks_list_id,
-            },
-            db=db,
+    if service.quarantined:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Sync stopped after {service.quarantine_reason}, "
+            "reconnect the service to resume",
         )
+
+    task = spawn_sync_task(
+        syncing_service_id=service.id,
+        notion_data=get_notion_data(service),
+        google_data=get_google_data(service),
     )
 
-    redis_client.set(service.id, str(id(task)))
+    await redis_client.set(service.id, str(id(task)))
     await SyncingService.update(
         user_id=user.id,
         values={"is_active": True},
@@ -122,7 +327,7 @@ async def stop_sync(
     if not service:
         raise HTTPException(status_code=400, detail="Syncing service not found")
 
-    task_id = redis_client.get(service.id)
+    task_id = await redis_client.get(service.id)
     tasks = asyncio.all_tasks()
     for task in tasks:
         if str(id(task)) == task_id:
@@ -137,4 +342,62 @@ async def stop_sync(
         values={"is_active": False},
         db=db,
     )
-    redis_client.delete(service.id)
+    await redis_client.delete(service.id)
+
+
+@router.get("/share")
+async def get_share(
+    user: User = Depends(validate_token),
+    db: AsyncSession = Depends(get_db),
+):
+    """Share of the sync capacity used by the user's service in this process."""
+    service = await SyncingService.get_service_by_user_id(user.id, db)
+    if not service:
+        raise HTTPException(status_code=400, detail="Syncing service not found")
+
+    share = fair_queue.shares().get(service.id)
+    if share is None:
+        raise HTTPException(status_code=404, detail="Service is not syncing")
+    return share
+
+
+@router.get("/dead_letters")
+async def get_dead_letters(
+    user: User = Depends(validate_token),
+    db: AsyncSession = Depends(get_db),
+):
+    """Writes of the user's service that kept failing, with their last error."""
+    service = await SyncingService.get_service_by_user_id(user.id, db)
+    if not service:
+        raise HTTPException(status_code=400, detail="Syncing service not found")
+
+    return [
+        {
+            "id": letter.id,
+            "target": letter.target,
+            "operation": letter.operation,
+            "item": json.loads(letter.payload),
+            "attempts": letter.attempts,
+            "error": letter.error,
+        }
+        for letter in await DeadLetter.get_all(db, service.id)
+    ]
+
+
+@router.post("/dead_letters/replay")
+async def replay_dead_letters(
+    ids: list[str] = Body(None, embed=True),
+    user: User = Depends(validate_token),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Plan dead-lettered writes again, those with `ids` or all of them.
+    They are sent by the next cycle of the service.
+    """
+    service = await SyncingService.get_service_by_user_id(user.id, db)
+    if not service:
+        raise HTTPException(status_code=400, detail="Syncing service not found")
+
+    replayed = await DeadLetter.replay(db, service.id, ids)
+    logger.info(f"User {user.email} replayed {replayed} dead-lettered writes")
+    return {"replayed": replayed}
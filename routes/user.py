@@ -1,7 +1,10 @@
+import asyncio
+
 from fastapi import APIRouter, Body, Depends, Form, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from config import PROFILERS_TIMEOUT
 from logger import get_logger
 from models.models import GoogleTasksData, NotionData, SyncingService
 from models.models import User as UserDB
@@ -11,37 +14,93 @@ from schemas.user import User
 from schemas.user_data import GoogleTasksOptions, NotionOptions, Options, UserData
 from services.google_tasks.google_tasks_profiler import GTasksProfiler
 from services.notion.notion_profiler import NotionProfiler
-from utils.crypt_utils import verify_password
+from utils.crypt_utils import verify_password_async
 from utils.db_utils import generate_access_token, validate_token
+from utils.lists_cache import available_lists_cache
 
 router = APIRouter()
 logger = get_logger(__name__)
 
 
-def get_notion_dbs(notion_data: NotionData):
+async def get_notion_dbs(notion_data: NotionData):
+    notion_profiler = NotionProfiler(
+        notion_data.access_token,
+    )
     try:
-        notion_profiler = NotionProfiler(
-            notion_data.access_token,
-        )
-        return notion_profiler.get_lists()
+        return await notion_profiler.get_lists()
     except Exception as e:
         logger.error(
             f"Error while getting notion data for syncing_service {notion_data.id}: {e}"
         )
         return {}
+    finally:
+        await notion_profiler.close()
 
 
-def get_google_tasks_lists(google_tasks_data: GoogleTasksData):
+async def get_google_tasks_lists(google_tasks_data: GoogleTasksData):
+    google_tasks_profiler = GTasksProfiler(
+        google_tasks_data.data,
+    )
     try:
-        google_tasks_profiler = GTasksProfiler(
-            google_tasks_data.data,
-        )
-        return google_tasks_profiler.get_lists()
+        return await google_tasks_profiler.get_lists()
     except Exception as e:
         logger.error(
             f"Error while getting google data for syncing_service {google_tasks_data.id}: {e}"
         )
         return {}
+    finally:
+        await google_tasks_profiler.close()
+
+
+async def get_available_lists(syncing_service: SyncingService) -> tuple[dict, dict]:
+    """
+    Query both profilers concurrently under one deadline, through the cache.
+    A side that misses the deadline or fails is returned as an empty dict.
+    """
+    await available_lists_cache.prefetch(syncing_service.id)
+
+    tasks = {}
+    if syncing_service.notion_data:
+        tasks["notion"] = asyncio.create_task(
+            available_lists_cache.get_or_load(
+                syncing_service.id,
+                "notion",
+                lambda: get_notion_dbs(syncing_service.notion_data),
+            )
+        )
+    if syncing_service.google_tasks_data:
+        tasks["google_tasks"] = asyncio.create_task(
+            available_lists_cache.get_or_load(
+                syncing_service.id,
+                "google_tasks",
+                lambda: get_google_tasks_lists(syncing_service.google_tasks_data),
+            )
+        )
+
+    if tasks:
+        _, pending = await asyncio.wait(tasks.values(), timeout=PROFILERS_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    results = {}
+    for name, task in tasks.items():
+        if task.cancelled():
+            logger.warning(
+                f"Getting {name} lists for syncing_service {syncing_service.id} "
+                f"timed out after {PROFILERS_TIMEOUT}s"
+            )
+            results[name] = {}
+        elif task.exception() is not None:
+            logger.error(
+                f"Getting {name} lists for syncing_service {syncing_service.id} "
+                f"failed: {task.exception()!r}"
+            )
+            results[name] = {}
+        else:
+            results[name] = task.result() or {}
+
+    return results.get("notion", {}), results.get("google_tasks", {})
 
 
 async def generate_user_data(
@@ -49,26 +108,24 @@ async def generate_user_data(
     syncing_service: SyncingService,
     db: AsyncSession,
 ):
+    dbs, lists = await get_available_lists(syncing_service)
+
     notion_options = None
-    if syncing_service.notion_data:
-        dbs = get_notion_dbs(syncing_service.notion_data)
-        if dbs:
-            notion_options = NotionOptions(
-                is_connected=bool(syncing_service.notion_data.id),
-                chosed_list=syncing_service.notion_data.duplicated_template_id,
-                title_prop_name=syncing_service.notion_data.title_prop_name,
-                available_lists=dbs,
-            )
+    if syncing_service.notion_data and dbs:
+        notion_options = NotionOptions(
+            is_connected=bool(syncing_service.notion_data.id),
+            chosed_list=syncing_service.notion_data.duplicated_template_id,
+            title_prop_name=syncing_service.notion_data.title_prop_name,
+            available_lists=dbs,
+        )
 
     google_options = None
-    if syncing_service.google_tasks_data:
-        lists = get_google_tasks_lists(syncing_service.google_tasks_data)
-        if lists:
-            google_options = GoogleTasksOptions(
-                is_connected=bool(syncing_service.google_tasks_data),
-                available_lists=lists,
-                chosed_list=syncing_service.google_tasks_data.tasks_list_id,
-            )
+    if syncing_service.google_tasks_data and lists:
+        google_options = GoogleTasksOptions(
+            is_connected=bool(syncing_service.google_tasks_data),
+            available_lists=lists,
+            chosed_list=syncing_service.google_tasks_data.tasks_list_id,
+        )
 
     is_ready = await syncing_service.ready_to_start_sync(db)
 
@@ -81,6 +138,7 @@ async def generate_user_data(
         is_ready=is_ready,
         is_active=syncing_service.is_active,
         options=options,
+        quarantine_reason=syncing_service.quarantine_reason,
     )
 
     return result
@@ -130,6 +188,11 @@ async def save_user_data(
     if notion_data:
         await notion_data.save(db)
 
+    # a newly chosen list replaces one that was not found
+    if syncing_service.quarantined and (google_tasks_list_id or notion_list_id):
+        await SyncingService.update(user.id, {"quarantine_reason": None}, db)
+        syncing_service.quarantine_reason = None
+
     return await generate_user_data(user, syncing_service, db)
 
 
@@ -164,7 +227,9 @@ async def login(
     db: AsyncSession = Depends(get_db),
 ):
     user = await UserDB.get_by_email(form_data.username, db)
-    if not user or not verify_password(form_data.password, user.password):
+    if not user or not await verify_password_async(
+        form_data.password, user.password
+    ):
         raise HTTPException(status_code=400, detail="Incorrect username or password")
     access_token, expired_in = generate_access_token(user)
     logger.info(f"User {user.email} logged in")
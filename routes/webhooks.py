@@ -0,0 +1,118 @@
+import json
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+from config import REDIS_URL, WEBHOOK_DEDUPE_TTL
+from logger import get_logger
+from models.models import NotionData, get_db
+from redis_client import RedisClient
+from synchronizers.triggers import sync_triggers
+from utils.webhook_utils import verify_google_channel_token, verify_notion_signature
+
+router = APIRouter()
+logger = get_logger(__name__)
+
+redis_client = RedisClient(REDIS_URL)
+
+NOTION_PAGE_EVENTS = (
+    "page.created",
+    "page.deleted",
+    "page.undeleted",
+    "page.moved",
+    "page.properties_updated",
+    "page.content_updated",
+)
+GOOGLE_IGNORED_STATES = ("sync",)
+
+
+async def is_duplicate(source: str, event_id: str) -> bool:
+    """Remember event id, return True if it was already delivered."""
+    key = f"webhook_event:{source}:{event_id}"
+    return not await redis_client.set_if_absent(key, "1", ex=WEBHOOK_DEDUPE_TTL)
+
+
+async def trigger_sync(syncing_service_ids: list[str], source: str) -> int:
+    """
+    Trigger sync loops of the services, those not running in this process
+    are relayed to the other ones. Return the number triggered here.
+    """
+    triggered = 0
+    for syncing_service_id in syncing_service_ids:
+        if await sync_triggers.trigger(syncing_service_id, source):
+            triggered += 1
+        else:
+            logger.info(
+                f"Relayed {source} event for service {syncing_service_id} "
+                "which is not syncing in this process"
+            )
+    return triggered
+
+
+@router.post("/notion", status_code=status.HTTP_200_OK)
+async def notion_webhook(
+    request: Request,
+    x_notion_signature: str | None = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    body = await request.body()
+    signed = verify_notion_signature(body, x_notion_signature)
+    if not signed and config.NOTION_WEBHOOK_VERIFICATION_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid signature")
+
+    try:
+        event = json.loads(body or b"{}")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+
+    if not signed:
+        # until the token is configured only the subscription handshake,
+        # which Notion does not sign, is accepted
+        if "verification_token" not in event:
+            raise HTTPException(status_code=401, detail="Invalid signature")
+        logger.warning(
+            "Got Notion webhook verification request, set "
+            "NOTION_WEBHOOK_VERIFICATION_TOKEN to "
+            f"{event['verification_token']}"
+        )
+        return {"status": "verification"}
+
+    if event.get("type") not in NOTION_PAGE_EVENTS:
+        return {"status": "ignored"}
+
+    event_id = event.get("id")
+    if event_id and await is_duplicate("notion", event_id):
+        return {"status": "duplicate"}
+
+    parent = event.get("data", {}).get("parent", {})
+    if parent.get("type") != "database":
+        return {"status": "ignored"}
+
+    syncing_service_ids = await NotionData.get_syncing_service_ids_by_database_id(
+        parent.get("id", ""), db
+    )
+    triggered = await trigger_sync(syncing_service_ids, "notion")
+    return {"status": "accepted", "triggered": triggered}
+
+
+@router.post("/google_tasks", status_code=status.HTTP_200_OK)
+async def google_tasks_webhook(
+    x_goog_channel_id: str | None = Header(None),
+    x_goog_channel_token: str | None = Header(None),
+    x_goog_resource_state: str | None = Header(None),
+    x_goog_message_number: str | None = Header(None),
+):
+    if not verify_google_channel_token(x_goog_channel_id, x_goog_channel_token):
+        raise HTTPException(status_code=401, detail="Invalid channel token")
+
+    if x_goog_resource_state in GOOGLE_IGNORED_STATES:
+        return {"status": "ignored"}
+
+    event_id = f"{x_goog_channel_id}:{x_goog_message_number}"
+    if await is_duplicate("google_tasks", event_id):
+        return {"status": "duplicate"}
+
+    # channel id is the syncing service id, see google_channel_token
+    triggered = await trigger_sync([x_goog_channel_id], "google_tasks")
+    return {"status": "accepted", "triggered": triggered}
@@ -1,6 +1,10 @@
 import datetime
+import hashlib
+import uuid
 from dataclasses import dataclass, field
 
+SYNCED_FIELDS = ("name", "status")
+
 
 @dataclass(slots=True)
 class Item:
@@ -11,3 +15,75 @@ class Item:
     # services
     notion_id: str = field(default="", compare=False)
     google_task_id: str = field(default="", compare=False)
+
+    # version of this item and fingerprint of the pair recorded by the last
+    # sync write, see SyncedItem
+    synced_version: str = field(default="", compare=False)
+    synced_fingerprint: str = field(default="", compare=False)
+    # synced fields that differ from the counterpart, empty means all
+    changed_fields: tuple[str, ...] = field(default=(), compare=False)
+
+    @property
+    def fingerprint(self) -> str:
+        """Stable digest of synced fields, same in every process."""
+        content = f"{self.name}\x1f{int(self.status)}".encode()
+        return hashlib.blake2b(content, digest_size=8).hexdigest()
+
+    @property
+    def idempotency_key(self) -> str:
+        """
+        Same for every attempt to create the counterpart of this item, as
+        it comes from the source item's id.
+        """
+        source_ids = f"{self.notion_id}|{self.google_task_id}"
+        return str(uuid.uuid5(uuid.NAMESPACE_OID, source_ids))
+
+    def diff_fields(self, other: "Item") -> tuple[str, ...]:
+        return tuple(
+            name
+            for name in SYNCED_FIELDS
+            if getattr(self, name) != getattr(other, name)
+        )
+
+    @property
+    def version(self) -> str:
+        return self.updated_at.isoformat()
+
+    @property
+    def changed_since_sync(self) -> bool:
+        """False if the item was not edited after our last write or sync."""
+        return not self.synced_version or self.version != self.synced_version
+
+
+def item_to_dict(item: Item) -> dict:
+    return {
+        "name": item.name,
+        "status": item.status,
+        "updated_at": item.updated_at.isoformat(),
+        "notion_id": item.notion_id,
+        "google_task_id": item.google_task_id,
+        "synced_version": item.synced_version,
+        "synced_fingerprint": item.synced_fingerprint,
+        "changed_fields": list(item.changed_fields),
+    }
+
+
+def item_from_dict(data: dict) -> Item:
+    return Item(
+        name=data["name"],
+        status=data["status"],
+        updated_at=datetime.datetime.fromisoformat(data["updated_at"]),
+        notion_id=data["notion_id"],
+        google_task_id=data["google_task_id"],
+        synced_version=data.get("synced_version", ""),
+        synced_fingerprint=data.get("synced_fingerprint", ""),
+        changed_fields=tuple(data.get("changed_fields", ())),
+    )
+
+
+def items_to_dicts(items: list[Item]) -> list[dict]:
+    return [item_to_dict(item) for item in items]
+
+
+def items_from_dicts(data: list[dict]) -> list[Item]:
+    return [item_from_dict(item_data) for item_data in data]
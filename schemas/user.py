@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import dataclasses
 
 
@@ -5,4 +7,5 @@ from pydantic import dataclasses
 class User:
     id: str
     email: str
-    password: str
+    # left out of authenticated users, see validate_token
+    password: Optional[str] = None
@@ -34,3 +34,4 @@ class UserData:
     is_ready: bool
     is_active: bool
     options: Options
+    quarantine_reason: str | None = None
@@ -0,0 +1,40 @@
+from enum import Enum
+
+import aiohttp
+
+
+class FailureKind(str, Enum):
+    # credentials no longer accepted, a reconnect is needed
+    AUTH_REVOKED = "auth_revoked"
+    # the synced database or task list is gone or no longer shared
+    NOT_FOUND = "not_found"
+    # anything else, retrying later may succeed
+    TRANSIENT = "transient"
+
+    @property
+    def permanent(self) -> bool:
+        return self is not FailureKind.TRANSIENT
+
+
+class ServiceError(Exception):
+    """Upstream failure of a known kind, raised where the status is not enough."""
+
+    def __init__(self, kind: FailureKind, message: str) -> None:
+        super().__init__(message)
+        self.kind = kind
+
+
+def classify_status(status: int) -> FailureKind:
+    if status == 401:
+        return FailureKind.AUTH_REVOKED
+    if status in (404, 410):
+        return FailureKind.NOT_FOUND
+    return FailureKind.TRANSIENT
+
+
+def classify_failure(error: BaseException) -> FailureKind:
+    if isinstance(error, ServiceError):
+        return error.kind
+    if isinstance(error, aiohttp.ClientResponseError):
+        return classify_status(error.status)
+    return FailureKind.TRANSIENT
@@ -0,0 +1,90 @@
+"""
+Encoding of Google API batch requests (multipart/mixed, one HTTP request
+per part) and decoding of their responses.
+"""
+
+import email.parser
+import email.policy
+import json
+import uuid
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass(slots=True)
+class BatchPart:
+    method: str
+    path: str
+    body: Optional[dict] = None
+
+
+@dataclass(slots=True)
+class BatchResponse:
+    status: int
+    body: dict = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+
+def new_boundary() -> str:
+    return f"batch_{uuid.uuid4().hex}"
+
+
+def encode_batch(parts: list[BatchPart], boundary: str) -> bytes:
+    lines = []
+    for index, part in enumerate(parts):
+        lines += [
+            f"--{boundary}",
+            "Content-Type: application/http",
+            f"Content-ID: <item-{index}>",
+            "",
+            f"{part.method} {part.path}",
+        ]
+        if part.body is not None:
+            lines += ["Content-Type: application/json", "", json.dumps(part.body)]
+        else:
+            lines += [""]
+    lines += [f"--{boundary}--", ""]
+    return "\r\n".join(lines).encode()
+
+
+def decode_batch(body: bytes, content_type: str, size: int) -> list[BatchResponse]:
+    """
+    Responses of a batch in request order. Parts missing in the response
+    get status 0.
+    """
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode() + body
+    )
+
+    responses = [BatchResponse(status=0) for _ in range(size)]
+    if not message.is_multipart():
+        return responses
+
+    for part in message.iter_parts():
+        index = _part_index(part.get("Content-ID", ""))
+        if index is None or not 0 <= index < size:
+            continue
+        responses[index] = _decode_http_response(part.get_payload(decode=True))
+    return responses
+
+
+def _part_index(content_id: str) -> Optional[int]:
+    # responses are identified as <response-item-N>
+    _, _, index = content_id.strip("<> ").rpartition("-")
+    return int(index) if index.isdigit() else None
+
+
+def _decode_http_response(data: bytes) -> BatchResponse:
+    head, _, body = data.replace(b"\r\n", b"\n").partition(b"\n\n")
+    status_line = head.split(b"\n", 1)[0].split()
+    if len(status_line) < 2 or not status_line[1].isdigit():
+        return BatchResponse(status=0)
+
+    try:
+        parsed_body = json.loads(body) if body.strip() else {}
+    except ValueError:
+        parsed_body = {}
+    return BatchResponse(status=int(status_line[1]), body=parsed_body)
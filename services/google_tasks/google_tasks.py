@@ -1,12 +1,36 @@
+import asyncio
 import datetime
+from typing import Optional
+from urllib.parse import quote, urlsplit
 
 import aiohttp
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from config import (
+    GOOGLE_TASKS_API_URL,
+    GOOGLE_TASKS_BATCH_SIZE,
+    GOOGLE_TASKS_RETRY_CONCURRENCY,
+)
 from logger import get_logger
 from models.models import SyncedItem
-from schemas.Item import Item
+from schemas.Item import SYNCED_FIELDS, Item
+from services.google_tasks.batch import (
+    BatchPart,
+    BatchResponse,
+    decode_batch,
+    encode_batch,
+    new_boundary,
+)
+from services.errors import (
+    FailureKind,
+    ServiceError,
+    classify_failure,
+    classify_status,
+)
+from services.google_tasks.token_refresher import refresh_access_token
 from services.service import AbstractDataAdapter, AbstractService
+from utils.metrics import upstream_trace_config
+from utils.tracing import traced
 
 logger = get_logger(__name__)
 
@@ -32,6 +56,15 @@ class GTasksDataAdapter(AbstractDataAdapter):
             "status": self.convert_status_to_text(item.status),
         }
 
+    def item_to_patch_dict(self, item: Item) -> dict:
+        changed_fields = item.changed_fields or SYNCED_FIELDS
+        data = {}
+        if "name" in changed_fields:
+            data["title"] = item.name
+        if "status" in changed_fields:
+            data["status"] = self.convert_status_to_text(item.status)
+        return data
+
     def dicts_to_items(self, data: list[dict]) -> list[Item]:
         items = []
         for item_data in data:
@@ -52,6 +85,11 @@ class GTasksDataAdapter(AbstractDataAdapter):
     def convert_status_to_bool(self, status: str) -> bool:
         return status == "completed"
 
+    def get_version(self, data: dict) -> str:
+        """Version of a task returned by a write, comparable with Item.version."""
+        updated = data.get("updated")
+        return self._get_updated_at(updated).isoformat() if updated else ""
+
     def _get_updated_at(self, updated: str) -> datetime:
         return datetime.datetime.fromisoformat(updated)
 
@@ -59,9 +97,13 @@ class GTasksDataAdapter(AbstractDataAdapter):
 class GTasksList(AbstractService):
     # GOOGLE_TASKS_SCOPES = ["https://www.googleapis.com/auth/tasks"]  TODO remove me
 
-    GOOGLE_TASKS_GET_ALL_URL = "https://tasks.googleapis.com/tasks/v1/lists/{}/tasks?showCompleted=true&showHidden=true"
-    GOOGLE_TASKS_UPDATE_URL = "https://tasks.googleapis.com/tasks/v1/lists/{}/tasks/{}"
-    GOOGLE_TASKS_ADD_URL = "https://tasks.googleapis.com/tasks/v1/lists/{}/tasks"
+    GOOGLE_TASKS_GET_ALL_URL = (
+        GOOGLE_TASKS_API_URL
+        + "/tasks/v1/lists/{}/tasks?showCompleted=true&showHidden=true"
+    )
+    GOOGLE_TASKS_UPDATE_URL = GOOGLE_TASKS_API_URL + "/tasks/v1/lists/{}/tasks/{}"
+    GOOGLE_TASKS_ADD_URL = GOOGLE_TASKS_API_URL + "/tasks/v1/lists/{}/tasks"
+    GOOGLE_TASKS_BATCH_URL = GOOGLE_TASKS_API_URL + "/batch/tasks/v1"
 
     def __init__(
         self,
@@ -79,6 +121,7 @@ class GTasksList(AbstractService):
         self._session = aiohttp.ClientSession(
             raise_for_status=True,
             timeout=aiohttp.ClientTimeout(total=60),
+            trace_configs=[upstream_trace_config(self._count_request)],
         )
 
         self._headers = {"Authorization": f"Bearer {self._client_config['token']}"}
@@ -86,41 +129,82 @@ class GTasksList(AbstractService):
         self._db = db
 
     def refresh_token(func):
+        """Retry once with a refreshed token on 401, other failures are raised."""
+
         async def wrapper(self, *args, **kwargs):
             try:
                 return await func(self, *args, **kwargs)
             except aiohttp.ClientResponseError as e:
-                if e.status == 401:
-                    await self._refresh_token()
-                    return await func(self, *args, **kwargs)
-                else:
-                    logger.error(e)
+                if e.status != 401:
+                    raise
+            await self._refresh_token()
+            return await func(self, *args, **kwargs)
 
         return wrapper
 
-    async def _refresh_token(self) -> None:
-        async with self._session.post(
-            self._client_config["token_uri"],
-            data={
-                "client_id": self._client_config["client_id"],
-                "client_secret": self._client_config["client_secret"],
-                "refresh_token": self._client_config["refresh_token"],
-                "grant_type": "refresh_token",
-            },
-        ) as response:
-            data = await response.json()
-            self._client_config["token"] = data["access_token"]
-            self._client_config["expiry"] = data["expires_in"]
-            self._headers["Authorization"] = f"Bearer {data['access_token']}"
+    def log_transient(func):
+        """
+        Log transient failures of reads and give None. Permanent failures are
+        raised, see classify_failure. Writes raise every failure, the outbox
+        retries or dead-letters them.
+        """
 
+        async def wrapper(self, *args, **kwargs):
+            try:
+                return await func(self, *args, **kwargs)
+            except aiohttp.ClientResponseError as e:
+                if classify_failure(e).permanent:
+                    raise
+                logger.error(
+                    e, extra={"syncing_service_id": self._syncing_service_id}
+                )
+
+        return wrapper
+
+    async def _refresh_token(self) -> None:
+        try:
+            data = await refresh_access_token(self._client_config)
+        except aiohttp.ClientResponseError as e:
+            # invalid_grant, the refresh token was revoked or expired
+            if e.status in (400, 401):
+                raise ServiceError(
+                    FailureKind.AUTH_REVOKED, f"Google token refresh failed: {e}"
+                ) from e
+            raise
+        self._client_config["token"] = data["access_token"]
+        self._client_config["expiry"] = data["expires_in"]
+        self._headers["Authorization"] = f"Bearer {data['access_token']}"
+
+    @traced("google_tasks.get_all_items")
+    async def get_all_items(self) -> Optional[list[Item]]:
+        items = []
+        page_token = None
+        while True:
+            page = await self.get_items_page(page_token)
+            if page is None:
+                return None
+            page_items, page_token = page
+            items.extend(page_items)
+            if not page_token:
+                return items
+
+    @traced("google_tasks.get_items_page")
+    @log_transient
     @refresh_token
-    async def get_all_items(self) -> list[Item]:
-        async with self._session.get(
-            self._get_all_tasks_url, headers=self._headers
-        ) as response:
+    async def get_items_page(
+        self, page_token: Optional[str] = None
+    ) -> tuple[list[Item], Optional[str]]:
+        url = self._get_all_tasks_url
+        if page_token:
+            url = f"{url}&pageToken={quote(page_token)}"
+        async with self._session.get(url, headers=self._headers) as response:
             tasks_data = await response.json()
-            return self._data_adapter.dicts_to_items(tasks_data.get("items", []))
 
+        items = self._data_adapter.dicts_to_items(tasks_data.get("items", []))
+        return items, tasks_data.get("nextPageToken") or None
+
+    @traced("google_tasks.get_item_by_id")
+    @log_transient
     @refresh_token
     async def get_item_by_id(self, item_id: str) -> Item:
         url = self._update_task_url.format(item_id)
@@ -128,18 +212,27 @@ class GTasksList(AbstractService):
             task_data = await response.json()
             return self._data_adapter.dict_to_item(task_data)
 
+    @traced("google_tasks.update_item")
     @refresh_token
     async def update_item(self, item: Item) -> str:
-        async with self._session.put(
+        async with self._session.patch(
             self._update_task_url.format(item.google_task_id),
             headers=self._headers,
-            json=self._data_adapter.item_to_dict(item),
+            json=self._data_adapter.item_to_patch_dict(item),
         ) as response:
-            if response.status == 200:
-                return f"Task {item.google_task_id} updated successfully."
-            else:
-                return await response.json()
+            data = await response.json()
+
+        await SyncedItem.record_versions(
+            self._db,
+            syncing_service_id=self._syncing_service_id,
+            notion_id=item.notion_id,
+            notion_version=item.version,
+            google_task_version=self._data_adapter.get_version(data or {}),
+            fingerprint=item.fingerprint,
+        )
+        return f"Task {item.google_task_id} updated successfully."
 
+    @traced("google_tasks.add_item")
     @refresh_token
     async def add_item(self, item: Item) -> str:
         async with self._session.post(
@@ -149,10 +242,186 @@ class GTasksList(AbstractService):
         ) as response:
             data = await response.json()
             item.google_task_id = data.get("id")
-            await self._save_sync_ids(item)
+            await self._save_sync_ids(item, self._data_adapter.get_version(data))
+
+    @traced("google_tasks.add_items")
+    async def add_items(self, items: list[Item]) -> list[Optional[Exception]]:
+        """
+        Create tasks with batch requests and save their sync ids in bulk.
+        Tasks whose part failed are retried one by one, see _retry_failed.
+        Return None or the exception of every item, in order.
+        """
+        if not items:
+            return []
+
+        add_path = urlsplit(self._add_task_url).path
+        responses = await self._send_batches(
+            [
+                BatchPart("POST", add_path, self._data_adapter.item_to_dict(item))
+                for item in items
+            ]
+        )
+
+        synced_items = []
+        failed = []
+        errors = {}
+        for item, response in zip(items, responses):
+            if not self._is_retryable(response):
+                errors[id(item)] = self._batch_error(response)
+                continue
+            if not response.ok or not response.body.get("id"):
+                failed.append(item)
+                continue
+            item.google_task_id = response.body["id"]
+            synced_items.append(
+                SyncedItem.create_from_item(
+                    item,
+                    self._syncing_service_id,
+                    notion_version=item.version,
+                    google_task_version=self._data_adapter.get_version(response.body),
+                )
+            )
+        await SyncedItem.save_many(synced_items, self._db)
+
+        return await self._retry_failed(items, failed, errors, self.add_item)
+
+    @traced("google_tasks.update_items")
+    async def update_items(self, items: list[Item]) -> list[Optional[Exception]]:
+        """
+        Update tasks with batch requests and record their versions in bulk.
+        Tasks whose part failed are retried one by one, see _retry_failed.
+        Return None or the exception of every item, in order.
+        """
+        if not items:
+            return []
+
+        responses = await self._send_batches(
+            [
+                BatchPart(
+                    "PATCH",
+                    urlsplit(self._update_task_url.format(item.google_task_id)).path,
+                    self._data_adapter.item_to_patch_dict(item),
+                )
+                for item in items
+            ]
+        )
+
+        versions = []
+        failed = []
+        errors = {}
+        for item, response in zip(items, responses):
+            if not self._is_retryable(response):
+                errors[id(item)] = self._batch_error(response)
+                continue
+            if not response.ok:
+                failed.append(item)
+                continue
+            versions.append(
+                {
+                    "notion_id": item.notion_id,
+                    "notion_version": item.version,
+                    "google_task_version": self._data_adapter.get_version(
+                        response.body
+                    ),
+                    "fingerprint": item.fingerprint,
+                }
+            )
+        await SyncedItem.record_versions_many(
+            self._db, self._syncing_service_id, versions
+        )
+
+        return await self._retry_failed(items, failed, errors, self.update_item)
+
+    async def _send_batches(
+        self, parts: list[BatchPart]
+    ) -> list[BatchResponse | Exception]:
+        """
+        Response of every part, or the error of its batch when the whole
+        batch failed transiently (429, 5xx). Permanent failures are raised.
+        """
+        responses = []
+        for start in range(0, len(parts), GOOGLE_TASKS_BATCH_SIZE):
+            chunk = parts[start : start + GOOGLE_TASKS_BATCH_SIZE]
+            try:
+                responses.extend(await self._send_batch(chunk))
+            except aiohttp.ClientResponseError as e:
+                if classify_failure(e).permanent:
+                    raise
+                # the outbox retries its items on the next drain
+                logger.error(
+                    f"Google batch of {len(chunk)} parts failed: {e!r}",
+                    extra={"syncing_service_id": self._syncing_service_id},
+                )
+                responses.extend([e] * len(chunk))
+        return responses
 
-    async def _save_sync_ids(self, item: Item) -> None:
-        synced_item = SyncedItem.create_from_item(item, self._syncing_service_id)
+    @refresh_token
+    async def _send_batch(self, parts: list[BatchPart]) -> list[BatchResponse]:
+        boundary = new_boundary()
+        async with self._session.post(
+            self.GOOGLE_TASKS_BATCH_URL,
+            headers={
+                **self._headers,
+                "Content-Type": f"multipart/mixed; boundary={boundary}",
+            },
+            data=encode_batch(parts, boundary),
+        ) as response:
+            return decode_batch(
+                await response.read(),
+                response.headers.get("Content-Type", ""),
+                len(parts),
+            )
+
+    def _is_retryable(self, response: BatchResponse | Exception) -> bool:
+        """
+        Only parts which failed on their own are retried right away. Items of
+        a failed batch and rate limited parts are left to the outbox, more
+        requests now would only be rejected too.
+        """
+        return isinstance(response, BatchResponse) and response.status != 429
+
+    def _batch_error(self, response: BatchResponse | Exception) -> Exception:
+        if isinstance(response, Exception):
+            return response
+        return ServiceError(
+            classify_status(response.status),
+            f"Google batch part failed with status {response.status}",
+        )
+
+    async def _retry_failed(
+        self,
+        items: list[Item],
+        failed: list[Item],
+        errors: dict[int, Exception],
+        write,
+    ) -> list[Optional[Exception]]:
+        """
+        Write failed items one by one, at most GOOGLE_TASKS_RETRY_CONCURRENCY
+        at once. Return None or the exception of every item, in order.
+        """
+        slots = asyncio.Semaphore(GOOGLE_TASKS_RETRY_CONCURRENCY)
+
+        async def retry(item: Item):
+            async with slots:
+                return await write(item)
+
+        retried = await asyncio.gather(
+            *(retry(item) for item in failed), return_exceptions=True
+        )
+        errors.update(
+            (id(item), result)
+            for item, result in zip(failed, retried)
+            if isinstance(result, Exception)
+        )
+        return [errors.get(id(item)) for item in items]
+
+    async def _save_sync_ids(self, item: Item, google_task_version: str = "") -> None:
+        synced_item = SyncedItem.create_from_item(
+            item,
+            self._syncing_service_id,
+            notion_version=item.version,
+            google_task_version=google_task_version,
+        )
         await synced_item.save(self._db)
 
     @property
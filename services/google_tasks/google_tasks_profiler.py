@@ -1,12 +1,18 @@
 from functools import wraps
 
-import requests
+import aiohttp
 
+from config import GOOGLE_TASKS_API_URL
+from logger import get_logger
+from services.google_tasks.token_refresher import refresh_access_token
 from services.service import AbstractProfiler
+from utils.metrics import upstream_trace_config
+
+logger = get_logger(__name__)
 
 
 class GTasksProfiler(AbstractProfiler):
-    GET_TASK_LISTS_URL = "https://tasks.googleapis.com/tasks/v1/users/@me/lists/"
+    GET_TASK_LISTS_URL = GOOGLE_TASKS_API_URL + "/tasks/v1/users/@me/lists/"
 
     def __init__(
         self,
@@ -14,48 +20,45 @@ class GTasksProfiler(AbstractProfiler):
     ) -> None:
         self._client_config = client_config
 
-        self._session = requests.Session()
+        self._session = aiohttp.ClientSession(
+            raise_for_status=True,
+            timeout=aiohttp.ClientTimeout(total=60),
+            trace_configs=[upstream_trace_config()],
+        )
 
         self._headers = {"Authorization": f"Bearer {self._client_config['token']}"}
 
     def refresh_token(func):
         @wraps(func)
-        def wrapper(self, *args, **kwargs):
+        async def wrapper(self, *args, **kwargs):
             try:
-                return func(self, *args, **kwargs)
-            except requests.HTTPError as e:
-                if e.response.status_code == 401:
-                    self._refresh_token()
-                    return func(self, *args, **kwargs)
+                return await func(self, *args, **kwargs)
+            except aiohttp.ClientResponseError as e:
+                if e.status == 401:
+                    await self._refresh_token()
+                    return await func(self, *args, **kwargs)
                 else:
-                    return e.json()
+                    logger.error(e)
 
         return wrapper
 
-    def _refresh_token(self) -> None:
-        response = self._session.post(
-            self._client_config["token_uri"],
-            data={
-                "client_id": self._client_config["client_id"],
-                "client_secret": self._client_config["client_secret"],
-                "refresh_token": self._client_config["refresh_token"],
-                "grant_type": "refresh_token",
-            },
-        )
-        data = response.json()
+    async def _refresh_token(self) -> None:
+        data = await refresh_access_token(self._client_config)
         self._client_config["token"] = data["access_token"]
         self._client_config["expiry"] = data["expires_in"]
         self._headers["Authorization"] = f"Bearer {data['access_token']}"
 
     @refresh_token
-    def get_lists(self) -> dict[str, dict]:
-        response = self._session.get(
+    async def get_lists(self) -> dict[str, dict]:
+        async with self._session.get(
             self.GET_TASK_LISTS_URL,
             headers=self._headers,
-        )
-        response.raise_for_status()
-        tasks_data = response.json()
-        return self._database_result(tasks_data.get("items", []))
+        ) as response:
+            tasks_data = await response.json()
+            return self._database_result(tasks_data.get("items", []))
+
+    async def close(self) -> None:
+        await self._session.close()
 
     def _database_result(self, results: list[dict]) -> dict[str, dict]:
         return {
@@ -0,0 +1,43 @@
+import aiohttp
+
+from utils.metrics import TOKEN_REFRESHES, upstream_trace_config
+from utils.single_flight import SingleFlight
+
+_token_refresh_flight = SingleFlight()
+
+
+async def _request_access_token(client_config: dict) -> dict:
+    # its own session, the caller's may be closed while others share the flight
+    try:
+        async with aiohttp.ClientSession(
+            raise_for_status=True,
+            timeout=aiohttp.ClientTimeout(total=60),
+            trace_configs=[upstream_trace_config()],
+        ) as session, session.post(
+            client_config["token_uri"],
+            data={
+                "client_id": client_config["client_id"],
+                "client_secret": client_config["client_secret"],
+                "refresh_token": client_config["refresh_token"],
+                "grant_type": "refresh_token",
+            },
+        ) as response:
+            data = await response.json()
+    except Exception:
+        TOKEN_REFRESHES.labels(service="google_tasks", result="error").inc()
+        raise
+
+    TOKEN_REFRESHES.labels(service="google_tasks", result="success").inc()
+    return data
+
+
+async def refresh_access_token(client_config: dict) -> dict:
+    """
+    Exchange refresh token for a new access token.
+    Concurrent refreshes of the same token share one request.
+    """
+    return await _token_refresh_flight.do(
+        client_config["refresh_token"],
+        _request_access_token,
+        client_config,
+    )
@@ -1,13 +1,15 @@
 import datetime
-import uuid
+from typing import Optional
 
 import aiohttp
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from config import NOTION_VERSION
+from config import NOTION_API_URL, NOTION_VERSION
 from models.models import SyncedItem
-from schemas.Item import Item
+from schemas.Item import SYNCED_FIELDS, Item
 from services.service import AbstractDataAdapter, AbstractService
+from utils.metrics import upstream_trace_config
+from utils.tracing import traced
 
 
 class NotionDBDataAdapter(AbstractDataAdapter):
@@ -32,11 +34,10 @@ class NotionDBDataAdapter(AbstractDataAdapter):
     def item_to_dict(self, item: Item) -> dict:
         return {
             "object": "page",
-            "id": item.notion_id or str(uuid.uuid4()),
             "parent": {"type": "database_id", "database_id": self._database_id},
             "properties": {
                 "Checkbox": {"checkbox": item.status},
-                "Name": {
+                self._title_prop_name: {
                     "title": [
                         {
                             "text": {
@@ -49,6 +50,17 @@ class NotionDBDataAdapter(AbstractDataAdapter):
             },
         }
 
+    def item_to_patch_dict(self, item: Item) -> dict:
+        changed_fields = item.changed_fields or SYNCED_FIELDS
+        properties = {}
+        if "status" in changed_fields:
+            properties["Checkbox"] = {"checkbox": item.status}
+        if "name" in changed_fields:
+            properties[self._title_prop_name] = {
+                "title": [{"text": {"content": item.name}, "plain_text": item.name}]
+            }
+        return {"properties": properties}
+
     def dicts_to_items(self, data: list[dict]) -> list[Item]:
         items = []
         for item_data in data:
@@ -72,14 +84,19 @@ class NotionDBDataAdapter(AbstractDataAdapter):
     def _get_checkbox_status(self, data: dict) -> bool:
         return data.get("properties", {}).get("Checkbox", {}).get("checkbox", False)
 
+    def get_version(self, data: dict) -> str:
+        """Version of a page returned by a write, comparable with Item.version."""
+        updated = data.get("last_edited_time")
+        return self._get_updated_at(updated).isoformat() if updated else ""
+
     def _get_updated_at(self, updated: str) -> datetime:
         return datetime.datetime.fromisoformat(updated)
 
 
 class NotionDB(AbstractService):
-    DATABASE_URL_FORMAT = "https://api.notion.com/v1/databases/{}/query"
-    CREATE_PAGE_URL = "https://api.notion.com/v1/pages"
-    PAGE_URL_FORMAT = "https://api.notion.com/v1/pages/{}"
+    DATABASE_URL_FORMAT = NOTION_API_URL + "/v1/databases/{}/query"
+    CREATE_PAGE_URL = NOTION_API_URL + "/v1/pages"
+    PAGE_URL_FORMAT = NOTION_API_URL + "/v1/pages/{}"
 
     def __init__(
         self,
@@ -105,15 +122,38 @@ class NotionDB(AbstractService):
         self._syncing_service_id = syncing_service_id
 
         self._db = db
-        self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=60))
+        self._session = aiohttp.ClientSession(
+            raise_for_status=True,
+            timeout=aiohttp.ClientTimeout(total=60),
+            trace_configs=[upstream_trace_config(self._count_request)],
+        )
 
+    @traced("notion.get_all_items")
     async def get_all_items(self) -> list[Item]:
+        items = []
+        cursor = None
+        while True:
+            page, cursor = await self.get_items_page(cursor)
+            items.extend(page)
+            if not cursor:
+                return items
+
+    @traced("notion.get_items_page")
+    async def get_items_page(
+        self, cursor: Optional[str] = None
+    ) -> tuple[list[Item], Optional[str]]:
+        # first page is requested without body, as the API defaults allow
+        kwargs = {"json": {"start_cursor": cursor}} if cursor else {}
         async with self._session.post(
-            self._database_url, headers=self._headers
+            self._database_url, headers=self._headers, **kwargs
         ) as response:
             data = await response.json()
-            return self._data_adapter.dicts_to_items(data.get("results", []))
 
+        items = self._data_adapter.dicts_to_items(data.get("results", []))
+        next_cursor = data.get("next_cursor") if data.get("has_more") else None
+        return items, next_cursor or None
+
+    @traced("notion.get_item_by_id")
     async def get_item_by_id(self, item_id: str) -> Item:
         async with self._session.get(
             self.PAGE_URL_FORMAT.format(item_id), headers=self._headers
@@ -121,14 +161,26 @@ class NotionDB(AbstractService):
             data = await response.json()
             return self._data_adapter.dict_to_item(data)
 
+    @traced("notion.update_item")
     async def update_item(self, item: Item) -> str:
         async with self._session.patch(
             self.PAGE_URL_FORMAT.format(item.notion_id),
             headers=self._headers,
-            json=self._data_adapter.item_to_dict(item),
+            json=self._data_adapter.item_to_patch_dict(item),
         ) as response:
-            return await response.json()
+            data = await response.json()
+
+        await SyncedItem.record_versions(
+            self._db,
+            syncing_service_id=self._syncing_service_id,
+            notion_id=item.notion_id,
+            notion_version=self._data_adapter.get_version(data or {}),
+            google_task_version=item.version,
+            fingerprint=item.fingerprint,
+        )
+        return data
 
+    @traced("notion.add_item")
     async def add_item(self, item: Item) -> str:
         async with self._session.post(
             self.CREATE_PAGE_URL,
@@ -137,8 +189,13 @@ class NotionDB(AbstractService):
         ) as response:
             data = await response.json()
             item.notion_id = data.get("id")
-            await self._save_sync_ids(item)
-
-    async def _save_sync_ids(self, item: Item) -> None:
-        synced_item = SyncedItem.create_from_item(item, self._syncing_service_id)
+            await self._save_sync_ids(item, self._data_adapter.get_version(data))
+
+    async def _save_sync_ids(self, item: Item, notion_version: str = "") -> None:
+        synced_item = SyncedItem.create_from_item(
+            item,
+            self._syncing_service_id,
+            notion_version=notion_version,
+            google_task_version=item.version,
+        )
         await synced_item.save(self._db)
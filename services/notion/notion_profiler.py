@@ -1,11 +1,12 @@
-import requests
+import aiohttp
 
-from config import NOTION_VERSION
+from config import NOTION_API_URL, NOTION_VERSION
 from services.service import AbstractProfiler
+from utils.metrics import upstream_trace_config
 
 
 class NotionProfiler(AbstractProfiler):
-    SEARCH_URL = "https://api.notion.com/v1/search"
+    SEARCH_URL = NOTION_API_URL + "/v1/search"
 
     def __init__(
         self,
@@ -17,10 +18,13 @@ class NotionProfiler(AbstractProfiler):
             "Content-Type": "application/json",
             "Notion-Version": NOTION_VERSION,
         }
-        self._session = requests.Session()
+        self._session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=60),
+            trace_configs=[upstream_trace_config()],
+        )
 
-    def get_lists(self) -> list[dict]:
-        response = self._session.post(
+    async def get_lists(self) -> list[dict]:
+        async with self._session.post(
             self.SEARCH_URL,
             headers=self._headers,
             json={
@@ -34,9 +38,12 @@ class NotionProfiler(AbstractProfiler):
                     "timestamp": "last_edited_time",
                 },
             },
-        )
-        data = response.json()
-        return self._database_result(data.get("results", []))
+        ) as response:
+            data = await response.json()
+            return self._database_result(data.get("results", []))
+
+    async def close(self) -> None:
+        await self._session.close()
 
     def _database_result(self, results: list[dict]) -> dict:
         return {
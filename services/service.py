@@ -13,6 +13,11 @@ class AbstractDataAdapter(ABC):
     def item_to_dict(self, item: Item) -> dict:
         raise NotImplementedError
 
+    @abstractmethod
+    def item_to_patch_dict(self, item: Item) -> dict:
+        """Update payload with only the item's changed_fields."""
+        raise NotImplementedError
+
     @abstractmethod
     def dicts_to_items(self, data: list[dict]) -> list[Item]:
         raise NotImplementedError
@@ -23,11 +28,28 @@ class AbstractDataAdapter(ABC):
 
 
 class AbstractService(ABC):
+    # upstream requests made by the service so far
+    request_count = 0
+
+    @property
+    def syncing_service_id(self) -> str:
+        return self._syncing_service_id
+
+    def _count_request(self) -> None:
+        self.request_count += 1
+
+    async def close(self) -> None:
+        await self._session.close()
 
     @abstractmethod
     def get_all_items(self) -> list[Item]:
         raise NotImplementedError
 
+    @abstractmethod
+    def get_items_page(self, cursor: str = None) -> tuple[list[Item], str]:
+        """Page of items starting at cursor and the next page's cursor or None."""
+        raise NotImplementedError
+
     @abstractmethod
     def get_item_by_id(self, item_id: str) -> Item:
         raise NotImplementedError
@@ -49,5 +71,8 @@ class AbstractService(ABC):
 
 class AbstractProfiler(ABC):
 
-    def get_lists(self) -> list[dict]:
+    async def get_lists(self) -> list[dict]:
+        raise NotImplementedError
+
+    async def close(self) -> None:
         raise NotImplementedError
@@ -0,0 +1,38 @@
+import random
+
+from config import SYNC_BACKOFF_BASE, SYNC_BACKOFF_MAX
+
+
+class SyncBackoff:
+    """
+    Delay before the next cycle of a syncing service whose cycles fail.
+
+    Every consecutive failure doubles the delay, from `base_delay` up to
+    `max_delay`, with jitter so failing services do not retry in step.
+    A successful cycle resets it.
+    """
+
+    def __init__(
+        self,
+        base_delay: float = SYNC_BACKOFF_BASE,
+        max_delay: float = SYNC_BACKOFF_MAX,
+    ) -> None:
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._failures: dict[str, int] = {}
+
+    def failed(self, syncing_service_id: str) -> float:
+        """Record a failed cycle and return the delay before the next one."""
+        failures = self._failures.get(syncing_service_id, 0) + 1
+        self._failures[syncing_service_id] = failures
+        delay = min(self._max_delay, self._base_delay * 2 ** (failures - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def succeeded(self, syncing_service_id: str) -> None:
+        self._failures.pop(syncing_service_id, None)
+
+    def failures(self, syncing_service_id: str) -> int:
+        return self._failures.get(syncing_service_id, 0)
+
+
+sync_backoff = SyncBackoff()
@@ -0,0 +1,148 @@
+import asyncio
+import heapq
+import itertools
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+from config import SYNC_TENANT_CONCURRENCY, SYNC_WORKERS
+from utils.metrics import SYNC_QUEUE_WAIT, SYNC_QUEUED_CYCLES
+
+
+@dataclass(slots=True)
+class CycleUsage:
+    """Cost of a cycle, set by its runner before the slot is released."""
+
+    cost: float = 1.0
+
+
+class FairQueue:
+    """
+    Weighted fair queuing of sync cycles over `workers` shared slots.
+
+    Every syncing service has a virtual time advanced by the cost of its
+    cycles (upstream requests and items) divided by its weight. A free slot
+    goes to the waiting service with the lowest virtual time, so heavy
+    services get their share of capacity instead of a turn each, and cannot
+    starve light ones. A service runs at most `tenant_concurrency` cycles at
+    once. Services joining the queue start at the current virtual time.
+    """
+
+    def __init__(
+        self,
+        workers: int = SYNC_WORKERS,
+        tenant_concurrency: int = SYNC_TENANT_CONCURRENCY,
+    ) -> None:
+        self._workers = workers
+        self._tenant_concurrency = tenant_concurrency
+
+        self._virtual_time = 0.0
+        self._finish_times: dict[str, float] = {}
+        self._weights: dict[str, float] = {}
+        self._running: dict[str, int] = {}
+        # (start virtual time, sequence, service id, future)
+        self._waiting: list[tuple[float, int, str, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+        self._costs: dict[str, float] = defaultdict(float)
+        self._cycles: dict[str, int] = defaultdict(int)
+
+    def set_weight(self, syncing_service_id: str, weight: float) -> None:
+        self._weights[syncing_service_id] = weight
+
+    def forget(self, syncing_service_id: str) -> None:
+        """Drop state of a service which stopped syncing."""
+        for state in (
+            self._finish_times,
+            self._weights,
+            self._costs,
+            self._cycles,
+        ):
+            state.pop(syncing_service_id, None)
+
+    @asynccontextmanager
+    async def slot(self, syncing_service_id: str) -> AsyncIterator[CycleUsage]:
+        """Wait for a turn, run the cycle in the block and charge its cost."""
+        start = await self._acquire(syncing_service_id)
+        usage = CycleUsage()
+        try:
+            yield usage
+        finally:
+            self._release(syncing_service_id, start, usage.cost)
+
+    def shares(self) -> dict[str, dict]:
+        """Share of the consumed capacity achieved by every service."""
+        total = sum(self._costs.values())
+        return {
+            syncing_service_id: {
+                "weight": self._weights.get(syncing_service_id, 1.0),
+                "cycles": self._cycles[syncing_service_id],
+                "cost": cost,
+                "share": cost / total if total else 0.0,
+            }
+            for syncing_service_id, cost in self._costs.items()
+        }
+
+    async def _acquire(self, syncing_service_id: str) -> float:
+        loop = asyncio.get_running_loop()
+        start = max(
+            self._virtual_time, self._finish_times.get(syncing_service_id, 0.0)
+        )
+        future = loop.create_future()
+        heapq.heappush(
+            self._waiting, (start, next(self._sequence), syncing_service_id, future)
+        )
+        SYNC_QUEUED_CYCLES.inc()
+
+        queued = loop.time()
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # a waiter cancelled before its turn is dropped by _dispatch,
+            # one that got the slot meanwhile gives it back
+            if not future.cancelled():
+                self._release(syncing_service_id, start, 0.0)
+            raise
+        finally:
+            SYNC_QUEUED_CYCLES.dec()
+        SYNC_QUEUE_WAIT.observe(loop.time() - queued)
+        return start
+
+    def _release(self, syncing_service_id: str, start: float, cost: float) -> None:
+        self._running[syncing_service_id] -= 1
+        if not self._running[syncing_service_id]:
+            del self._running[syncing_service_id]
+
+        weight = self._weights.get(syncing_service_id, 1.0)
+        self._finish_times[syncing_service_id] = max(
+            self._finish_times.get(syncing_service_id, 0.0), start + cost / weight
+        )
+        self._costs[syncing_service_id] += cost
+        self._cycles[syncing_service_id] += 1
+        # a service queueing its next cycle right away competes for the slot
+        # with the tags it earned, instead of losing its turn as idle
+        asyncio.get_running_loop().call_soon(self._dispatch)
+
+    def _dispatch(self) -> None:
+        deferred = []
+        while self._waiting and sum(self._running.values()) < self._workers:
+            waiter = heapq.heappop(self._waiting)
+            start, _, syncing_service_id, future = waiter
+            if future.cancelled():
+                continue
+            running = self._running.get(syncing_service_id, 0)
+            if running >= self._tenant_concurrency:
+                deferred.append(waiter)
+                continue
+
+            self._running[syncing_service_id] = running + 1
+            self._virtual_time = max(self._virtual_time, start)
+            future.set_result(None)
+
+        for waiter in deferred:
+            heapq.heappush(self._waiting, waiter)
+
+
+fair_queue = FairQueue()
@@ -1,12 +1,110 @@
 import asyncio
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from typing import Iterator, Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from models.models import SyncedItem
+from config import (
+    SYNC_CYCLE_ITEM_BUDGET,
+    SYNC_CYCLE_TIME_BUDGET,
+    SYNC_OUTBOX_BATCH_SIZE,
+    SYNC_OUTBOX_MAX_ATTEMPTS,
+)
+from logger import get_logger
+from models.models import DeadLetter, OutboxEntry, PendingAdd, SyncedItem
+from schemas.Item import Item, item_from_dict, item_to_dict
 from services.google_tasks.google_tasks import GTasksList
-from schemas.Item import Item
 from services.notion.notion_db import NotionDB
 from synchronizers.synchronizer import Synchronizer
+from utils.metrics import (
+    SYNC_BUDGET_EXHAUSTED,
+    SYNC_CYCLE_DURATION,
+    SYNC_CYCLES_COALESCED,
+    SYNC_DEAD_LETTERS,
+    SYNC_ITEMS,
+    SYNC_STAGE_DURATION,
+)
+from utils.single_flight import SingleFlight
+from utils.tracing import tracer
+
+logger = get_logger(__name__)
+
+# running cycle of every syncing service, see NotionTasksSynchronizer.sync
+_cycles = SingleFlight()
+
+# ChangeSet list -> outbox target, operation and the item id keying the write.
+# Adds are keyed by the source item, the written one has no id yet.
+OUTBOX_WRITES = {
+    "google_tasks_add_list": ("google_tasks", "add", "notion_id"),
+    "google_tasks_update_list": ("google_tasks", "update", "google_task_id"),
+    "notion_rows_add_list": ("notion", "add", "google_task_id"),
+    "notion_rows_update_list": ("notion", "update", "notion_id"),
+}
+OUTBOX_LISTS = {
+    (target, operation): name for name, (target, operation, _) in OUTBOX_WRITES.items()
+}
+
+
+@dataclass(slots=True)
+class ChangeSet:
+    google_tasks_add_list: list[Item] = field(default_factory=list)
+    google_tasks_update_list: list[Item] = field(default_factory=list)
+    notion_rows_add_list: list[Item] = field(default_factory=list)
+    notion_rows_update_list: list[Item] = field(default_factory=list)
+    # unlinked notion rows with the google_task_id of their duplicate task
+    links: list[Item] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return any(
+            (
+                self.google_tasks_add_list,
+                self.google_tasks_update_list,
+                self.notion_rows_add_list,
+                self.notion_rows_update_list,
+                self.links,
+            )
+        )
+
+
+@dataclass(slots=True)
+class CycleBudget:
+    """Time (event loop deadline) and number of items a cycle may spend."""
+
+    deadline: float
+    items: int
+
+    @classmethod
+    def start(cls) -> "CycleBudget":
+        return cls(
+            deadline=asyncio.get_running_loop().time() + SYNC_CYCLE_TIME_BUDGET,
+            items=SYNC_CYCLE_ITEM_BUDGET,
+        )
+
+    @property
+    def exhausted(self) -> bool:
+        return self.items <= 0 or asyncio.get_running_loop().time() >= self.deadline
+
+    def spend(self, items: int) -> None:
+        self.items -= items
+
+
+@dataclass(slots=True)
+class FetchCheckpoint:
+    """Items and page cursors of a fetch spread over several cycles."""
+
+    notion_rows: list[Item] = field(default_factory=list)
+    google_tasks_list: list[Item] = field(default_factory=list)
+    notion_cursor: Optional[str] = None
+    google_tasks_cursor: Optional[str] = None
+    notion_done: bool = False
+    google_tasks_done: bool = False
+
+    @property
+    def done(self) -> bool:
+        return self.notion_done and self.google_tasks_done
 
 
 class NotionTasksSynchronizer(Synchronizer):
@@ -22,94 +120,562 @@ class NotionTasksSynchronizer(Synchronizer):
         self._google_task_list = google_tasks_service
         self._notion_db = notion_service
         self._db = db
+        self._syncing_service_id = notion_service.syncing_service_id
+        self._drain_lock = asyncio.Lock()
+        self._checkpoint: Optional[FetchCheckpoint] = None
+        # upstream requests and items of the last cycle, see FairQueue
+        self.last_cycle_cost = 0.0
 
     async def sync(self):
-        notion_rows, google_tasks_list = await asyncio.gather(
-            self._get_notion_rows(), self._get_google_tasks_list()
+        """
+        Run a cycle and return once its writes finished or its budget ran
+        out. Calls made while a cycle of the same service is running join
+        it instead of starting an overlapping one.
+        """
+        if _cycles.in_flight(self._syncing_service_id):
+            SYNC_CYCLES_COALESCED.inc()
+        await _cycles.do(self._syncing_service_id, self._sync_cycle)
+
+    def cancel(self) -> None:
+        """Cancel the running cycle, planned writes stay in the outbox."""
+        _cycles.cancel(self._syncing_service_id)
+
+    async def close(self) -> None:
+        """Close upstream sessions, the db session belongs to the caller."""
+        await self._notion_db.close()
+        await self._google_task_list.close()
+
+    async def _sync_cycle(self) -> None:
+        started = time.perf_counter()
+        requests = self._request_count()
+        budget = CycleBudget.start()
+        with tracer.span("sync", syncing_service_id=self._syncing_service_id):
+            # writes planned by an earlier cycle or process go first, so the
+            # diff sees them applied instead of planning them again
+            await self.drain(budget)
+            # once the budget ran out the rest waits for the next cycle
+            if not budget.exhausted:
+                fetched = await self.fetch(budget)
+                if fetched is not None:
+                    await self.plan(self.diff(*fetched))
+                    await self.drain(budget)
+        SYNC_CYCLE_DURATION.observe(time.perf_counter() - started)
+        self.last_cycle_cost = (
+            self._request_count() - requests + SYNC_CYCLE_ITEM_BUDGET - budget.items
         )
 
-        # compare notion_rows and google_tasks_list
-        (
-            google_tasks_add_list,
-            google_tasks_update_list,
-            notion_rows_add_list,
-            notion_rows_update_list,
-        ) = self._compare(notion_rows, google_tasks_list)
+    def _request_count(self) -> int:
+        return self._notion_db.request_count + self._google_task_list.request_count
+
+    async def fetch(
+        self, budget: Optional["CycleBudget"] = None
+    ) -> Optional[tuple[list[Item], list[Item]]]:
+        """
+        Get items from both services with ids of their synced counterparts.
+        When the budget runs out before the last page, or a Google Tasks page
+        failed, the cursors and items fetched so far are kept and None is
+        returned. The next call continues from there, so huge tenants are
+        fetched over several cycles and only complete lists are diffed.
+        """
+        checkpoint = self._checkpoint or FetchCheckpoint()
+        self._checkpoint = None
+        with self._stage("fetch"):
+            while not checkpoint.done:
+                fetched = await asyncio.gather(
+                    self._fetch_notion_page(checkpoint),
+                    self._fetch_google_tasks_page(checkpoint),
+                )
+                if None in fetched:
+                    self._checkpoint = checkpoint
+                    return None
+                if budget is None:
+                    continue
+                budget.spend(sum(fetched))
+                if budget.exhausted and not checkpoint.done:
+                    self._checkpoint = checkpoint
+                    SYNC_BUDGET_EXHAUSTED.labels(stage="fetch").inc()
+                    return None
+
+        with self._stage("map"):
+            synced_items = await SyncedItem.get_all_by_service(
+                self._db, self._syncing_service_id
+            )
+            notion_rows = self._map_notion_rows(checkpoint.notion_rows, synced_items)
+            google_tasks_list = self._map_google_tasks_list(
+                checkpoint.google_tasks_list, synced_items
+            )
+
+        return notion_rows, google_tasks_list
 
-        asyncio.create_task(
-            self._update_google_tasks(google_tasks_add_list, google_tasks_update_list)
+    async def _fetch_notion_page(self, checkpoint: "FetchCheckpoint") -> int:
+        if checkpoint.notion_done:
+            return 0
+        items, checkpoint.notion_cursor = await self._notion_db.get_items_page(
+            checkpoint.notion_cursor
         )
-        asyncio.create_task(
-            self._update_notion_rows(notion_rows_add_list, notion_rows_update_list)
+        checkpoint.notion_rows.extend(items)
+        checkpoint.notion_done = not checkpoint.notion_cursor
+        return len(items)
+
+    async def _fetch_google_tasks_page(
+        self, checkpoint: "FetchCheckpoint"
+    ) -> Optional[int]:
+        """Return None when the request failed, the page is fetched again."""
+        if checkpoint.google_tasks_done:
+            return 0
+        page = await self._google_task_list.get_items_page(
+            checkpoint.google_tasks_cursor
         )
+        if page is None:
+            return None
+        items, checkpoint.google_tasks_cursor = page
+        checkpoint.google_tasks_list.extend(items)
+        checkpoint.google_tasks_done = not checkpoint.google_tasks_cursor
+        return len(items)
 
-    async def _get_notion_rows(self) -> list[Item]:
-        items = await self._notion_db.get_all_items()
-        for item in items:
-            synced_item = await SyncedItem.get_by_sync_id(
-                notion_id=item.notion_id, db=self._db
+    def diff(
+        self, notion_rows: list[Item], google_tasks_list: list[Item]
+    ) -> ChangeSet:
+        with self._stage("diff"):
+            (
+                google_tasks_add_list,
+                google_tasks_update_list,
+                notion_rows_add_list,
+                notion_rows_update_list,
+                links,
+            ) = self._compare(notion_rows, google_tasks_list)
+
+            return ChangeSet(
+                google_tasks_add_list=list(google_tasks_add_list),
+                google_tasks_update_list=list(google_tasks_update_list),
+                notion_rows_add_list=list(notion_rows_add_list),
+                notion_rows_update_list=list(notion_rows_update_list),
+                links=links,
+            )
+
+    async def apply(self, change_set: ChangeSet) -> None:
+        """Write changes to both services, return when all writes finished."""
+        await self.plan(change_set)
+        await self.drain()
+
+    async def plan(self, change_set: ChangeSet) -> None:
+        """
+        Store the diff result in the outbox. Writes in the dead-letter store
+        are left out while their item is unchanged.
+        Every step commits on its own and the outbox is written last, so a
+        plan cut short only leaves links, cleared ledger keys or deleted
+        stale letters behind, and the next diff plans its writes again.
+        """
+        with self._stage("plan"):
+            await SyncedItem.save_many(
+                [
+                    SyncedItem.create_from_item(
+                        item, self._syncing_service_id, notion_version=item.version
+                    )
+                    for item in change_set.links
+                ],
+                self._db,
+            )
+            # the diff found no item created by earlier attempts of these adds
+            add_keys = [
+                item.idempotency_key
+                for item in change_set.google_tasks_add_list
+                + change_set.notion_rows_add_list
+            ]
+            await PendingAdd.delete_many(self._db, self._syncing_service_id, add_keys)
+            change_set = await self._skip_dead_letters(change_set)
+            await OutboxEntry.enqueue(
+                self._db,
+                self._syncing_service_id,
+                [
+                    {
+                        "target": target,
+                        "operation": operation,
+                        "item_key": getattr(item, key),
+                        "payload": json.dumps(item_to_dict(item)),
+                    }
+                    for name, (target, operation, key) in OUTBOX_WRITES.items()
+                    for item in getattr(change_set, name)
+                ],
+            )
+
+    async def _skip_dead_letters(self, change_set: ChangeSet) -> ChangeSet:
+        """
+        Drop writes that were dead-lettered with the same item content.
+        Letters of items edited since are deleted, their write goes ahead.
+        """
+        letters = {
+            (letter.target, letter.operation, letter.item_key): letter
+            for letter in await DeadLetter.get_all(self._db, self._syncing_service_id)
+        }
+        if not letters:
+            return change_set
+
+        stale = []
+        kept = {}
+        for name, (target, operation, key) in OUTBOX_WRITES.items():
+            kept[name] = []
+            for item in getattr(change_set, name):
+                letter = letters.get((target, operation, getattr(item, key)))
+                if letter is None:
+                    kept[name].append(item)
+                elif letter.fingerprint != item.fingerprint:
+                    stale.append(letter.id)
+                    kept[name].append(item)
+        await DeadLetter.delete_many(self._db, stale)
+        return replace(change_set, **kept)
+
+    async def drain(self, budget: Optional["CycleBudget"] = None) -> None:
+        """
+        Apply planned writes in batches of SYNC_OUTBOX_BATCH_SIZE. Applied
+        entries are deleted, failed ones stay for the next drain. Once the
+        budget ran out no batch is started, the rest stays too.
+        """
+        async with self._drain_lock:
+            after = ""
+            while True:
+                limit = SYNC_OUTBOX_BATCH_SIZE
+                if budget is not None:
+                    if budget.exhausted:
+                        if await OutboxEntry.has_pending(
+                            self._db, self._syncing_service_id
+                        ):
+                            SYNC_BUDGET_EXHAUSTED.labels(stage="apply").inc()
+                        return
+                    limit = min(limit, budget.items)
+
+                entries = await OutboxEntry.get_pending(
+                    self._db, self._syncing_service_id, limit, after
+                )
+                if not entries:
+                    return
+                with self._stage("apply"):
+                    await self._apply_entries(entries)
+                if budget is not None:
+                    budget.spend(len(entries))
+                after = entries[-1].id
+
+    async def _apply_entries(self, entries: list[OutboxEntry]) -> None:
+        done, failed = [], []
+        writes = [
+            (entry, item_from_dict(json.loads(entry.payload))) for entry in entries
+        ]
+        writes = await self._skip_applied_adds(writes, done)
+        writes = await self._skip_unconfirmed_adds(writes)
+
+        change_set = ChangeSet()
+        planned = []
+        for entry, item in writes:
+            getattr(change_set, OUTBOX_LISTS[entry.target, entry.operation]).append(
+                item
             )
+            planned.append((entry, item))
+        fingerprints = {entry.id: item.fingerprint for entry, item in planned}
+
+        # keys before the writes set ids of created items
+        add_keys = {
+            id(item): item.idempotency_key
+            for entry, item in planned
+            if entry.operation == "add"
+        }
+        await PendingAdd.add_many(
+            self._db, self._syncing_service_id, list(add_keys.values())
+        )
+
+        google_results, notion_results = await asyncio.gather(
+            self._update_google_tasks(
+                change_set.google_tasks_add_list,
+                change_set.google_tasks_update_list,
+            ),
+            self._update_notion_rows(
+                change_set.notion_rows_add_list,
+                change_set.notion_rows_update_list,
+            ),
+        )
+        results = {
+            id(item): result
+            for item, result in zip(
+                [
+                    *change_set.google_tasks_add_list,
+                    *change_set.google_tasks_update_list,
+                    *change_set.notion_rows_add_list,
+                    *change_set.notion_rows_update_list,
+                ],
+                [*google_results, *notion_results],
+            )
+        }
+        linked_keys = []
+        errors = {}
+        buried = []
+        for entry, item in planned:
+            result = results[id(item)]
+            if self._is_applied(entry, item, result):
+                done.append(entry.id)
+                if id(item) in add_keys:
+                    linked_keys.append(add_keys[id(item)])
+                continue
+
+            errors[entry.id] = self._write_error(entry, result)
+            if entry.attempts + 1 < SYNC_OUTBOX_MAX_ATTEMPTS:
+                failed.append(entry.id)
+                continue
+            logger.warning(
+                f"Dead-lettering {entry.operation} of {entry.item_key} to "
+                f"{entry.target} after {entry.attempts + 1} attempts: "
+                f"{errors[entry.id]}",
+                extra={"syncing_service_id": self._syncing_service_id},
+            )
+            SYNC_DEAD_LETTERS.labels(
+                target=entry.target, operation=entry.operation
+            ).inc()
+            buried.append(entry)
+
+        await PendingAdd.delete_many(self._db, self._syncing_service_id, linked_keys)
+        await DeadLetter.bury(self._db, buried, fingerprints, errors)
+        await OutboxEntry.complete(self._db, done, failed, errors)
+
+    async def _skip_applied_adds(
+        self, writes: list[tuple[OutboxEntry, Item]], done: list[str]
+    ) -> list[tuple[OutboxEntry, Item]]:
+        """
+        Adds whose source item already has a synced pair were applied before
+        their entry got deleted, writing them again would duplicate the item.
+        """
+        applied = set()
+        for name, (target, operation, key) in OUTBOX_WRITES.items():
+            if operation != "add":
+                continue
+            applied |= {
+                (target, item_key)
+                for item_key in await SyncedItem.get_synced_ids(
+                    self._db,
+                    self._syncing_service_id,
+                    key,
+                    [
+                        entry.item_key
+                        for entry, _ in writes
+                        if (entry.target, entry.operation) == (target, operation)
+                    ],
+                )
+            }
+
+        pending = []
+        linked_keys = []
+        for entry, item in writes:
+            if entry.operation == "add" and (entry.target, entry.item_key) in applied:
+                done.append(entry.id)
+                linked_keys.append(item.idempotency_key)
+            else:
+                pending.append((entry, item))
+
+        await PendingAdd.delete_many(self._db, self._syncing_service_id, linked_keys)
+        return pending
+
+    async def _skip_unconfirmed_adds(
+        self, writes: list[tuple[OutboxEntry, Item]]
+    ) -> list[tuple[OutboxEntry, Item]]:
+        """
+        Adds in the PendingAdd ledger were sent before and may have created
+        their item upstream. They wait for the next diff, which links the
+        created item or plans the add again.
+        """
+        unconfirmed = await PendingAdd.get_keys(
+            self._db,
+            self._syncing_service_id,
+            [
+                item.idempotency_key
+                for entry, item in writes
+                if entry.operation == "add"
+            ],
+        )
+        return [
+            (entry, item)
+            for entry, item in writes
+            if entry.operation != "add" or item.idempotency_key not in unconfirmed
+        ]
+
+    def _write_error(self, entry: OutboxEntry, result) -> str:
+        if isinstance(result, Exception):
+            return repr(result)
+        return f"{entry.target} returned no id of the created item"
+
+    def _is_applied(self, entry: OutboxEntry, item: Item, result) -> bool:
+        if isinstance(result, Exception):
+            return False
+        if entry.operation == "add":
+            # services log and swallow some errors, a created item has its id
+            if entry.target == "google_tasks":
+                return bool(item.google_task_id)
+            return bool(item.notion_id)
+        return True
+
+    @contextmanager
+    def _stage(self, name: str) -> Iterator[None]:
+        with tracer.span(
+            f"sync.{name}", syncing_service_id=self._syncing_service_id
+        ), SYNC_STAGE_DURATION.labels(stage=name).time():
+            yield
+
+    def _map_notion_rows(
+        self, items: list[Item], synced_items: list[SyncedItem]
+    ) -> list[Item]:
+        by_notion_id = {synced.notion_id: synced for synced in synced_items}
+        for item in items:
+            synced_item = by_notion_id.get(item.notion_id)
             if synced_item:
                 item.google_task_id = synced_item.google_task_id
+                item.synced_version = synced_item.notion_version or ""
+                item.synced_fingerprint = synced_item.fingerprint or ""
 
         return items
 
-    async def _get_google_tasks_list(self) -> list[Item]:
-        items = await self._google_task_list.get_all_items() or []
+    def _map_google_tasks_list(
+        self, items: list[Item], synced_items: list[SyncedItem]
+    ) -> list[Item]:
+        by_task_id = {synced.google_task_id: synced for synced in synced_items}
         for item in items:
-            synced_item = await SyncedItem.get_by_sync_id(
-                google_task_id=item.google_task_id, db=self._db
-            )
+            synced_item = by_task_id.get(item.google_task_id)
             if synced_item:
                 item.notion_id = synced_item.notion_id
+                item.synced_version = synced_item.google_task_version or ""
+                item.synced_fingerprint = synced_item.fingerprint or ""
 
         return items
 
     def _compare(
         self, notion_rows: list[Item], google_tasks_list: list[Item]
     ) -> tuple[list[Item]]:
-        new_items_notion = filter(lambda x: not x.notion_id, google_tasks_list)
-        new_items_google = filter(lambda x: not x.google_task_id, notion_rows)
+        new_items_google, new_items_notion, links = self._link_duplicates(
+            [item for item in notion_rows if not item.google_task_id],
+            [item for item in google_tasks_list if not item.notion_id],
+        )
 
         synced_items_google = filter(lambda x: x.notion_id != "", google_tasks_list)
+        notion_rows_by_id = {item.notion_id: item for item in notion_rows}
 
         notion_rows_update_list = []
         google_tasks_update_list = []
 
         for item in synced_items_google:
-            notion_item = next(
-                filter(lambda x: x.notion_id == item.notion_id, notion_rows), None
-            )
-            if notion_item != item:
-                # compare them by update time
-                if notion_item.updated_at < item.updated_at:
-                    # google task is newer
-                    notion_rows_update_list.append(item)
-                else:
-                    # notion row is newer
-                    google_tasks_update_list.append(notion_item)
+            notion_item = notion_rows_by_id.get(item.notion_id)
+            if notion_item is None:
+                continue
+            if notion_item.fingerprint == item.fingerprint:
+                # synced content is the same on both sides
+                continue
+
+            changed_fields = item.diff_fields(notion_item)
+            if self._google_task_is_newer(notion_item, item):
+                item.changed_fields = changed_fields
+                notion_rows_update_list.append(item)
+            else:
+                notion_item.changed_fields = changed_fields
+                google_tasks_update_list.append(notion_item)
 
         return (
             new_items_google,
             google_tasks_update_list,
             new_items_notion,
             notion_rows_update_list,
+            links,
         )
 
+    def _link_duplicates(
+        self, new_notion_rows: list[Item], new_google_tasks: list[Item]
+    ) -> tuple[list[Item], list[Item], list[Item]]:
+        """
+        Pair unlinked items with the same content on both sides, such as a
+        task whose add succeeded upstream but whose ids were never saved.
+        Linking them instead of adding each to the other side keeps item
+        counts stable under retries.
+        Return notion rows and google tasks left to add, and the links.
+        """
+        google_tasks_by_fingerprint = {}
+        for task in new_google_tasks:
+            google_tasks_by_fingerprint.setdefault(task.fingerprint, []).append(task)
+
+        notion_rows_to_add = []
+        links = []
+        linked_task_ids = set()
+        for row in new_notion_rows:
+            duplicates = google_tasks_by_fingerprint.get(row.fingerprint)
+            if not duplicates:
+                notion_rows_to_add.append(row)
+                continue
+            task = duplicates.pop(0)
+            row.google_task_id = task.google_task_id
+            linked_task_ids.add(task.google_task_id)
+            links.append(row)
+
+        google_tasks_to_add = [
+            task
+            for task in new_google_tasks
+            if task.google_task_id not in linked_task_ids
+        ]
+        return notion_rows_to_add, google_tasks_to_add, links
+
+    def _google_task_is_newer(self, notion_item: Item, google_task: Item) -> bool:
+        synced_fingerprint = google_task.synced_fingerprint
+        if synced_fingerprint:
+            # the side whose content differs from the last synced one changed
+            notion_changed = notion_item.fingerprint != synced_fingerprint
+            google_changed = google_task.fingerprint != synced_fingerprint
+            if notion_changed != google_changed:
+                return google_changed
+
+        notion_changed = notion_item.changed_since_sync
+        google_changed = google_task.changed_since_sync
+        if notion_changed != google_changed:
+            # the other side only carries our own last write, ignore its time
+            return google_changed
+
+        # compare them by update time
+        return notion_item.updated_at < google_task.updated_at
+
     async def _update_google_tasks(
         self, google_tasks_add_list: list[Item], google_tasks_update_list: list[Item]
-    ):
-        for item in google_tasks_add_list:
-            asyncio.create_task(self._google_task_list.add_item(item))
-
-        for item in google_tasks_update_list:
-            asyncio.create_task(self._google_task_list.update_item(item))
+    ) -> list:
+        # google tasks are written with batch requests, one result per item
+        batches = (google_tasks_add_list, google_tasks_update_list)
+        batch_results = await asyncio.gather(
+            self._google_task_list.add_items(google_tasks_add_list),
+            self._google_task_list.update_items(google_tasks_update_list),
+            return_exceptions=True,
+        )
+        results = []
+        for items, items_results in zip(batches, batch_results):
+            if isinstance(items_results, Exception):
+                items_results = [items_results] * len(items)
+            results.extend(items_results)
+        self._count_items(results, "google_tasks", len(google_tasks_add_list))
+        self._log_errors(results, "Google Tasks")
+        return results
 
     async def _update_notion_rows(
         self, notion_rows_add_list: list[Item], notion_rows_update_list: list[Item]
-    ):
-        for item in notion_rows_add_list:
-            asyncio.create_task(self._notion_db.add_item(item))
+    ) -> list:
+        results = await asyncio.gather(
+            *(self._notion_db.add_item(item) for item in notion_rows_add_list),
+            *(self._notion_db.update_item(item) for item in notion_rows_update_list),
+            return_exceptions=True,
+        )
+        self._count_items(results, "notion", len(notion_rows_add_list))
+        self._log_errors(results, "Notion")
+        return results
+
+    def _count_items(self, results: list, service_name: str, added: int) -> None:
+        """Results are gathered adds first, then updates."""
+        for index, result in enumerate(results):
+            SYNC_ITEMS.labels(
+                service=service_name,
+                operation="add" if index < added else "update",
+                result="error" if isinstance(result, Exception) else "success",
+            ).inc()
 
-        for item in notion_rows_update_list:
-            asyncio.create_task(self._notion_db.update_item(item))
+    def _log_errors(self, results: list, service_name: str) -> None:
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(
+                    f"Error while writing to {service_name}: {result!r}",
+                    extra={"syncing_service_id": self._syncing_service_id},
+                )
@@ -0,0 +1,425 @@
+import asyncio
+import json
+import math
+import os
+import socket
+import time
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import (
+    AsyncContextManager,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Optional,
+)
+
+from redis.exceptions import RedisError
+
+from config import (
+    SYNC_APPLY_CONCURRENCY,
+    SYNC_CYCLE_TTL,
+    SYNC_DIFF_CONCURRENCY,
+    SYNC_FETCH_CONCURRENCY,
+    SYNC_STREAM_BLOCK_MS,
+    SYNC_STREAM_CLAIM_IDLE_MS,
+    SYNC_STREAM_MAX_DELIVERIES,
+    SYNC_STREAM_MAXLEN,
+    SYNC_STREAM_PREFIX,
+)
+from logger import get_logger
+from redis_client import RedisClient
+from schemas.Item import (
+    item_from_dict,
+    item_to_dict,
+    items_from_dicts,
+    items_to_dicts,
+)
+from synchronizers.notion_tasks_synchronizer import ChangeSet, NotionTasksSynchronizer
+from utils.metrics import (
+    SYNC_PIPELINE_DROPPED,
+    SYNC_PIPELINE_IN_PROGRESS,
+    SYNC_PIPELINE_LAG,
+    SYNC_PIPELINE_PENDING,
+)
+
+logger = get_logger(__name__)
+
+SynchronizerLoader = Callable[
+    [str], AsyncContextManager[Optional[NotionTasksSynchronizer]]
+]
+# called with the error of a failed cycle or None, returns the delay before
+# the next cycle, None once the service must not sync any more
+CycleHandler = Callable[[str, Optional[Exception]], Awaitable[Optional[float]]]
+
+QUARANTINED = "quarantined"
+
+
+class Stage(ABC):
+    """
+    One step of the sync pipeline.
+    `concurrency` consumers read the stage stream through a shared consumer
+    group and ack a message only after it was handled. Messages of a crashed
+    consumer are claimed by another one after SYNC_STREAM_CLAIM_IDLE_MS.
+    With a cycle handler, a failed message is acked and ends the cycle, see
+    SyncPipeline.end_cycle. Without one, a message failing
+    SYNC_STREAM_MAX_DELIVERIES deliveries is acked and dropped, and the
+    cycle of its service finished.
+    """
+
+    name: str
+
+    def __init__(self, pipeline: "SyncPipeline", concurrency: int) -> None:
+        self._pipeline = pipeline
+        self._concurrency = concurrency
+        self._tasks: list[asyncio.Task] = []
+
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.in_progress = 0
+        self.last_duration = 0.0
+        self.total_duration = 0.0
+
+    @property
+    def stream(self) -> str:
+        return f"{self._pipeline.prefix}:{self.name}"
+
+    @abstractmethod
+    async def handle(self, syncing_service_id: str, payload: dict) -> None:
+        raise NotImplementedError
+
+    def start(self) -> None:
+        for number in range(self._concurrency):
+            consumer = f"{socket.gethostname()}-{os.getpid()}-{self.name}-{number}"
+            self._tasks.append(asyncio.create_task(self._consume(consumer)))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self._concurrency,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "in_progress": self.in_progress,
+            "last_duration": self.last_duration,
+            "mean_duration": self.total_duration / self.processed
+            if self.processed
+            else 0.0,
+        }
+
+    async def _consume(self, consumer: str) -> None:
+        redis = self._pipeline.redis
+        while True:
+            try:
+                messages = await redis.stream_claim_stale(
+                    self.stream,
+                    self._pipeline.group,
+                    consumer,
+                    min_idle_ms=SYNC_STREAM_CLAIM_IDLE_MS,
+                )
+                if not messages:
+                    messages = await redis.stream_read_group(
+                        self.stream,
+                        self._pipeline.group,
+                        consumer,
+                        block_ms=SYNC_STREAM_BLOCK_MS,
+                    )
+                for message_id, fields in messages:
+                    await self._process(message_id, fields)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Stage {self.name} consumer {consumer} failed: {e!r}")
+                await asyncio.sleep(1)
+
+    async def _process(self, message_id: str, fields: dict) -> None:
+        syncing_service_id = fields["syncing_service_id"]
+        started = time.perf_counter()
+        self.in_progress += 1
+        try:
+            await self.handle(syncing_service_id, json.loads(fields["payload"]))
+        except Exception as e:
+            self.failed += 1
+            logger.error(
+                f"Stage {self.name} failed for service {syncing_service_id}: {e!r}"
+            )
+            if self._pipeline.handles_cycles:
+                await self._pipeline.end_cycle(syncing_service_id, e)
+                await self._pipeline.redis.stream_ack(
+                    self.stream, self._pipeline.group, message_id
+                )
+            else:
+                await self._drop_poison(message_id, syncing_service_id)
+            return
+        finally:
+            self.in_progress -= 1
+
+        await self._pipeline.redis.stream_ack(
+            self.stream, self._pipeline.group, message_id
+        )
+        self.processed += 1
+        self.last_duration = time.perf_counter() - started
+        self.total_duration += self.last_duration
+
+    async def _drop_poison(self, message_id: str, syncing_service_id: str) -> None:
+        """
+        A failed message is not acked and is claimed again after
+        SYNC_STREAM_CLAIM_IDLE_MS, unless it failed too many deliveries.
+        """
+        redis = self._pipeline.redis
+        deliveries = await redis.stream_delivery_count(
+            self.stream, self._pipeline.group, message_id
+        )
+        if deliveries < SYNC_STREAM_MAX_DELIVERIES:
+            return
+
+        logger.error(
+            f"Dropping stage {self.name} message {message_id} of service "
+            f"{syncing_service_id} after {deliveries} deliveries",
+            extra={"syncing_service_id": syncing_service_id},
+        )
+        await redis.stream_ack(self.stream, self._pipeline.group, message_id)
+        await self._pipeline.finish_cycle(syncing_service_id)
+        self.dropped += 1
+
+
+class FetchStage(Stage):
+    name = "fetch"
+
+    async def handle(self, syncing_service_id: str, payload: dict) -> None:
+        async with self._pipeline.synchronizer(syncing_service_id) as synchronizer:
+            if synchronizer is None:
+                await self._pipeline.finish_cycle(syncing_service_id)
+                return
+            fetched = await synchronizer.fetch()
+            if fetched is None:
+                # a page failed, the next cycle fetches it again
+                await self._pipeline.finish_cycle(syncing_service_id)
+                return
+            notion_rows, google_tasks_list = fetched
+
+        await self._pipeline.emit(
+            DiffStage.name,
+            syncing_service_id,
+            {
+                "notion_rows": items_to_dicts(notion_rows),
+                "google_tasks_list": items_to_dicts(google_tasks_list),
+            },
+        )
+
+
+class DiffStage(Stage):
+    name = "diff"
+
+    async def handle(self, syncing_service_id: str, payload: dict) -> None:
+        async with self._pipeline.synchronizer(syncing_service_id) as synchronizer:
+            if synchronizer is None:
+                await self._pipeline.finish_cycle(syncing_service_id)
+                return
+            change_set = synchronizer.diff(
+                items_from_dicts(payload["notion_rows"]),
+                items_from_dicts(payload["google_tasks_list"]),
+            )
+
+        if not change_set:
+            await self._pipeline.end_cycle(syncing_service_id)
+            return
+
+        await self._pipeline.emit(
+            ApplyStage.name,
+            syncing_service_id,
+            {
+                "google_tasks_add_list": items_to_dicts(
+                    change_set.google_tasks_add_list
+                ),
+                "google_tasks_update_list": items_to_dicts(
+                    change_set.google_tasks_update_list
+                ),
+                "notion_rows_add_list": items_to_dicts(change_set.notion_rows_add_list),
+                "notion_rows_update_list": items_to_dicts(
+                    change_set.notion_rows_update_list
+                ),
+                "links": items_to_dicts(change_set.links),
+            },
+        )
+
+
+class ApplyStage(Stage):
+    name = "apply"
+
+    async def handle(self, syncing_service_id: str, payload: dict) -> None:
+        async with self._pipeline.synchronizer(syncing_service_id) as synchronizer:
+            if synchronizer is not None:
+                await synchronizer.apply(
+                    ChangeSet(
+                        **{
+                            name: items_from_dicts(items)
+                            for name, items in payload.items()
+                        }
+                    )
+                )
+        await self._pipeline.end_cycle(syncing_service_id)
+
+
+class SyncPipeline:
+    """
+    Sync split into fetch -> diff -> apply stages connected by Redis Streams.
+
+    Each stage scales on its own (SYNC_*_CONCURRENCY). A service has at most
+    one cycle in the pipeline, `submit` is a no-op until the previous cycle
+    applied its writes or SYNC_CYCLE_TTL passed, and while the service backs
+    off or is quarantined after a failed cycle, see `end_cycle`.
+    """
+
+    group = "sync-pipeline"
+
+    def __init__(
+        self,
+        redis: RedisClient,
+        synchronizer_loader: Optional[SynchronizerLoader] = None,
+        cycle_handler: Optional[CycleHandler] = None,
+        prefix: str = SYNC_STREAM_PREFIX,
+        fetch_concurrency: int = SYNC_FETCH_CONCURRENCY,
+        diff_concurrency: int = SYNC_DIFF_CONCURRENCY,
+        apply_concurrency: int = SYNC_APPLY_CONCURRENCY,
+    ) -> None:
+        self.redis = redis
+        self.prefix = prefix
+        self._synchronizer_loader = synchronizer_loader
+        self._cycle_handler = cycle_handler
+        self._synchronizers: dict[str, NotionTasksSynchronizer] = {}
+
+        self.stages: list[Stage] = [
+            FetchStage(self, fetch_concurrency),
+            DiffStage(self, diff_concurrency),
+            ApplyStage(self, apply_concurrency),
+        ]
+
+    def register(
+        self, syncing_service_id: str, synchronizer: NotionTasksSynchronizer
+    ) -> None:
+        self._synchronizers[syncing_service_id] = synchronizer
+
+    def unregister(self, syncing_service_id: str) -> None:
+        self._synchronizers.pop(syncing_service_id, None)
+
+    @asynccontextmanager
+    async def synchronizer(
+        self, syncing_service_id: str
+    ) -> AsyncIterator[Optional[NotionTasksSynchronizer]]:
+        """
+        Synchronizer of a service synced by this process, else one loaded for
+        the block only, so loaded ones and their sessions never pile up.
+        """
+        synchronizer = self._synchronizers.get(syncing_service_id)
+        if synchronizer is not None:
+            yield synchronizer
+            return
+
+        if self._synchronizer_loader is not None:
+            async with self._synchronizer_loader(syncing_service_id) as synchronizer:
+                if synchronizer is not None:
+                    yield synchronizer
+                    return
+
+        logger.warning(
+            f"No synchronizer for service {syncing_service_id}",
+            extra={"syncing_service_id": syncing_service_id},
+        )
+        yield None
+
+    async def start(self) -> None:
+        for stage in self.stages:
+            await self.redis.stream_ensure_group(stage.stream, self.group)
+            stage.start()
+        logger.info("Sync pipeline started")
+
+    async def stop(self) -> None:
+        for stage in self.stages:
+            await stage.stop()
+        logger.info("Sync pipeline stopped")
+
+    async def submit(self, syncing_service_id: str) -> bool:
+        """Queue a cycle for service. Return False if one is already running."""
+        if not await self.redis.set_if_absent(
+            self._cycle_key(syncing_service_id), "1", ex=SYNC_CYCLE_TTL
+        ):
+            return False
+
+        await self.emit(FetchStage.name, syncing_service_id, {})
+        return True
+
+    async def emit(self, stage_name: str, syncing_service_id: str, payload: dict):
+        await self.redis.stream_add(
+            f"{self.prefix}:{stage_name}",
+            {
+                "syncing_service_id": syncing_service_id,
+                "payload": json.dumps(payload),
+            },
+            maxlen=SYNC_STREAM_MAXLEN,
+        )
+
+    @property
+    def handles_cycles(self) -> bool:
+        return self._cycle_handler is not None
+
+    async def end_cycle(
+        self, syncing_service_id: str, error: Optional[Exception] = None
+    ) -> None:
+        """
+        End the service's cycle, failed with `error` or not. The cycle handler
+        decides when the next one may start: the cycle key is kept for its
+        backoff delay, or for good once the service is quarantined.
+        """
+        delay = 0.0
+        if self._cycle_handler is not None:
+            delay = await self._cycle_handler(syncing_service_id, error)
+
+        key = self._cycle_key(syncing_service_id)
+        if delay is None:
+            await self.redis.set(key, QUARANTINED)
+        elif delay > 0:
+            await self.redis.set(key, "backoff", ex=math.ceil(delay))
+        else:
+            await self.redis.delete(key)
+
+    async def finish_cycle(self, syncing_service_id: str) -> None:
+        """Allow the next cycle of the service right away."""
+        await self.redis.delete(self._cycle_key(syncing_service_id))
+
+    async def quarantined(self, syncing_service_id: str) -> bool:
+        key = self._cycle_key(syncing_service_id)
+        return await self.redis.get(key) == QUARANTINED
+
+    async def stats(self) -> dict[str, dict]:
+        stats = {}
+        for stage in self.stages:
+            group_info = await self.redis.stream_group_info(stage.stream, self.group)
+            stats[stage.name] = {
+                **stage.stats(),
+                "pending": group_info.get("pending", 0),
+                "lag": group_info.get("lag") or 0,
+            }
+        return stats
+
+    async def export_metrics(self) -> None:
+        """Set the SYNC_PIPELINE_* gauges from `stats`."""
+        try:
+            stats = await self.stats()
+        except RedisError as e:
+            logger.warning(f"Could not read sync pipeline stats: {e}")
+            return
+        for name, stage in stats.items():
+            SYNC_PIPELINE_PENDING.labels(stage=name).set(stage["pending"])
+            SYNC_PIPELINE_LAG.labels(stage=name).set(stage["lag"])
+            SYNC_PIPELINE_IN_PROGRESS.labels(stage=name).set(stage["in_progress"])
+            SYNC_PIPELINE_DROPPED.labels(stage=name).set(stage["dropped"])
+
+    def _cycle_key(self, syncing_service_id: str) -> str:
+        return f"{self.prefix}:cycle:{syncing_service_id}"
@@ -0,0 +1,131 @@
+import asyncio
+from collections import deque
+
+from config import (
+    SYNC_READY_LAG_WINDOW,
+    SYNC_SAFETY_NET_TIME,
+    SYNC_WAIT_TIME,
+    WEBHOOK_COALESCE_TIME,
+)
+from logger import get_logger
+from utils.metrics import SCHEDULER_LAG
+
+logger = get_logger(__name__)
+
+# services whose changes are pushed to us by webhooks
+PUSH_SOURCES = frozenset(("notion", "google_tasks"))
+
+
+class SyncScheduler:
+    """
+    Decides when the sync loop of a syncing service runs its next cycle.
+
+    Loops poll every `poll_time` seconds. Push events (webhooks) start a
+    cycle by `trigger`, see SyncTriggers for events received by another
+    process. Polling drops to `safety_net_time` only once every one of
+    PUSH_SOURCES pushed events for the service, as changes of a source
+    that never pushed are only found by polling. This app registers no
+    Google Tasks push channel, so unless one is registered outside of it,
+    polling intervals never relax. Triggers arriving within
+    `coalesce_time` of each other, or while a cycle is running, result in
+    a single cycle.
+
+    A cycle lags from the moment it was due until `cycle_started`, waiting
+    for a worker slot included. `lag` is the highest lag over the last
+    `lag_window` seconds, counting cycles still waiting.
+    """
+
+    def __init__(
+        self,
+        poll_time: float = SYNC_WAIT_TIME,
+        safety_net_time: float = SYNC_SAFETY_NET_TIME,
+        coalesce_time: float = WEBHOOK_COALESCE_TIME,
+        lag_window: float = SYNC_READY_LAG_WINDOW,
+    ) -> None:
+        self._poll_time = poll_time
+        self._safety_net_time = safety_net_time
+        self._coalesce_time = coalesce_time
+        self._lag_window = lag_window
+
+        self._wakeups: dict[str, asyncio.Event] = {}
+        # sources which pushed events of a syncing service
+        self._push_sources: dict[str, set[str]] = {}
+        # due time of cycles which did not start yet
+        self._due: dict[str, float] = {}
+        # (start time, lag) of recently started cycles
+        self._lags: deque[tuple[float, float]] = deque()
+
+    def register(self, syncing_service_id: str) -> None:
+        self._wakeups.setdefault(syncing_service_id, asyncio.Event())
+
+    def unregister(self, syncing_service_id: str) -> None:
+        self._wakeups.pop(syncing_service_id, None)
+        self._push_sources.pop(syncing_service_id, None)
+        self._due.pop(syncing_service_id, None)
+
+    def is_registered(self, syncing_service_id: str) -> bool:
+        return syncing_service_id in self._wakeups
+
+    def trigger(self, syncing_service_id: str, source: str) -> bool:
+        """
+        Request an immediate cycle after an event pushed by `source`.
+        Return False if service is not syncing.
+        """
+        wakeup = self._wakeups.get(syncing_service_id)
+        if wakeup is None:
+            return False
+
+        self._push_sources.setdefault(syncing_service_id, set()).add(source)
+        wakeup.set()
+        return True
+
+    def interval(self, syncing_service_id: str) -> float:
+        if self._push_sources.get(syncing_service_id, set()) >= PUSH_SOURCES:
+            return self._safety_net_time
+        return self._poll_time
+
+    async def wait_for_next_cycle(self, syncing_service_id: str) -> None:
+        self.register(syncing_service_id)
+        wakeup = self._wakeups[syncing_service_id]
+        loop = asyncio.get_running_loop()
+        interval = self.interval(syncing_service_id)
+        due = loop.time() + interval
+
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+        else:
+            # let a burst of events settle into one cycle
+            due = loop.time() + self._coalesce_time
+            await asyncio.sleep(self._coalesce_time)
+            logger.info(
+                f"Sync for service {syncing_service_id} triggered by event",
+                extra={"syncing_service_id": syncing_service_id},
+            )
+
+        wakeup.clear()
+        self._due[syncing_service_id] = due
+
+    def cycle_started(self, syncing_service_id: str) -> None:
+        """Record the lag of the cycle woken up last, once it got to run."""
+        due = self._due.pop(syncing_service_id, None)
+        if due is None:
+            return
+        now = asyncio.get_running_loop().time()
+        lag = max(0.0, now - due)
+        self._lags.append((now, lag))
+        SCHEDULER_LAG.set(lag)
+
+    def lag(self) -> float:
+        now = asyncio.get_running_loop().time()
+        while self._lags and self._lags[0][0] < now - self._lag_window:
+            self._lags.popleft()
+        return max(
+            [lag for _, lag in self._lags]
+            + [now - due for due in self._due.values()],
+            default=0.0,
+        )
+
+
+scheduler = SyncScheduler()
@@ -0,0 +1,84 @@
+import asyncio
+import json
+from typing import Optional
+
+from redis.exceptions import RedisError
+
+from config import REDIS_URL, SYNC_TRIGGER_CHANNEL
+from logger import get_logger
+from redis_client import RedisClient
+from synchronizers.scheduler import SyncScheduler, scheduler
+
+logger = get_logger(__name__)
+
+
+class SyncTriggers:
+    """
+    Delivers webhook triggers to the process running the sync loop.
+
+    A webhook can reach any worker, while a loop lives in one of them.
+    `trigger` wakes up a loop of this process, else it publishes the
+    trigger on `channel`. Every process relays published triggers to its
+    own scheduler, those of loops it does not run are ignored. A trigger
+    published while the owning process is not subscribed is lost, the loop
+    finds the change by polling.
+    """
+
+    def __init__(
+        self,
+        redis_client: RedisClient,
+        sync_scheduler: SyncScheduler,
+        channel: str = SYNC_TRIGGER_CHANNEL,
+        retry_delay: float = 1.0,
+    ) -> None:
+        self._redis = redis_client
+        self._scheduler = sync_scheduler
+        self._channel = channel
+        self._retry_delay = retry_delay
+        self._task: Optional[asyncio.Task] = None
+
+    async def trigger(self, syncing_service_id: str, source: str) -> bool:
+        """
+        Request a cycle after an event pushed by `source`. Return True if
+        the loop runs in this process, False if the trigger was published.
+        """
+        if self._scheduler.trigger(syncing_service_id, source):
+            return True
+
+        message = json.dumps(
+            {"syncing_service_id": syncing_service_id, "source": source}
+        )
+        await self._redis.publish(self._channel, message)
+        return False
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._relay()
+            except RedisError as e:
+                logger.error(f"Sync trigger relay failed: {e!r}")
+                await asyncio.sleep(self._retry_delay)
+
+    async def _relay(self) -> None:
+        pubsub = self._redis.pubsub()
+        try:
+            await pubsub.subscribe(self._channel)
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                event = json.loads(message["data"])
+                self._scheduler.trigger(event["syncing_service_id"], event["source"])
+        finally:
+            await pubsub.aclose()
+
+
+sync_triggers = SyncTriggers(RedisClient(REDIS_URL), scheduler)
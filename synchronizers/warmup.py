@@ -0,0 +1,44 @@
+import asyncio
+import random
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from config import SYNC_WARMUP_CONCURRENCY, SYNC_WARMUP_WINDOW
+
+
+class SyncWarmup:
+    """
+    Spreads the first cycles of sync loops restarted at boot.
+
+    Every loop waits a random part of `window` seconds before its first
+    cycle, and at most `concurrency` first cycles run at once, so restarted
+    services do not all hit Notion and Google in the same second.
+    """
+
+    def __init__(
+        self,
+        window: float = SYNC_WARMUP_WINDOW,
+        concurrency: int = SYNC_WARMUP_CONCURRENCY,
+    ) -> None:
+        self._window = window
+        self._slots = asyncio.Semaphore(concurrency)
+        # services loaded at boot, and those whose first cycle is not done
+        self.loaded = 0
+        self.pending = 0
+
+    @asynccontextmanager
+    async def first_cycle(self) -> AsyncIterator[None]:
+        """Wait for the loop's turn, then run its first cycle in the block."""
+        self.pending += 1
+        try:
+            await asyncio.sleep(random.uniform(0, self._window))
+            async with self._slots:
+                yield
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> dict:
+        return {"loaded": self.loaded, "pending": self.pending}
+
+
+sync_warmup = SyncWarmup()
@@ -0,0 +1,134 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from config import SYNC_WATCHDOG_GRACE, SYNC_WATCHDOG_INTERVAL
+from logger import get_logger
+from utils.metrics import SYNC_LOOP_RESTARTS, SYNC_STALLED_LOOPS
+
+logger = get_logger(__name__)
+
+
+@dataclass(slots=True)
+class WatchedLoop:
+    task: asyncio.Task
+    restart: Callable[[], Awaitable[None]]
+    # event loop time by which the next heartbeat is due, None while the
+    # loop waits for something that is not a stall, like a worker slot
+    due: Optional[float] = None
+
+
+class SyncWatchdog:
+    """
+    Restarts sync loops that stopped cycling.
+
+    Every loop beats whenever it starts waiting, telling how long until its
+    next beat. Every `check_interval` seconds loops whose beat is overdue
+    by more than `grace`, and loops that died from an exception, are
+    cancelled and started again by their restart callback. Loops that were
+    cancelled or returned are forgotten.
+    """
+
+    def __init__(
+        self,
+        check_interval: float = SYNC_WATCHDOG_INTERVAL,
+        grace: float = SYNC_WATCHDOG_GRACE,
+    ) -> None:
+        self._check_interval = check_interval
+        self._grace = grace
+        self._loops: dict[str, WatchedLoop] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.restarts = 0
+
+    def watch(
+        self,
+        syncing_service_id: str,
+        task: asyncio.Task,
+        restart: Callable[[], Awaitable[None]],
+    ) -> None:
+        self._loops[syncing_service_id] = WatchedLoop(task=task, restart=restart)
+
+    def beat(self, syncing_service_id: str, timeout: Optional[float]) -> None:
+        """Record a heartbeat, the next one is due within `timeout` seconds."""
+        loop = self._loops.get(syncing_service_id)
+        if loop is None:
+            return
+        loop.due = (
+            None
+            if timeout is None
+            else asyncio.get_running_loop().time() + timeout + self._grace
+        )
+
+    def stalled(self) -> list[str]:
+        now = asyncio.get_running_loop().time()
+        return [
+            syncing_service_id
+            for syncing_service_id, loop in self._loops.items()
+            if not loop.task.done() and loop.due is not None and now > loop.due
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "sync_loops": len(self._loops),
+            "stalled_loops": len(self.stalled()),
+            "restarted_loops": self.restarts,
+        }
+
+    async def check(self) -> list[str]:
+        """Restart stalled and dead loops. Return their service ids."""
+        stalled = set(self.stalled())
+        SYNC_STALLED_LOOPS.set(len(stalled))
+
+        restarted = []
+        for syncing_service_id, loop in list(self._loops.items()):
+            if syncing_service_id in stalled:
+                reason = "stalled"
+            elif loop.task.done():
+                if loop.task.cancelled() or loop.task.exception() is None:
+                    del self._loops[syncing_service_id]
+                    continue
+                reason = "died"
+                logger.error(
+                    f"Sync loop of service {syncing_service_id} died: "
+                    f"{loop.task.exception()!r}",
+                    extra={"syncing_service_id": syncing_service_id},
+                )
+            else:
+                continue
+
+            logger.warning(
+                f"Restarting {reason} sync loop of service {syncing_service_id}",
+                extra={"syncing_service_id": syncing_service_id},
+            )
+            await self._restart(syncing_service_id, loop)
+            SYNC_LOOP_RESTARTS.labels(reason=reason).inc()
+            restarted.append(syncing_service_id)
+        return restarted
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._check_interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Sync watchdog check failed: {e!r}")
+
+    async def _restart(self, syncing_service_id: str, loop: WatchedLoop) -> None:
+        del self._loops[syncing_service_id]
+        # the old loop cleans up before the new one registers
+        loop.task.cancel()
+        await asyncio.wait({loop.task}, timeout=self._grace)
+        self.restarts += 1
+        await loop.restart()
+
+
+sync_watchdog = SyncWatchdog()
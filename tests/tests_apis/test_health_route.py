@@ -0,0 +1,31 @@
+from routes.health import redis_client
+from synchronizers.scheduler import scheduler
+
+
+def test_ready(client):
+    response = client.get("/health/ready")
+
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
+    assert response.json()["redis"] is True
+    assert {"scheduler_lag", "sync_loops", "stalled_loops"} <= response.json().keys()
+    assert response.json()["warmup"] == {"loaded": 0, "pending": 0}
+
+
+def test_not_ready_while_scheduler_lags(client, mocker):
+    mocker.patch.object(scheduler, "lag", return_value=3600.0)
+
+    response = client.get("/health/ready")
+
+    assert response.status_code == 503
+    assert response.json()["ready"] is False
+    assert response.json()["scheduler_lag"] == 3600.0
+
+
+def test_not_ready_without_redis(client, mocker):
+    mocker.patch.object(redis_client, "ping", return_value=False)
+
+    response = client.get("/health/ready")
+
+    assert response.status_code == 503
+    assert response.json()["redis"] is False
@@ -0,0 +1,20 @@
+from prometheus_client import REGISTRY
+
+
+def test_metrics(client):
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "sync_stage_duration_seconds" in response.text
+    assert "upstream_requests_total" in response.text
+
+
+def test_api_requests_are_labeled_by_route_template(client):
+    labels = {"method": "GET", "route": "/metrics", "status": "200"}
+    before = REGISTRY.get_sample_value("http_request_duration_seconds_count", labels)
+
+    client.get("/metrics")
+
+    after = REGISTRY.get_sample_value("http_request_duration_seconds_count", labels)
+    assert after == (before or 0) + 1
@@ -1,10 +1,19 @@
 import asyncio
+from contextlib import asynccontextmanager
 
+import aiohttp
 import pytest
 
 from config import REDIS_URL
-from models.models import SyncingService, User
+from models.models import DeadLetter, OutboxEntry, SyncingService, User
 from redis_client import RedisClient
+from routes.sync import (
+    restart_sync,
+    run_sync_cycle,
+    start_sync_notion_google_tasks,
+)
+from services.errors import FailureKind, ServiceError
+from synchronizers.fair_queue import fair_queue
 from tests.utils import google_tasks_data, notion_data
 from utils.db_utils import generate_access_token
 
@@ -68,8 +77,8 @@ def mock_start_sync_notion_google_tasks(mocker):
 
 
 @pytest.fixture
-def mock_asyncio_all_tasks(mocker, syncing_service):
-    redis_client.set(syncing_service.id, str(id(fake_task)))
+async def mock_asyncio_all_tasks(mocker, syncing_service):
+    await redis_client.set(syncing_service.id, str(id(fake_task)))
     method = mocker.patch("asyncio.all_tasks")
     method.return_value = [fake_task]
     return method
@@ -115,10 +124,53 @@ async def test_start_sync(
     service = await SyncingService.get_service_by_user_id(syncing_service.user_id, db)
     assert service.is_active
 
-    task_id = redis_client.get(service.id)
+    task_id = await redis_client.get(service.id)
     assert task_id
 
 
+async def test_start_sync_quarantined(client, auth_header, syncing_service, db):
+    await SyncingService.quarantine(syncing_service.id, "not_found", db)
+
+    result = client.post(
+        "/sync/start_sync",
+        headers=auth_header,
+    )
+    assert result.status_code == 409
+    assert result.json() == {
+        "detail": "Sync stopped after not_found, reconnect the service to resume"
+    }
+
+
+async def test_run_sync_cycle_quarantines_permanent_failure(
+    syncing_service, db, mocker
+):
+    syncer = mocker.Mock()
+    syncer.sync = mocker.AsyncMock(
+        side_effect=ServiceError(FailureKind.AUTH_REVOKED, "revoked")
+    )
+    mocker.patch("routes.sync.redis_client.delete", mocker.AsyncMock())
+
+    assert not await run_sync_cycle(syncing_service.id, syncer, db)
+
+    service = await SyncingService.get_by_id(syncing_service.id, db)
+    assert service.quarantine_reason == "auth_revoked"
+    assert not service.is_active
+
+
+async def test_run_sync_cycle_backs_off_transient_failure(
+    syncing_service, db, mocker
+):
+    syncer = mocker.Mock()
+    syncer.sync = mocker.AsyncMock(side_effect=aiohttp.ClientConnectionError())
+    failed = mocker.patch("routes.sync.sync_backoff.failed", return_value=0)
+
+    assert await run_sync_cycle(syncing_service.id, syncer, db)
+
+    failed.assert_called_once_with(syncing_service.id)
+    service = await SyncingService.get_by_id(syncing_service.id, db)
+    assert not service.quarantined
+
+
 def test_stop_sync_no_syncing_service(client, auth_header):
     result = client.post(
         "/sync/stop_sync",
@@ -138,7 +190,7 @@ async def test_stop_sync_no_task(client, auth_header, syncing_service, db):
     service = await SyncingService.get_service_by_user_id(syncing_service.user_id, db)
     assert not service.is_active
 
-    task_id = redis_client.get(service.id)
+    task_id = await redis_client.get(service.id)
     assert not task_id
 
 
@@ -154,5 +206,98 @@ async def test_stop_sync(
     service = await SyncingService.get_service_by_user_id(syncing_service.user_id, db)
     assert not service.is_active
 
-    task_id = redis_client.get(service.id)
+    task_id = await redis_client.get(service.id)
     assert not task_id
+
+
+def test_get_share_not_syncing(client, auth_header, syncing_service):
+    result = client.get(
+        "/sync/share",
+        headers=auth_header,
+    )
+    assert result.status_code == 404
+    assert result.json() == {"detail": "Service is not syncing"}
+
+
+async def test_get_share(client, auth_header, syncing_service):
+    async with fair_queue.slot(syncing_service.id) as usage:
+        usage.cost = 3
+
+    result = client.get(
+        "/sync/share",
+        headers=auth_header,
+    )
+    fair_queue.forget(syncing_service.id)
+
+    assert result.status_code == 200
+    assert result.json()["cycles"] == 1
+    assert result.json()["cost"] == 3
+
+
+async def test_list_and_replay_dead_letters(client, auth_header, syncing_service, db):
+    await OutboxEntry.enqueue(
+        db,
+        syncing_service.id,
+        [
+            {
+                "target": "notion",
+                "operation": "add",
+                "item_key": "google_task_id",
+                "payload": '{"name": "name"}',
+            }
+        ],
+    )
+    entries = await OutboxEntry.get_pending(db, syncing_service.id, 100)
+    await DeadLetter.bury(
+        db, entries, {entries[0].id: "fingerprint"}, {entries[0].id: "invalid"}
+    )
+
+    result = client.get("/sync/dead_letters", headers=auth_header)
+    assert result.status_code == 200
+    (letter,) = result.json()
+    assert letter["target"] == "notion"
+    assert letter["item"] == {"name": "name"}
+    assert letter["error"] == "invalid"
+
+    result = client.post(
+        "/sync/dead_letters/replay",
+        headers=auth_header,
+        json={"ids": [letter["id"]]},
+    )
+    assert result.status_code == 200
+    assert result.json() == {"replayed": 1}
+
+    (entry,) = await OutboxEntry.get_pending(db, syncing_service.id, 100)
+    assert entry.item_key == "google_task_id"
+    await OutboxEntry.complete(db, [entry.id], [])
+
+
+async def test_restart_sync_pages_through_ready_services(
+    syncing_service, db, mocker
+):
+    @asynccontextmanager
+    async def session_local():
+        yield db
+
+    await SyncingService.update(syncing_service.user_id, {"ready": True}, db)
+    mocker.patch("routes.sync.SessionLocal", session_local)
+    mocker.patch("routes.sync.SYNC_WARMUP_PAGE_SIZE", 1)
+    get_page = mocker.spy(SyncingService, "get_ready_services_page")
+    spawn_sync_task = mocker.patch("routes.sync.spawn_sync_task")
+
+    await restart_sync()
+
+    assert get_page.call_count == 2
+    spawn_sync_task.assert_called_once()
+    assert spawn_sync_task.call_args.kwargs["syncing_service_id"] == syncing_service.id
+    assert spawn_sync_task.call_args.kwargs["warm_up"] is True
+
+
+async def test_sync_loops_have_own_sessions(mocker):
+    sync_loop = mocker.patch("routes.sync.sync_loop")
+
+    await start_sync_notion_google_tasks("first", {}, {})
+    await start_sync_notion_google_tasks("second", {}, {})
+
+    (first, second) = (call.args[3] for call in sync_loop.call_args_list)
+    assert first is not second
@@ -1,12 +1,16 @@
+import asyncio
 from contextlib import contextmanager
+from types import SimpleNamespace
 
 import pytest
 from pydantic import ValidationError
 
 from models.models import GoogleTasksData, NotionData, SyncingService, User
+from routes.user import get_available_lists
 from schemas.user_data import UserData
 from tests.utils import google_tasks_data, notion_data
 from utils.db_utils import generate_access_token
+from utils.lists_cache import available_lists_cache
 
 
 @contextmanager
@@ -189,3 +193,51 @@ async def test_save_user_data(client, auth_header, syncing_service, db):
     assert google_tasks.tasks_list_id == "new_tasks_list_id"
     assert notion.duplicated_template_id == "new_notion_list_id"
     assert notion.title_prop_name == "new_title_prop_name"
+
+
+async def test_get_available_lists_partial_on_timeout(mocker):
+    async def slow_notion_dbs(notion_data):
+        await asyncio.sleep(1)
+        return {"notion_id": {"id": "notion_id", "title": "title"}}
+
+    async def google_tasks_lists(google_tasks_data):
+        return {"list_id": {"id": "list_id", "title": "title"}}
+
+    mocker.patch("routes.user.PROFILERS_TIMEOUT", 0.05)
+    mocker.patch("routes.user.get_notion_dbs", slow_notion_dbs)
+    mocker.patch("routes.user.get_google_tasks_lists", google_tasks_lists)
+
+    syncing_service = SimpleNamespace(
+        id="syncing_service_id",
+        notion_data=object(),
+        google_tasks_data=object(),
+    )
+    await available_lists_cache.invalidate(syncing_service.id)
+    dbs, lists = await get_available_lists(syncing_service)
+
+    assert dbs == {}
+    assert lists == {"list_id": {"id": "list_id", "title": "title"}}
+    await available_lists_cache.invalidate(syncing_service.id)
+
+
+async def test_get_available_lists_partial_on_error(mocker):
+    async def failing_notion_dbs(notion_data):
+        raise RuntimeError("notion is down")
+
+    async def google_tasks_lists(google_tasks_data):
+        return {"list_id": {"id": "list_id", "title": "title"}}
+
+    mocker.patch("routes.user.get_notion_dbs", failing_notion_dbs)
+    mocker.patch("routes.user.get_google_tasks_lists", google_tasks_lists)
+
+    syncing_service = SimpleNamespace(
+        id="failing_syncing_service_id",
+        notion_data=object(),
+        google_tasks_data=object(),
+    )
+    await available_lists_cache.invalidate(syncing_service.id)
+    dbs, lists = await get_available_lists(syncing_service)
+
+    assert dbs == {}
+    assert lists == {"list_id": {"id": "list_id", "title": "title"}}
+    await available_lists_cache.invalidate(syncing_service.id)
@@ -0,0 +1,128 @@
+import pytest
+
+from models.models import SyncingService, User
+from synchronizers.scheduler import scheduler
+from tests.utils import google_tasks_data, notion_data
+from tests.webhook_emitters import google_push_notification, notion_event
+from utils.webhook_utils import notion_signature
+
+VERIFICATION_TOKEN = "verification_token"
+DATABASE_ID = "duplicated_template_id"
+
+
+@pytest.fixture(autouse=True)
+def webhook_secrets(mocker):
+    mocker.patch("config.NOTION_WEBHOOK_VERIFICATION_TOKEN", VERIFICATION_TOKEN)
+    mocker.patch("config.GOOGLE_CHANNEL_SECRET", "channel_secret")
+
+
+@pytest.fixture
+async def user(db):
+    user = User(email="test_webhooks_route@test.com", password="password")
+    yield await user.save(db)
+    await user.delete(db)
+
+
+@pytest.fixture
+async def syncing_service(db, user):
+    syncing_service = SyncingService(
+        user_id=user.id,
+        is_active=True,
+    )
+    service = await syncing_service.save(db)
+
+    notion = await notion_data(syncing_service, db)
+    google_tasks = await google_tasks_data(syncing_service, db)
+    scheduler.register(service.id)
+    yield service
+
+    scheduler.unregister(service.id)
+    await notion.delete(db)
+    await google_tasks.delete(db)
+    await syncing_service.delete(db)
+
+
+@pytest.fixture
+def trigger(mocker):
+    return mocker.spy(scheduler, "trigger")
+
+
+def test_notion_webhook_verification(client, mocker):
+    mocker.patch("config.NOTION_WEBHOOK_VERIFICATION_TOKEN", None)
+    response = client.post(
+        "/webhooks/notion", json={"verification_token": VERIFICATION_TOKEN}
+    )
+    assert response.status_code == 200
+    assert response.json() == {"status": "verification"}
+
+
+def test_notion_webhook_verification_when_configured(client):
+    response = client.post(
+        "/webhooks/notion", json={"verification_token": VERIFICATION_TOKEN}
+    )
+    assert response.status_code == 401
+
+
+def test_notion_webhook_invalid_json(client, trigger):
+    body = b"{not json"
+    headers = {"X-Notion-Signature": notion_signature(body, VERIFICATION_TOKEN)}
+    response = client.post("/webhooks/notion", content=body, headers=headers)
+    assert response.status_code == 400
+    trigger.assert_not_called()
+
+    response = client.post("/webhooks/notion", content=body)
+    assert response.status_code == 401
+
+
+def test_notion_webhook_invalid_signature(client, syncing_service, trigger):
+    body, headers = notion_event(DATABASE_ID, "wrong_token")
+    response = client.post("/webhooks/notion", content=body, headers=headers)
+    assert response.status_code == 401
+    trigger.assert_not_called()
+
+
+def test_notion_webhook(client, syncing_service, trigger):
+    body, headers = notion_event(DATABASE_ID, VERIFICATION_TOKEN)
+    response = client.post("/webhooks/notion", content=body, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"status": "accepted", "triggered": 1}
+    trigger.assert_called_once_with(syncing_service.id, "notion")
+
+
+def test_notion_webhook_duplicate(client, syncing_service, trigger):
+    body, headers = notion_event(DATABASE_ID, VERIFICATION_TOKEN)
+    client.post("/webhooks/notion", content=body, headers=headers)
+    response = client.post("/webhooks/notion", content=body, headers=headers)
+    assert response.json() == {"status": "duplicate"}
+    trigger.assert_called_once()
+
+
+def test_notion_webhook_unknown_database(client, syncing_service, trigger):
+    body, headers = notion_event("unknown_database_id", VERIFICATION_TOKEN)
+    response = client.post("/webhooks/notion", content=body, headers=headers)
+    assert response.json() == {"status": "accepted", "triggered": 0}
+    trigger.assert_not_called()
+
+
+def test_google_tasks_webhook_invalid_token(client, syncing_service, trigger):
+    headers = google_push_notification(syncing_service.id, token="wrong_token")
+    response = client.post("/webhooks/google_tasks", headers=headers)
+    assert response.status_code == 401
+    trigger.assert_not_called()
+
+
+def test_google_tasks_webhook_sync_state(client, syncing_service, trigger):
+    headers = google_push_notification(syncing_service.id, resource_state="sync")
+    response = client.post("/webhooks/google_tasks", headers=headers)
+    assert response.json() == {"status": "ignored"}
+    trigger.assert_not_called()
+
+
+def test_google_tasks_webhook(client, syncing_service, trigger):
+    headers = google_push_notification(syncing_service.id)
+    response = client.post("/webhooks/google_tasks", headers=headers)
+    assert response.json() == {"status": "accepted", "triggered": 1}
+
+    response = client.post("/webhooks/google_tasks", headers=headers)
+    assert response.json() == {"status": "duplicate"}
+    trigger.assert_called_once_with(syncing_service.id, "google_tasks")
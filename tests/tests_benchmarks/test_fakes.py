@@ -0,0 +1,153 @@
+import datetime
+
+import pytest
+
+from benchmarks.fakes import FakeGoogleTasksAPI, FakeNotionAPI, FakeUpstreamConfig
+from models.models import SyncedItem
+from services.google_tasks.google_tasks import GTasksList
+from services.notion.notion_db import NotionDB
+
+DATABASE_ID = "fake_database_id"
+TASKS_LIST_ID = "fake_tasks_list_id"
+
+
+def base_url(client) -> str:
+    return str(client.make_url("")).rstrip("/")
+
+
+@pytest.fixture
+def notion():
+    notion = FakeNotionAPI()
+    notion.add_database(DATABASE_ID)
+    return notion
+
+
+@pytest.fixture
+def google_tasks():
+    google_tasks = FakeGoogleTasksAPI()
+    google_tasks.add_task_list(TASKS_LIST_ID)
+    return google_tasks
+
+
+@pytest.fixture
+async def notion_db(notion, aiohttp_client, mocker):
+    client = await aiohttp_client(notion.create_app())
+    mocker.patch.object(NotionDB, "PAGE_URL_FORMAT", base_url(client) + "/v1/pages/{}")
+    # no database here, writes would record synced versions
+    mocker.patch.object(SyncedItem, "record_versions")
+    notion_db = NotionDB(
+        syncing_service_id="syncing_service_id",
+        database_id=DATABASE_ID,
+        token="token",
+        title_prop_name="Name",
+        db=None,
+    )
+    notion_db._database_url = f"{base_url(client)}/v1/databases/{DATABASE_ID}/query"
+    yield notion_db
+    await notion_db._session.close()
+
+
+@pytest.fixture
+async def tasks_list(google_tasks, aiohttp_client, mocker):
+    client = await aiohttp_client(google_tasks.create_app())
+    url = base_url(client)
+    mocker.patch.object(
+        GTasksList,
+        "GOOGLE_TASKS_GET_ALL_URL",
+        url + "/tasks/v1/lists/{}/tasks?showCompleted=true&showHidden=true",
+    )
+    tasks_list = GTasksList(
+        syncing_service_id="syncing_service_id",
+        client_config={
+            "tasks_list_id": TASKS_LIST_ID,
+            "token": "token",
+            "token_uri": url + "/token",
+            "client_id": "client_id",
+            "client_secret": "client_secret",
+            "refresh_token": "refresh_token",
+        },
+        db=None,
+    )
+    yield tasks_list
+    await tasks_list._session.close()
+
+
+async def test_notion_query_is_paginated(notion, notion_db):
+    notion.seed(DATABASE_ID, 250)
+
+    items = await notion_db.get_all_items()
+
+    assert len(items) == 250
+    assert notion.calls[("POST", "/v1/databases/{database_id}/query", 200)] == 3
+
+
+async def test_notion_update_bumps_last_edited_time(notion, notion_db):
+    page = notion.add_page(DATABASE_ID, "name")
+    page["last_edited_time"] = "2021-10-10T10:10:10.000Z"
+    item = notion_db._data_adapter.dict_to_item(page)
+    item.name = "new name"
+
+    await notion_db.update_item(item)
+
+    updated_item = await notion_db.get_item_by_id(page["id"])
+    assert updated_item.name == "new name"
+    assert updated_item.updated_at > item.updated_at
+
+
+async def test_google_tasks_are_paginated(google_tasks, tasks_list):
+    google_tasks.seed(TASKS_LIST_ID, 45)
+
+    items = await tasks_list.get_all_items()
+
+    assert len(items) == 45
+    assert google_tasks.total_calls == 3
+
+
+async def test_google_expired_token_is_refreshed(google_tasks, tasks_list):
+    google_tasks.config.token_ttl = 60
+    google_tasks._token_issued_at["token"] = 0
+    google_tasks.seed(TASKS_LIST_ID, 1)
+
+    items = await tasks_list.get_all_items()
+
+    assert len(items) == 1
+    assert tasks_list._client_config["token"].startswith("fake-")
+    assert google_tasks.calls[("POST", "/token", 200)] == 1
+
+
+async def test_rate_limit(aiohttp_client):
+    notion = FakeNotionAPI(FakeUpstreamConfig(rate_limit=1, rate_limit_burst=1))
+    client = await aiohttp_client(notion.create_app())
+    headers = {"Authorization": "Bearer token"}
+
+    response = await client.post("/v1/search", headers=headers)
+    assert response.status == 200
+
+    response = await client.post("/v1/search", headers=headers)
+    assert response.status == 429
+    assert response.headers["Retry-After"] == "1"
+
+
+async def test_error_injection(aiohttp_client):
+    notion = FakeNotionAPI(FakeUpstreamConfig(error_rate=1))
+    client = await aiohttp_client(notion.create_app())
+
+    response = await client.post("/v1/search", headers={"Authorization": "Bearer t"})
+    assert response.status == 500
+
+
+async def test_missing_token(aiohttp_client):
+    google_tasks = FakeGoogleTasksAPI()
+    client = await aiohttp_client(google_tasks.create_app())
+
+    response = await client.get("/tasks/v1/users/@me/lists/")
+    assert response.status == 401
+
+
+async def test_latency(aiohttp_client):
+    notion = FakeNotionAPI(FakeUpstreamConfig(latency=0.05))
+    client = await aiohttp_client(notion.create_app())
+
+    started = datetime.datetime.now()
+    await client.post("/v1/search", headers={"Authorization": "Bearer token"})
+    assert datetime.datetime.now() - started >= datetime.timedelta(seconds=0.05)
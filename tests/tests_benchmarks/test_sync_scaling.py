@@ -0,0 +1,46 @@
+from benchmarks.sync_scaling import compare, parse_args, percentile
+
+
+def result(cycle_p99: float, items: int = 100, tenants: int = 1) -> dict:
+    return {
+        "items": items,
+        "tenants": tenants,
+        "cycle_p99": cycle_p99,
+        "upstream_calls_per_cycle": 4.0,
+        "sql_queries_per_cycle": 100.0,
+    }
+
+
+def test_percentile():
+    values = [float(value) for value in range(1, 101)]
+
+    assert percentile(values, 50) == 51.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values, 100) == 100.0
+    assert percentile([], 99) == 0.0
+
+
+def test_compare_passes_within_max_regression():
+    baseline = {"commit": "abc", "results": [result(1.0)]}
+
+    assert compare([result(1.1)], baseline, max_regression=0.2)
+
+
+def test_compare_fails_on_p99_regression():
+    baseline = {"commit": "abc", "results": [result(1.0)]}
+
+    assert not compare([result(1.5)], baseline, max_regression=0.2)
+
+
+def test_compare_skips_scenarios_missing_in_baseline():
+    baseline = {"commit": "abc", "results": [result(1.0, items=100)]}
+
+    assert compare([result(10.0, items=1000)], baseline, max_regression=0.2)
+
+
+def test_parse_args():
+    args = parse_args(["--items", "10", "20", "--tenants", "3", "--cycles", "2"])
+
+    assert args.items == [10, 20]
+    assert args.tenants == [3]
+    assert args.cycles == 2
@@ -0,0 +1,86 @@
+import pytest
+
+from models.models import DeadLetter, OutboxEntry, SyncingService, User
+
+
+@pytest.fixture
+async def user(db):
+    user = User(email="test_dead_letter_model@test.com", password="password")
+    yield await user.save(db)
+    await user.delete(db)
+
+
+@pytest.fixture
+async def syncing_service(db, user):
+    syncing_service = SyncingService(
+        user_id=user.id,
+    )
+    yield await syncing_service.save(db)
+    pending = await OutboxEntry.get_pending(db, syncing_service.id, 100)
+    await OutboxEntry.complete(db, [entry.id for entry in pending], [])
+    letters = await DeadLetter.get_all(db, syncing_service.id)
+    await DeadLetter.delete_many(db, [letter.id for letter in letters])
+    await syncing_service.delete(db)
+
+
+async def bury(db, syncing_service, item_keys):
+    await OutboxEntry.enqueue(
+        db,
+        syncing_service.id,
+        [
+            {
+                "target": "notion",
+                "operation": "update",
+                "item_key": item_key,
+                "payload": "{}",
+            }
+            for item_key in item_keys
+        ],
+    )
+    entries = await OutboxEntry.get_pending(db, syncing_service.id, 100)
+    await DeadLetter.bury(
+        db,
+        entries,
+        {entry.id: "fingerprint" for entry in entries},
+        {entry.id: "error" for entry in entries},
+    )
+
+
+async def test_bury_moves_entries_out_of_outbox(db, syncing_service):
+    await bury(db, syncing_service, ["a", "b"])
+
+    assert not await OutboxEntry.has_pending(db, syncing_service.id)
+    letters = await DeadLetter.get_all(db, syncing_service.id)
+    assert sorted(letter.item_key for letter in letters) == ["a", "b"]
+    assert {(letter.error, letter.attempts) for letter in letters} == {("error", 1)}
+
+
+async def test_bury_replaces_letter_of_same_write(db, syncing_service):
+    await bury(db, syncing_service, ["a"])
+    await bury(db, syncing_service, ["a"])
+
+    assert len(await DeadLetter.get_all(db, syncing_service.id)) == 1
+
+
+async def test_replay_selected_letters(db, syncing_service):
+    await bury(db, syncing_service, ["a", "b"])
+    letters = {
+        letter.item_key: letter
+        for letter in await DeadLetter.get_all(db, syncing_service.id)
+    }
+
+    replayed = await DeadLetter.replay(db, syncing_service.id, [letters["a"].id])
+
+    assert replayed == 1
+    (entry,) = await OutboxEntry.get_pending(db, syncing_service.id, 100)
+    assert (entry.item_key, entry.attempts) == ("a", 0)
+    (letter,) = await DeadLetter.get_all(db, syncing_service.id)
+    assert letter.item_key == "b"
+
+
+async def test_replay_all(db, syncing_service):
+    await bury(db, syncing_service, ["a", "b"])
+
+    assert await DeadLetter.replay(db, syncing_service.id) == 2
+    assert len(await OutboxEntry.get_pending(db, syncing_service.id, 100)) == 2
+    assert await DeadLetter.get_all(db, syncing_service.id) == []
@@ -0,0 +1,80 @@
+import pytest
+
+from models.models import OutboxEntry, SyncingService, User
+
+
+@pytest.fixture
+async def user(db):
+    user = User(email="test_outbox_entry_model@test.com", password="password")
+    yield await user.save(db)
+    await user.delete(db)
+
+
+@pytest.fixture
+async def syncing_service(db, user):
+    syncing_service = SyncingService(
+        user_id=user.id,
+    )
+    yield await syncing_service.save(db)
+    await OutboxEntry.complete(
+        db,
+        [
+            entry.id
+            for entry in await OutboxEntry.get_pending(db, syncing_service.id, 100)
+        ],
+        [],
+    )
+    await syncing_service.delete(db)
+
+
+def entry(item_key="notion_id", payload="{}", operation="add"):
+    return {
+        "target": "google_tasks",
+        "operation": operation,
+        "item_key": item_key,
+        "payload": payload,
+    }
+
+
+async def test_enqueue_replaces_payload_of_planned_write(db, syncing_service):
+    await OutboxEntry.enqueue(db, syncing_service.id, [entry(payload="old")])
+    await OutboxEntry.enqueue(
+        db,
+        syncing_service.id,
+        [entry(payload="new"), entry(operation="update", payload="update")],
+    )
+
+    pending = await OutboxEntry.get_pending(db, syncing_service.id, 100)
+
+    assert sorted((e.operation, e.payload) for e in pending) == [
+        ("add", "new"),
+        ("update", "update"),
+    ]
+
+
+async def test_get_pending_pages(db, syncing_service):
+    await OutboxEntry.enqueue(
+        db, syncing_service.id, [entry(item_key=str(key)) for key in range(5)]
+    )
+
+    first = await OutboxEntry.get_pending(db, syncing_service.id, 3)
+    rest = await OutboxEntry.get_pending(db, syncing_service.id, 3, after=first[-1].id)
+
+    assert len(first) == 3
+    assert len(rest) == 2
+    assert {e.item_key for e in first + rest} == {str(key) for key in range(5)}
+
+
+async def test_complete(db, syncing_service):
+    await OutboxEntry.enqueue(
+        db, syncing_service.id, [entry(item_key="done"), entry(item_key="failed")]
+    )
+    entries = {
+        e.item_key: e for e in await OutboxEntry.get_pending(db, syncing_service.id, 100)
+    }
+
+    await OutboxEntry.complete(db, [entries["done"].id], [entries["failed"].id])
+
+    pending = await OutboxEntry.get_pending(db, syncing_service.id, 100)
+    assert [(e.item_key, e.attempts) for e in pending] == [("failed", 1)]
+    assert await OutboxEntry.has_pending(db, syncing_service.id)
@@ -0,0 +1,39 @@
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from models.models import upgrade_schema
+
+
+@pytest.fixture
+async def old_engine(tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'old.db'}", poolclass=NullPool
+    )
+    async with engine.begin() as conn:
+        # synced_item as created before versions and fingerprints were synced
+        await conn.execute(
+            text(
+                "CREATE TABLE synced_item ("
+                "id VARCHAR PRIMARY KEY, syncing_service_id VARCHAR, "
+                "notion_id VARCHAR, google_task_id VARCHAR)"
+            )
+        )
+    yield engine
+    await engine.dispose()
+
+
+def columns(conn, table: str) -> set[str]:
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+async def test_upgrade_schema_adds_missing_columns(old_engine):
+    async with old_engine.begin() as conn:
+        await conn.run_sync(upgrade_schema)
+        # idempotent, a second start changes nothing
+        await conn.run_sync(upgrade_schema)
+
+        added = await conn.run_sync(columns, "synced_item")
+
+    assert {"notion_version", "google_task_version", "fingerprint"} <= added
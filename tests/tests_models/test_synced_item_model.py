@@ -56,6 +56,13 @@ async def test_synced_item_get_by_sync_id(synced_item, item, db):
     assert synced_item_db.google_task_id == synced_item.google_task_id
 
 
+async def test_synced_item_get_all_by_service(synced_item, syncing_service, db):
+    synced_items = await SyncedItem.get_all_by_service(db, syncing_service.id)
+    assert [synced.id for synced in synced_items] == [synced_item.id]
+
+    assert await SyncedItem.get_all_by_service(db, "other_service") == []
+
+
 async def test_synced_item_create_from_item(syncing_service, item):
     synced_item = SyncedItem.create_from_item(item, syncing_service.id)
     assert synced_item.notion_id == item.notion_id
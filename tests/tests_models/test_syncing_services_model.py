@@ -126,6 +126,32 @@ async def test_get_ready_services(syncing_service_ready, db):
     assert services[0].ready
 
 
+async def test_get_ready_services_skips_quarantined(syncing_service_ready, db):
+    await SyncingService.quarantine(syncing_service_ready.id, "auth_revoked", db)
+
+    assert await SyncingService.get_ready_services(db) == []
+
+    service = await SyncingService.get_by_id(syncing_service_ready.id, db)
+    assert service.quarantined
+    assert service.quarantine_reason == "auth_revoked"
+    assert not service.is_active
+
+
+async def test_get_ready_services_page(db, user):
+    services = [
+        await SyncingService(user_id=user.id, ready=True).save(db) for _ in range(3)
+    ]
+    await SyncingService.quarantine(services[1].id, "not_found", db)
+
+    first = await SyncingService.get_ready_services_page(db, 1)
+    rest = await SyncingService.get_ready_services_page(db, 10, after=first[0].id)
+
+    expected = sorted(s.id for s in services if s.id != services[1].id)
+    assert [service.id for service in first + rest] == expected
+    for service in services:
+        await service.delete(db)
+
+
 async def test_update(syncing_service, db):
     new_google_tasks_data = {"new": "data"}
     new_notion_data = {"new": "data"}
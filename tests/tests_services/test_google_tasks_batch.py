@@ -0,0 +1,39 @@
+from services.google_tasks.batch import BatchPart, decode_batch, encode_batch
+from tests.utils import google_batch_response
+
+BOUNDARY = "batch_boundary"
+
+
+def test_encode_batch():
+    body = encode_batch(
+        [
+            BatchPart("POST", "/tasks/v1/lists/list/tasks", {"title": "name"}),
+            BatchPart("PATCH", "/tasks/v1/lists/list/tasks/task", {"status": "x"}),
+        ],
+        BOUNDARY,
+    ).decode()
+
+    assert body.startswith(f"--{BOUNDARY}\r\nContent-Type: application/http\r\n")
+    assert "Content-ID: <item-0>\r\n\r\nPOST /tasks/v1/lists/list/tasks\r\n" in body
+    assert "Content-ID: <item-1>\r\n\r\nPATCH /tasks/v1/lists/list/tasks/task" in body
+    assert '\r\n\r\n{"title": "name"}\r\n' in body
+    assert body.endswith(f"--{BOUNDARY}--\r\n")
+
+
+def test_decode_batch_keeps_request_order():
+    body = google_batch_response([(1, 404, {"error": {}}), (0, 200, {"id": "task_id"})])
+
+    responses = decode_batch(body, f"multipart/mixed; boundary={BOUNDARY}", 3)
+
+    assert responses[0].ok
+    assert responses[0].body == {"id": "task_id"}
+    assert responses[1].status == 404
+    assert not responses[1].ok
+    # missing in response
+    assert responses[2].status == 0
+
+
+def test_decode_batch_not_multipart():
+    responses = decode_batch(b"{}", "application/json", 2)
+
+    assert [response.status for response in responses] == [0, 0]
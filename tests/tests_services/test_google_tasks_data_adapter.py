@@ -48,6 +48,18 @@ def test_item_to_dict(google_tasks_data_adapter, item):
     }
 
 
+def test_item_to_patch_dict(google_tasks_data_adapter, item):
+    item.changed_fields = ("status",)
+
+    result = google_tasks_data_adapter.item_to_patch_dict(item)
+    assert result == {"status": "completed"}
+
+
+def test_item_to_patch_dict_without_changed_fields(google_tasks_data_adapter, item):
+    result = google_tasks_data_adapter.item_to_patch_dict(item)
+    assert result == {"title": item.name, "status": "completed"}
+
+
 def test_dict_to_item(google_tasks_data_adapter, item):
     data = {
         "id": item.google_task_id,
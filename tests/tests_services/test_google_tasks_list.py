@@ -1,13 +1,15 @@
 import asyncio
 import datetime
 
+import aiohttp
 import pytest
 from aioresponses import aioresponses
 
 from models.models import SyncedItem, SyncingService, User
+from services.errors import FailureKind, ServiceError
 from services.google_tasks.google_tasks import GTasksList
 from schemas.Item import Item
-from tests.utils import google_tasks_data, notion_data
+from tests.utils import google_batch_response, google_tasks_data, notion_data
 
 pytest_plugins = ("pytest_asyncio",)
 
@@ -15,6 +17,8 @@ TASK_LIST_ID = "tasks_list_id"
 GET_ALL_URL = f"https://tasks.googleapis.com/tasks/v1/lists/{TASK_LIST_ID}/tasks?showCompleted=true&showHidden=true"
 UPDATE_URL = f"https://tasks.googleapis.com/tasks/v1/lists/{TASK_LIST_ID}/tasks/{{}}"
 ADD_URL = f"https://tasks.googleapis.com/tasks/v1/lists/{TASK_LIST_ID}/tasks"
+BATCH_URL = "https://tasks.googleapis.com/batch/tasks/v1"
+BATCH_CONTENT_TYPE = "multipart/mixed; boundary=batch_boundary"
 DATETIME = datetime.datetime(2021, 10, 10, 10, 10, 10, 10)
 TOKEN_URI = "https://oauth2.googleapis.com/token"
 CLIENT_ID = "client_id"
@@ -117,7 +121,7 @@ async def test_add_item(tasks_list, item, db):
 
 async def test_update_item(tasks_list, item):
     with aioresponses() as m:
-        m.put(
+        m.patch(
             UPDATE_URL.format(item.google_task_id),
         )
 
@@ -125,18 +129,31 @@ async def test_update_item(tasks_list, item):
         assert result == f"Task {item.google_task_id} updated successfully."
         m.assert_called_once_with(
             UPDATE_URL.format(item.google_task_id),
-            method="PUT",
+            method="PATCH",
             headers=tasks_list._headers,
             data=None,
             json={
-                "kind": "tasks#task",
-                "id": item.google_task_id,
                 "title": item.name,
                 "status": "completed",
             },
         )
 
 
+async def test_update_item_sends_only_changed_fields(tasks_list, item):
+    item.changed_fields = ("name",)
+    with aioresponses() as m:
+        m.patch(UPDATE_URL.format(item.google_task_id))
+
+        await tasks_list.update_item(item)
+        m.assert_called_once_with(
+            UPDATE_URL.format(item.google_task_id),
+            method="PATCH",
+            headers=tasks_list._headers,
+            data=None,
+            json={"title": item.name},
+        )
+
+
 async def test_get_item_by_id(tasks_list, item):
     with aioresponses() as m:
         m.get(
@@ -213,3 +230,131 @@ async def test_refresh_token(tasks_list):
                 "grant_type": "refresh_token",
             },
         )
+
+
+async def test_revoked_refresh_token_raises(tasks_list):
+    with aioresponses() as m:
+        m.get(GET_ALL_URL, status=401)
+        m.post(TOKEN_URI, status=400, payload={"error": "invalid_grant"})
+
+        with pytest.raises(ServiceError) as error:
+            await tasks_list.get_items_page()
+
+    assert error.value.kind == FailureKind.AUTH_REVOKED
+
+
+async def test_deleted_list_raises(tasks_list):
+    with aioresponses() as m:
+        m.get(GET_ALL_URL, status=404)
+
+        with pytest.raises(aiohttp.ClientResponseError):
+            await tasks_list.get_items_page()
+
+
+async def test_transient_failure_gives_none(tasks_list):
+    with aioresponses() as m:
+        m.get(GET_ALL_URL, status=503)
+
+        assert await tasks_list.get_items_page() is None
+
+
+def new_item(number: int) -> Item:
+    return Item(
+        name=f"name {number}",
+        status=False,
+        notion_id=f"notion_id_{number}",
+        updated_at=DATETIME,
+    )
+
+
+async def test_add_items_in_one_batch(tasks_list, db):
+    items = [new_item(0), new_item(1)]
+    with aioresponses() as m:
+        m.post(
+            BATCH_URL,
+            body=google_batch_response(
+                [(0, 200, {"id": "task_0"}), (1, 200, {"id": "task_1"})]
+            ),
+            content_type=BATCH_CONTENT_TYPE,
+        )
+
+        assert await tasks_list.add_items(items) == [None, None]
+
+    assert [item.google_task_id for item in items] == ["task_0", "task_1"]
+    for item in items:
+        db_item = await SyncedItem.get_by_sync_id(db, notion_id=item.notion_id)
+        assert db_item.google_task_id == item.google_task_id
+        await db_item.delete(db)
+
+
+async def test_add_items_retries_failed_part(tasks_list, db):
+    items = [new_item(0), new_item(1)]
+    with aioresponses() as m:
+        m.post(
+            BATCH_URL,
+            body=google_batch_response(
+                [(0, 200, {"id": "task_0"}), (1, 503, {"error": {}})]
+            ),
+            content_type=BATCH_CONTENT_TYPE,
+        )
+        m.post(ADD_URL, payload={"id": "task_1"})
+
+        assert await tasks_list.add_items(items) == [None, None]
+
+    assert [item.google_task_id for item in items] == ["task_0", "task_1"]
+    for item in items:
+        db_item = await SyncedItem.get_by_sync_id(db, notion_id=item.notion_id)
+        await db_item.delete(db)
+
+
+async def test_update_items_in_one_batch(tasks_list, item):
+    with aioresponses() as m:
+        m.post(
+            BATCH_URL,
+            body=google_batch_response([(0, 200, {"id": item.google_task_id})]),
+            content_type=BATCH_CONTENT_TYPE,
+        )
+
+        assert await tasks_list.update_items([item]) == [None]
+        m.assert_called_once()
+
+
+async def test_update_items_returns_error_of_failed_retry(tasks_list, item):
+    with aioresponses() as m:
+        m.post(
+            BATCH_URL,
+            body=google_batch_response([(0, 503, {"error": {}})]),
+            content_type=BATCH_CONTENT_TYPE,
+        )
+        m.patch(UPDATE_URL.format(item.google_task_id), status=400)
+
+        [error] = await tasks_list.update_items([item])
+
+    assert isinstance(error, aiohttp.ClientResponseError)
+    assert error.status == 400
+
+
+async def test_failed_batch_returns_error_of_every_item(tasks_list, item):
+    items = [new_item(0), new_item(1)]
+    with aioresponses() as m:
+        m.post(BATCH_URL, status=503)
+
+        errors = await tasks_list.add_items(items)
+        m.assert_called_once()
+
+    assert [error.status for error in errors] == [503, 503]
+
+
+async def test_rate_limited_part_is_not_retried(tasks_list, item):
+    with aioresponses() as m:
+        m.post(
+            BATCH_URL,
+            body=google_batch_response([(0, 429, {"error": {}})]),
+            content_type=BATCH_CONTENT_TYPE,
+        )
+
+        [error] = await tasks_list.update_items([item])
+        m.assert_called_once()
+
+    assert isinstance(error, ServiceError)
+    assert error.kind is FailureKind.TRANSIENT
@@ -1,4 +1,5 @@
 import pytest
+from aioresponses import aioresponses
 
 from services.google_tasks.google_tasks_profiler import GTasksProfiler
 
@@ -13,8 +14,8 @@ TASKS_LIST_URL = "https://tasks.googleapis.com/tasks/v1/users/@me/lists/"
 
 
 @pytest.fixture
-def profiler():
-    return GTasksProfiler(
+async def profiler():
+    profiler = GTasksProfiler(
         client_config={
             "token": "token",
             "token_uri": TOKEN_URI,
@@ -23,36 +24,61 @@ def profiler():
             "refresh_token": REFRESH_TOKEN,
         }
     )
+    yield profiler
+    await profiler.close()
 
 
-def test_get_lists(profiler, requests_mock):
-    requests_mock.get(
-        TASKS_LIST_URL,
-        json={
-            "items": [
-                {
-                    "id": "list_id",
-                    "title": "title",
-                }
-            ]
-        },
-    )
+async def test_get_lists(profiler):
+    with aioresponses() as m:
+        m.get(
+            TASKS_LIST_URL,
+            payload={
+                "items": [
+                    {
+                        "id": "list_id",
+                        "title": "title",
+                    }
+                ]
+            },
+        )
 
-    result = profiler.get_lists()
+        result = await profiler.get_lists()
 
     assert result == {"list_id": {"title": "title", "id": "list_id"}}
 
 
-def test_refresh_token(profiler, requests_mock):
-    requests_mock.post(
-        TOKEN_URI,
-        json={
-            "access_token": "access_token_new",
-            "expires_in": 123,
-        },
-    )
+async def test_get_lists_expired_token(profiler):
+    with aioresponses() as m:
+        m.get(TASKS_LIST_URL, status=401)
+        m.post(
+            TOKEN_URI,
+            payload={
+                "access_token": "access_token_new",
+                "expires_in": 123,
+            },
+        )
+        m.get(
+            TASKS_LIST_URL,
+            payload={"items": [{"id": "list_id", "title": "title"}]},
+        )
+
+        result = await profiler.get_lists()
+
+    assert result == {"list_id": {"title": "title", "id": "list_id"}}
+    assert profiler._headers["Authorization"] == "Bearer access_token_new"
+
+
+async def test_refresh_token(profiler):
+    with aioresponses() as m:
+        m.post(
+            TOKEN_URI,
+            payload={
+                "access_token": "access_token_new",
+                "expires_in": 123,
+            },
+        )
 
-    profiler._refresh_token()
+        await profiler._refresh_token()
 
     assert profiler._client_config["token"] == "access_token_new"
     assert profiler._client_config["expiry"] == 123
@@ -6,7 +6,7 @@ from schemas.Item import Item
 from services.notion.notion_db import NotionDBDataAdapter as Adapter
 
 DATE = datetime.datetime(2021, 10, 10, 10, 10, 10, 10)
-TITLE_PROP_NAME = "Name"
+TITLE_PROP_NAME = "Task"
 DATABASE_ID = "database_id"
 
 
@@ -59,11 +59,10 @@ def test_item_to_dict(data_adapter, item):
     result = data_adapter.item_to_dict(item)
     assert result == {
         "object": "page",
-        "id": item.notion_id,
         "parent": {"type": "database_id", "database_id": DATABASE_ID},
         "properties": {
             "Checkbox": {"checkbox": item.status},
-            "Name": {
+            TITLE_PROP_NAME: {
                 "title": [
                     {
                         "text": {
@@ -77,6 +76,25 @@ def test_item_to_dict(data_adapter, item):
     }
 
 
+def test_item_to_patch_dict(data_adapter, item):
+    item.changed_fields = ("name",)
+
+    result = data_adapter.item_to_patch_dict(item)
+    assert result == {
+        "properties": {
+            TITLE_PROP_NAME: {
+                "title": [{"text": {"content": item.name}, "plain_text": item.name}]
+            },
+        },
+    }
+
+
+def test_item_to_patch_dict_without_changed_fields(data_adapter, item):
+    result = data_adapter.item_to_patch_dict(item)
+    assert set(result["properties"]) == {"Checkbox", TITLE_PROP_NAME}
+    assert "parent" not in result
+
+
 def test_dict_to_item(data_adapter, item):
     data = {
         "object": "page",
@@ -85,7 +103,7 @@ def test_dict_to_item(data_adapter, item):
         "last_edited_time": DATE.isoformat(),
         "properties": {
             "Checkbox": {"checkbox": item.status},
-            "Name": {
+            TITLE_PROP_NAME: {
                 "title": [
                     {
                         "text": {
@@ -106,11 +124,10 @@ def test_items_to_dicts(data_adapter, item):
     assert result == [
         {
             "object": "page",
-            "id": item.notion_id,
             "parent": {"type": "database_id", "database_id": DATABASE_ID},
             "properties": {
                 "Checkbox": {"checkbox": item.status},
-                "Name": {
+                TITLE_PROP_NAME: {
                     "title": [
                         {
                             "text": {
@@ -134,7 +151,7 @@ def test_dicts_to_items(data_adapter, item):
             "last_edited_time": DATE.isoformat(),
             "properties": {
                 "Checkbox": {"checkbox": item.status},
-                "Name": {
+                TITLE_PROP_NAME: {
                     "title": [
                         {
                             "text": {
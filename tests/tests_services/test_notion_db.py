@@ -97,6 +97,8 @@ async def test_save_sync_ids(notion_db, item, db):
 
 
 async def test_add_item(notion_db, item, item_data, db):
+    # notion picks the id of a created page
+    item_data.pop("id")
     with aioresponses() as m:
         m.post(CREATE_PAGE_URL, payload={"id": item.notion_id})
 
@@ -127,7 +129,22 @@ async def test_update_item(notion_db, item, item_data):
             data=None,
             method="PATCH",
             headers=notion_db._headers,
-            json=item_data,
+            json={"properties": item_data["properties"]},
+        )
+
+
+async def test_update_item_sends_only_changed_fields(notion_db, item):
+    item.changed_fields = ("status",)
+    with aioresponses() as m:
+        m.patch(PAGE_URL_FORMAT.format(item.notion_id), payload={})
+
+        await notion_db.update_item(item)
+        m.assert_called_once_with(
+            PAGE_URL_FORMAT.format(item.notion_id),
+            data=None,
+            method="PATCH",
+            headers=notion_db._headers,
+            json={"properties": {"Checkbox": {"checkbox": item.status}}},
         )
 
 
@@ -160,3 +177,20 @@ async def test_get_all_items(notion_db, item, item_data):
             method="POST",
             headers=notion_db._headers,
         )
+
+
+async def test_update_item_records_versions(notion_db, item, db):
+    await notion_db._save_sync_ids(item)
+    with aioresponses() as m:
+        m.patch(
+            PAGE_URL_FORMAT.format(item.notion_id),
+            payload={"last_edited_time": "2021-10-10T11:00:00.000Z"},
+        )
+
+        await notion_db.update_item(item)
+
+    db_item = await SyncedItem.get_by_sync_id(db, notion_id=item.notion_id)
+    assert db_item.notion_version == "2021-10-10T11:00:00+00:00"
+    assert db_item.google_task_version == item.version
+    assert db_item.fingerprint == item.fingerprint
+    await db_item.delete(db)
@@ -1,4 +1,5 @@
 import pytest
+from aioresponses import aioresponses
 
 from services.notion.notion_profiler import NotionProfiler
 
@@ -14,23 +15,26 @@ TASKS_LIST_URL = "https://tasks.googleapis.com/tasks/v1/users/@me/lists/"
 
 
 @pytest.fixture
-def profiler():
-    return NotionProfiler(token=TOKEN)
-
-
-def test_get_lists(profiler, requests_mock):
-    requests_mock.post(
-        SEARCH_URL,
-        json={
-            "results": [
-                {
-                    "id": "list_id",
-                    "title": [{"plain_text": "title"}],
-                }
-            ]
-        },
-    )
-
-    result = profiler.get_lists()
+async def profiler():
+    profiler = NotionProfiler(token=TOKEN)
+    yield profiler
+    await profiler.close()
+
+
+async def test_get_lists(profiler):
+    with aioresponses() as m:
+        m.post(
+            SEARCH_URL,
+            payload={
+                "results": [
+                    {
+                        "id": "list_id",
+                        "title": [{"plain_text": "title"}],
+                    }
+                ]
+            },
+        )
+
+        result = await profiler.get_lists()
 
     assert result == {"list_id": {"title": "title", "id": "list_id"}}
@@ -0,0 +1,40 @@
+import pytest
+
+from synchronizers.backoff import SyncBackoff
+
+
+@pytest.fixture
+def backoff():
+    return SyncBackoff(base_delay=10, max_delay=60)
+
+
+def test_delay_doubles_up_to_max(backoff, mocker):
+    mocker.patch("random.uniform", return_value=1.0)
+
+    delays = [backoff.failed("service") for _ in range(5)]
+
+    assert delays == [10, 20, 40, 60, 60]
+    assert backoff.failures("service") == 5
+
+
+def test_delay_is_jittered(backoff):
+    assert 5 <= backoff.failed("service") <= 10
+
+
+def test_success_resets_delay(backoff, mocker):
+    mocker.patch("random.uniform", return_value=1.0)
+    backoff.failed("service")
+    backoff.failed("service")
+
+    backoff.succeeded("service")
+
+    assert backoff.failures("service") == 0
+    assert backoff.failed("service") == 10
+
+
+def test_services_back_off_independently(backoff, mocker):
+    mocker.patch("random.uniform", return_value=1.0)
+    backoff.failed("failing")
+    backoff.failed("failing")
+
+    assert backoff.failed("other") == 10
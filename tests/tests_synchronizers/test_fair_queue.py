@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from synchronizers.fair_queue import FairQueue
+
+
+@pytest.fixture
+def fair_queue():
+    return FairQueue(workers=1, tenant_concurrency=1)
+
+
+async def run_cycles(fair_queue, syncing_service_id, cost, order, count):
+    for _ in range(count):
+        async with fair_queue.slot(syncing_service_id) as usage:
+            order.append(syncing_service_id)
+            await asyncio.sleep(0)
+            usage.cost = cost
+
+
+async def test_heavy_service_does_not_starve_light_ones(fair_queue):
+    order = []
+
+    await asyncio.gather(
+        run_cycles(fair_queue, "heavy", 10, order, 2),
+        run_cycles(fair_queue, "light1", 1, order, 5),
+        run_cycles(fair_queue, "light2", 1, order, 5),
+    )
+
+    # light services run while the heavy one pays for its first cycle
+    assert order[0] == "heavy"
+    assert order[1:11].count("heavy") == 0
+    shares = fair_queue.shares()
+    assert shares["heavy"]["cycles"] == 2
+    assert shares["light1"]["share"] == pytest.approx(5 / 30)
+
+
+async def test_weight_buys_more_turns(fair_queue):
+    fair_queue.set_weight("gold", 4)
+    order = []
+
+    await asyncio.gather(
+        run_cycles(fair_queue, "gold", 4, order, 4),
+        run_cycles(fair_queue, "free1", 4, order, 4),
+        run_cycles(fair_queue, "free2", 4, order, 4),
+    )
+
+    assert order[:7].count("gold") == 4
+
+
+async def test_tenant_concurrency_cap():
+    fair_queue = FairQueue(workers=4, tenant_concurrency=1)
+    running = []
+
+    async def cycle():
+        async with fair_queue.slot("service"):
+            running.append(1)
+            peak = len(running)
+            await asyncio.sleep(0)
+            running.pop()
+            return peak
+
+    assert await asyncio.gather(*(cycle() for _ in range(3))) == [1, 1, 1]
+
+
+async def test_cancelled_waiter_gives_up_its_turn(fair_queue):
+    async with fair_queue.slot("first"):
+        waiter = asyncio.create_task(run_cycles(fair_queue, "second", 1, [], 1))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+    async with fair_queue.slot("third"):
+        pass
+
+    assert set(fair_queue.shares()) == {"first", "third"}
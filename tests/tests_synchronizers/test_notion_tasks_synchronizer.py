@@ -0,0 +1,389 @@
+import asyncio
+import datetime
+
+import pytest
+
+from models.models import (
+    DeadLetter,
+    OutboxEntry,
+    PendingAdd,
+    SyncedItem,
+    SyncingService,
+    User,
+)
+from schemas.Item import Item
+from synchronizers.notion_tasks_synchronizer import (
+    ChangeSet,
+    CycleBudget,
+    NotionTasksSynchronizer,
+)
+
+EARLIER = datetime.datetime(2021, 10, 10, 10, 0, tzinfo=datetime.timezone.utc)
+LATER = datetime.datetime(2021, 10, 10, 11, 0, tzinfo=datetime.timezone.utc)
+
+
+@pytest.fixture
+def synchronizer(mocker):
+    notion_db = mocker.Mock(syncing_service_id="syncing_service_id")
+    google_tasks = mocker.Mock(syncing_service_id="syncing_service_id")
+    return NotionTasksSynchronizer(notion_db, google_tasks, db=None)
+
+
+@pytest.fixture
+async def syncing_service(db):
+    user = await User(
+        email="test_notion_tasks_synchronizer@test.com", password="password"
+    ).save(db)
+    syncing_service = await SyncingService(user_id=user.id).save(db)
+    yield syncing_service
+    pending = await OutboxEntry.get_pending(db, syncing_service.id, 100)
+    await OutboxEntry.complete(db, [entry.id for entry in pending], [])
+    letters = await DeadLetter.get_all(db, syncing_service.id)
+    await DeadLetter.delete_many(db, [letter.id for letter in letters])
+    await syncing_service.delete(db)
+    await user.delete(db)
+
+
+@pytest.fixture
+def db_synchronizer(mocker, db, syncing_service):
+    """Synchronizer with mocked services writing its outbox to the database."""
+
+    async def add_items(items):
+        for item in items:
+            item.google_task_id = f"task_{item.notion_id}"
+        return [None] * len(items)
+
+    notion_db = mocker.Mock(syncing_service_id=syncing_service.id, request_count=0)
+    notion_db.add_item = mocker.AsyncMock()
+    notion_db.update_item = mocker.AsyncMock()
+    google_tasks = mocker.Mock(syncing_service_id=syncing_service.id, request_count=0)
+    google_tasks.add_items = mocker.AsyncMock(side_effect=add_items)
+    google_tasks.update_items = mocker.AsyncMock(
+        side_effect=lambda items: [None] * len(items)
+    )
+    return NotionTasksSynchronizer(notion_db, google_tasks, db=db)
+
+
+def synced(name="name", status=False, updated_at=EARLIER, synced_version=""):
+    """Item of an already synced notion row and google task pair."""
+    return Item(
+        name=name,
+        status=status,
+        updated_at=updated_at,
+        notion_id="notion_id",
+        google_task_id="google_task_id",
+        synced_version=synced_version,
+    )
+
+
+def test_diff_new_items(synchronizer):
+    notion = Item(name="notion", status=False, updated_at=EARLIER, notion_id="n")
+    google = Item(name="google", status=True, updated_at=EARLIER, google_task_id="g")
+
+    change_set = synchronizer.diff([notion], [google])
+
+    assert change_set.google_tasks_add_list == [notion]
+    assert change_set.notion_rows_add_list == [google]
+    assert not change_set.google_tasks_update_list
+    assert not change_set.notion_rows_update_list
+
+
+def test_diff_links_unlinked_duplicates(synchronizer):
+    notion = Item(name="same", status=False, updated_at=EARLIER, notion_id="n")
+    google = Item(name="same", status=False, updated_at=LATER, google_task_id="g")
+    other = Item(name="other", status=False, updated_at=LATER, google_task_id="o")
+
+    change_set = synchronizer.diff([notion], [google, other])
+
+    assert change_set.links == [notion]
+    assert notion.google_task_id == "g"
+    assert not change_set.google_tasks_add_list
+    assert change_set.notion_rows_add_list == [other]
+
+
+def test_diff_equal_items(synchronizer):
+    change_set = synchronizer.diff([synced()], [synced(updated_at=LATER)])
+
+    assert not change_set
+
+
+def test_diff_newer_side_wins_without_recorded_versions(synchronizer):
+    notion = synced(status=True, updated_at=EARLIER)
+    google = synced(status=False, updated_at=LATER)
+
+    change_set = synchronizer.diff([notion], [google])
+
+    assert change_set.notion_rows_update_list == [google]
+    assert not change_set.google_tasks_update_list
+    assert google.changed_fields == ("status",)
+
+
+def test_diff_ignores_echo_of_own_write(synchronizer):
+    # google task was last written by sync at LATER, notion row was edited
+    # after sync but its rounded time is earlier
+    notion = synced(status=True, updated_at=EARLIER)
+    google = synced(
+        status=False, updated_at=LATER, synced_version=LATER.isoformat()
+    )
+
+    change_set = synchronizer.diff([notion], [google])
+
+    assert change_set.google_tasks_update_list == [notion]
+    assert not change_set.notion_rows_update_list
+
+
+def test_diff_changed_side_picked_by_fingerprint(synchronizer):
+    last_synced = synced(status=False).fingerprint
+    # google task looks newer, but only notion content changed
+    notion = synced(status=True, updated_at=EARLIER)
+    google = synced(status=False, updated_at=LATER)
+    notion.synced_fingerprint = google.synced_fingerprint = last_synced
+
+    change_set = synchronizer.diff([notion], [google])
+
+    assert change_set.google_tasks_update_list == [notion]
+    assert not change_set.notion_rows_update_list
+
+
+def test_diff_conflict_falls_back_to_update_time(synchronizer):
+    last_synced = synced(name="old").fingerprint
+    notion = synced(name="notion", updated_at=EARLIER)
+    google = synced(name="google", updated_at=LATER)
+    notion.synced_fingerprint = google.synced_fingerprint = last_synced
+
+    change_set = synchronizer.diff([notion], [google])
+
+    assert change_set.notion_rows_update_list == [google]
+
+
+def test_fingerprint_is_stable():
+    item = synced(name="name", status=True)
+
+    assert item.fingerprint == synced(name="name", status=True).fingerprint
+    assert item.fingerprint == "b47058becd1b3606"
+    assert item.fingerprint != synced(name="name", status=False).fingerprint
+    assert item.fingerprint != synced(name="other", status=True).fingerprint
+
+
+def new_notion_row(notion_id="n"):
+    return Item(name="notion", status=False, updated_at=EARLIER, notion_id=notion_id)
+
+
+async def test_apply_drains_outbox(db, db_synchronizer, syncing_service):
+    await db_synchronizer.apply(ChangeSet(google_tasks_add_list=[new_notion_row()]))
+
+    (written,) = db_synchronizer._google_task_list.add_items.call_args.args[0]
+    assert written.name == "notion"
+    assert written.notion_id == "n"
+    assert not await OutboxEntry.has_pending(db, syncing_service.id)
+
+
+async def test_failed_write_stays_in_outbox(db, db_synchronizer, syncing_service):
+    update_items = db_synchronizer._google_task_list.update_items
+    update_items.side_effect = lambda items: [Exception("error")] * len(items)
+
+    await db_synchronizer.apply(ChangeSet(google_tasks_update_list=[synced()]))
+    await db_synchronizer.drain()
+
+    (entry,) = await OutboxEntry.get_pending(db, syncing_service.id, 100)
+    assert (entry.target, entry.operation) == ("google_tasks", "update")
+    assert entry.item_key == "google_task_id"
+    assert entry.attempts == 2
+    assert entry.last_error == "Exception('error')"
+
+
+async def test_write_is_dead_lettered_after_last_attempt(
+    mocker, db, db_synchronizer, syncing_service
+):
+    mocker.patch(
+        "synchronizers.notion_tasks_synchronizer.SYNC_OUTBOX_MAX_ATTEMPTS", 2
+    )
+    update_items = db_synchronizer._google_task_list.update_items
+    update_items.side_effect = lambda items: [Exception("invalid")] * len(items)
+
+    await db_synchronizer.apply(ChangeSet(google_tasks_update_list=[synced()]))
+    await db_synchronizer.drain()
+    await db_synchronizer.drain()
+
+    assert update_items.await_count == 2
+    assert not await OutboxEntry.has_pending(db, syncing_service.id)
+    (letter,) = await DeadLetter.get_all(db, syncing_service.id)
+    assert (letter.target, letter.operation) == ("google_tasks", "update")
+    assert letter.attempts == 2
+    assert letter.error == "Exception('invalid')"
+    assert letter.fingerprint == synced().fingerprint
+
+
+async def test_dead_lettered_write_is_not_planned(
+    mocker, db, db_synchronizer, syncing_service
+):
+    mocker.patch(
+        "synchronizers.notion_tasks_synchronizer.SYNC_OUTBOX_MAX_ATTEMPTS", 1
+    )
+    update_items = db_synchronizer._google_task_list.update_items
+    update_items.side_effect = lambda items: [Exception("invalid")] * len(items)
+    await db_synchronizer.apply(ChangeSet(google_tasks_update_list=[synced()]))
+
+    await db_synchronizer.plan(ChangeSet(google_tasks_update_list=[synced()]))
+    assert not await OutboxEntry.has_pending(db, syncing_service.id)
+
+    # once the item is edited its write is tried again
+    await db_synchronizer.plan(
+        ChangeSet(google_tasks_update_list=[synced(name="fixed")])
+    )
+    (entry,) = await OutboxEntry.get_pending(db, syncing_service.id, 100)
+    assert entry.item_key == "google_task_id"
+    assert await DeadLetter.get_all(db, syncing_service.id) == []
+
+
+async def test_drain_skips_applied_add(db, db_synchronizer, syncing_service):
+    # the task was created and its ids saved, but the entry was not deleted
+    await db_synchronizer.plan(ChangeSet(google_tasks_add_list=[new_notion_row()]))
+    synced_item = await SyncedItem(
+        notion_id="n", google_task_id="task_n", syncing_service_id=syncing_service.id
+    ).save(db)
+
+    await db_synchronizer.drain()
+
+    db_synchronizer._google_task_list.add_items.assert_awaited_once_with([])
+    assert not await OutboxEntry.has_pending(db, syncing_service.id)
+    await synced_item.delete(db)
+
+
+async def test_add_in_ledger_is_not_sent_again(db, db_synchronizer, syncing_service):
+    row = new_notion_row()
+    await db_synchronizer.plan(ChangeSet(google_tasks_add_list=[row]))
+    await PendingAdd.add_many(db, syncing_service.id, [row.idempotency_key])
+
+    await db_synchronizer.drain()
+
+    db_synchronizer._google_task_list.add_items.assert_awaited_once_with([])
+    (entry,) = await OutboxEntry.get_pending(db, syncing_service.id, 100)
+    assert entry.attempts == 0
+    await PendingAdd.delete_many(db, syncing_service.id, [row.idempotency_key])
+
+
+async def test_lost_ids_of_add_are_linked(db, db_synchronizer, syncing_service):
+    add_items = db_synchronizer._google_task_list.add_items
+    # task gets created, but the response is lost
+    add_items.side_effect = TimeoutError
+    await db_synchronizer.apply(ChangeSet(google_tasks_add_list=[new_notion_row()]))
+
+    # next cycle sees the created task without a link
+    created = Item(name="notion", status=False, updated_at=LATER, google_task_id="g")
+    change_set = db_synchronizer.diff([new_notion_row()], [created])
+    await db_synchronizer.apply(change_set)
+
+    assert [call.args[0] for call in add_items.await_args_list if call.args[0]] == [
+        [new_notion_row()]
+    ]
+    assert not change_set.notion_rows_add_list
+    assert not await OutboxEntry.has_pending(db, syncing_service.id)
+    assert not await PendingAdd.get_keys(
+        db, syncing_service.id, [new_notion_row().idempotency_key]
+    )
+    synced_item = await SyncedItem.get_by_sync_id(db, notion_id="n")
+    assert synced_item.google_task_id == "g"
+    await synced_item.delete(db)
+
+
+async def test_concurrent_syncs_run_one_cycle(mocker, db_synchronizer):
+    async def fetch(budget=None):
+        await asyncio.sleep(0.01)
+        return [], []
+
+    fetch_mock = mocker.patch.object(db_synchronizer, "fetch", side_effect=fetch)
+
+    await asyncio.gather(db_synchronizer.sync(), db_synchronizer.sync())
+
+    assert fetch_mock.await_count == 1
+
+
+async def test_drain_stops_when_budget_runs_out(db, db_synchronizer, syncing_service):
+    await db_synchronizer.plan(
+        ChangeSet(
+            google_tasks_update_list=[synced()],
+            notion_rows_update_list=[synced()],
+        )
+    )
+    loop = asyncio.get_running_loop()
+
+    await db_synchronizer.drain(CycleBudget(deadline=loop.time() + 10, items=1))
+    await db_synchronizer.drain(CycleBudget(deadline=loop.time(), items=10))
+
+    # one of the two writes was applied, the other waits for the next cycle
+    pending = await OutboxEntry.get_pending(db, syncing_service.id, 100)
+    assert len(pending) == 1
+
+
+async def test_fetch_continues_from_checkpoint(mocker, db, db_synchronizer):
+    def page(name, cursor):
+        item = Item(name=name, status=False, updated_at=EARLIER)
+        return [item], cursor
+
+    db_synchronizer._notion_db.get_items_page = mocker.AsyncMock(
+        side_effect=[page("n1", "cursor"), page("n2", None)]
+    )
+    db_synchronizer._google_task_list.get_items_page = mocker.AsyncMock(
+        side_effect=[page("g1", None)]
+    )
+    loop = asyncio.get_running_loop()
+
+    assert await db_synchronizer.fetch(CycleBudget(loop.time() + 10, items=1)) is None
+    notion_rows, google_tasks_list = await db_synchronizer.fetch(
+        CycleBudget(loop.time() + 10, items=1)
+    )
+
+    assert [item.name for item in notion_rows] == ["n1", "n2"]
+    assert [item.name for item in google_tasks_list] == ["g1"]
+    db_synchronizer._notion_db.get_items_page.assert_awaited_with("cursor")
+
+
+async def test_failed_google_page_is_not_diffed(
+    mocker, db, db_synchronizer, syncing_service
+):
+    notion = Item(name="n1", status=False, updated_at=EARLIER, notion_id="n1")
+    google = Item(name="g1", status=False, updated_at=EARLIER, google_task_id="g1")
+    db_synchronizer._notion_db.get_items_page = mocker.AsyncMock(
+        return_value=([notion], None)
+    )
+    # page 2 failed, it could hold the counterpart of the notion row
+    db_synchronizer._google_task_list.get_items_page = mocker.AsyncMock(
+        side_effect=[([google], "cursor"), None]
+    )
+
+    await db_synchronizer.sync()
+
+    assert await OutboxEntry.get_pending(db, syncing_service.id, 100) == []
+    db_synchronizer._google_task_list.add_items.assert_not_awaited()
+    assert db_synchronizer._checkpoint.google_tasks_cursor == "cursor"
+
+
+async def test_fetch_maps_pairs_of_the_service(
+    mocker, db, db_synchronizer, syncing_service
+):
+    own = await SyncedItem(
+        notion_id="n", google_task_id="g", syncing_service_id=syncing_service.id
+    ).save(db)
+    other_service = await SyncingService(user_id=syncing_service.user_id).save(db)
+    other = await SyncedItem(
+        notion_id="n", google_task_id="other_g", syncing_service_id=other_service.id
+    ).save(db)
+    notion = Item(name="n", status=False, updated_at=EARLIER, notion_id="n")
+    google = Item(name="g", status=False, updated_at=EARLIER, google_task_id="g")
+    db_synchronizer._notion_db.get_items_page = mocker.AsyncMock(
+        return_value=([notion], None)
+    )
+    db_synchronizer._google_task_list.get_items_page = mocker.AsyncMock(
+        return_value=([google], None)
+    )
+
+    try:
+        (notion_row,), (google_task,) = await db_synchronizer.fetch()
+    finally:
+        await own.delete(db)
+        await other.delete(db)
+        await other_service.delete(db)
+
+    assert notion_row.google_task_id == "g"
+    assert google_task.notion_id == "n"
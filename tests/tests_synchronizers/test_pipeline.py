@@ -0,0 +1,195 @@
+import asyncio
+import datetime
+from contextlib import asynccontextmanager
+
+import pytest
+from prometheus_client import REGISTRY
+
+from config import REDIS_URL
+from redis_client import RedisClient
+from schemas.Item import Item
+from synchronizers.notion_tasks_synchronizer import ChangeSet, NotionTasksSynchronizer
+from synchronizers.pipeline import SyncPipeline, item_from_dict, item_to_dict
+
+SYNCING_SERVICE_ID = "test_pipeline_service"
+DATETIME = datetime.datetime(2021, 10, 10, 10, 10, 10, 10)
+
+
+class FakeSynchronizer(NotionTasksSynchronizer):
+    def __init__(self) -> None:
+        self._syncing_service_id = SYNCING_SERVICE_ID
+        self.applied = asyncio.Queue()
+
+    async def fetch(self):
+        return (
+            [Item(name="notion", status=False, updated_at=DATETIME, notion_id="n")],
+            [Item(name="google", status=True, updated_at=DATETIME, google_task_id="g")],
+        )
+
+    async def apply(self, change_set: ChangeSet):
+        await self.applied.put(change_set)
+
+
+class FailingSynchronizer(FakeSynchronizer):
+    def diff(self, notion_rows, google_tasks_list):
+        raise RuntimeError("poison")
+
+
+@pytest.fixture
+async def pipeline():
+    redis_client = RedisClient(REDIS_URL)
+    pipeline = SyncPipeline(redis_client, prefix="test_sync_pipeline")
+    await pipeline.finish_cycle(SYNCING_SERVICE_ID)
+    await pipeline.start()
+    yield pipeline
+    await pipeline.stop()
+    await redis_client.delete(*(stage.stream for stage in pipeline.stages))
+
+
+@pytest.fixture
+def synchronizer(pipeline):
+    synchronizer = FakeSynchronizer()
+    pipeline.register(SYNCING_SERVICE_ID, synchronizer)
+    return synchronizer
+
+
+def test_item_serialization():
+    item = Item(
+        name="name",
+        status=True,
+        updated_at=DATETIME,
+        notion_id="notion_id",
+        google_task_id="google_task_id",
+    )
+    result = item_from_dict(item_to_dict(item))
+
+    assert result == item
+    assert result.updated_at == item.updated_at
+    assert result.notion_id == item.notion_id
+    assert result.google_task_id == item.google_task_id
+
+
+async def test_pipeline_applies_changes(pipeline, synchronizer):
+    assert await pipeline.submit(SYNCING_SERVICE_ID) is True
+
+    change_set = await asyncio.wait_for(synchronizer.applied.get(), 5)
+    assert [item.name for item in change_set.google_tasks_add_list] == ["notion"]
+    assert [item.name for item in change_set.notion_rows_add_list] == ["google"]
+
+    # the diff stage acks its message after the apply stage got it
+    await asyncio.sleep(0.1)
+    stats = await pipeline.stats()
+    assert stats["fetch"]["processed"] == 1
+    assert stats["diff"]["processed"] == 1
+
+
+async def test_submit_is_single_flight(pipeline, synchronizer):
+    assert await pipeline.submit(SYNCING_SERVICE_ID) is True
+    assert await pipeline.submit(SYNCING_SERVICE_ID) is False
+
+    await asyncio.wait_for(synchronizer.applied.get(), 5)
+    await asyncio.sleep(0.1)
+    assert await pipeline.submit(SYNCING_SERVICE_ID) is True
+
+
+async def test_poison_message_is_dropped(mocker):
+    mocker.patch("synchronizers.pipeline.SYNC_STREAM_CLAIM_IDLE_MS", 0)
+    mocker.patch("synchronizers.pipeline.SYNC_STREAM_MAX_DELIVERIES", 2)
+    redis_client = RedisClient(REDIS_URL)
+    pipeline = SyncPipeline(
+        redis_client,
+        prefix="test_sync_pipeline_poison",
+        fetch_concurrency=1,
+        diff_concurrency=1,
+        apply_concurrency=1,
+    )
+    pipeline.register(SYNCING_SERVICE_ID, FailingSynchronizer())
+    await pipeline.finish_cycle(SYNCING_SERVICE_ID)
+    await pipeline.start()
+    try:
+        assert await pipeline.submit(SYNCING_SERVICE_ID) is True
+        diff = pipeline.stages[1]
+        for _ in range(50):
+            if diff.dropped:
+                break
+            await asyncio.sleep(0.1)
+
+        stats = await pipeline.stats()
+        assert stats["diff"]["failed"] == 2
+        assert stats["diff"]["dropped"] == 1
+        assert stats["diff"]["pending"] == 0
+        # the cycle of the service is finished, a new one can start
+        assert await pipeline.submit(SYNCING_SERVICE_ID) is True
+    finally:
+        await pipeline.stop()
+        await pipeline.finish_cycle(SYNCING_SERVICE_ID)
+        await redis_client.delete(*(stage.stream for stage in pipeline.stages))
+
+
+async def test_loaded_synchronizer_is_closed():
+    loaded = []
+
+    @asynccontextmanager
+    async def loader(syncing_service_id):
+        synchronizer = FakeSynchronizer()
+        loaded.append(synchronizer)
+        yield synchronizer
+        synchronizer.closed = True
+
+    pipeline = SyncPipeline(RedisClient(REDIS_URL), synchronizer_loader=loader)
+    async with pipeline.synchronizer(SYNCING_SERVICE_ID) as synchronizer:
+        assert synchronizer is loaded[0]
+
+    assert synchronizer.closed
+    assert pipeline._synchronizers == {}
+
+
+async def test_export_metrics(pipeline, synchronizer):
+    assert await pipeline.submit(SYNCING_SERVICE_ID) is True
+    await asyncio.wait_for(synchronizer.applied.get(), 5)
+
+    await pipeline.export_metrics()
+
+    for stage in ("fetch", "diff", "apply"):
+        labels = {"stage": stage}
+        assert REGISTRY.get_sample_value("sync_pipeline_lag_messages", labels) == 0
+        assert (
+            REGISTRY.get_sample_value("sync_pipeline_dropped_messages", labels) == 0
+        )
+
+
+@pytest.mark.parametrize("delay, quarantined", [(60.0, False), (None, True)])
+async def test_failed_cycle_goes_to_cycle_handler(delay, quarantined):
+    errors = []
+
+    async def cycle_handler(syncing_service_id, error):
+        errors.append(error)
+        return delay
+
+    redis_client = RedisClient(REDIS_URL)
+    pipeline = SyncPipeline(
+        redis_client,
+        cycle_handler=cycle_handler,
+        prefix="test_sync_pipeline_handler",
+    )
+    pipeline.register(SYNCING_SERVICE_ID, FailingSynchronizer())
+    await pipeline.finish_cycle(SYNCING_SERVICE_ID)
+    await pipeline.start()
+    try:
+        assert await pipeline.submit(SYNCING_SERVICE_ID) is True
+        for _ in range(50):
+            if errors:
+                break
+            await asyncio.sleep(0.1)
+        await asyncio.sleep(0.1)
+
+        assert [str(error) for error in errors] == ["poison"]
+        stats = await pipeline.stats()
+        assert stats["diff"]["pending"] == 0
+        # backing off or quarantined, no cycle starts
+        assert await pipeline.submit(SYNCING_SERVICE_ID) is False
+        assert await pipeline.quarantined(SYNCING_SERVICE_ID) is quarantined
+    finally:
+        await pipeline.stop()
+        await pipeline.finish_cycle(SYNCING_SERVICE_ID)
+        await redis_client.delete(*(stage.stream for stage in pipeline.stages))
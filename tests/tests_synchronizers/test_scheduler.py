@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from synchronizers.scheduler import SyncScheduler
+
+SYNCING_SERVICE_ID = "syncing_service_id"
+
+
+@pytest.fixture
+def scheduler():
+    return SyncScheduler(poll_time=0.05, safety_net_time=10, coalesce_time=0.01)
+
+
+async def test_wait_polls(scheduler):
+    await asyncio.wait_for(scheduler.wait_for_next_cycle(SYNCING_SERVICE_ID), 1)
+
+
+async def test_trigger_not_registered(scheduler):
+    assert scheduler.trigger(SYNCING_SERVICE_ID, "notion") is False
+    assert scheduler.trigger(SYNCING_SERVICE_ID, "google_tasks") is False
+
+    scheduler.register(SYNCING_SERVICE_ID)
+    assert scheduler.interval(SYNCING_SERVICE_ID) == 0.05
+
+
+async def test_trigger_keeps_polling_until_every_source_pushed(scheduler):
+    scheduler.register(SYNCING_SERVICE_ID)
+    assert scheduler.interval(SYNCING_SERVICE_ID) == 0.05
+
+    assert scheduler.trigger(SYNCING_SERVICE_ID, "notion") is True
+    assert scheduler.interval(SYNCING_SERVICE_ID) == 0.05
+
+    assert scheduler.trigger(SYNCING_SERVICE_ID, "google_tasks") is True
+    assert scheduler.interval(SYNCING_SERVICE_ID) == 10
+
+
+async def test_unregister_forgets_push_sources(scheduler):
+    scheduler.register(SYNCING_SERVICE_ID)
+    scheduler.trigger(SYNCING_SERVICE_ID, "notion")
+    scheduler.trigger(SYNCING_SERVICE_ID, "google_tasks")
+
+    scheduler.unregister(SYNCING_SERVICE_ID)
+    scheduler.register(SYNCING_SERVICE_ID)
+    assert scheduler.interval(SYNCING_SERVICE_ID) == 0.05
+
+
+async def test_trigger_wakes_loop(scheduler):
+    scheduler._poll_time = 10
+    scheduler.register(SYNCING_SERVICE_ID)
+    waiter = asyncio.create_task(scheduler.wait_for_next_cycle(SYNCING_SERVICE_ID))
+    await asyncio.sleep(0)
+
+    scheduler.trigger(SYNCING_SERVICE_ID, "notion")
+    await asyncio.wait_for(waiter, 1)
+
+
+async def test_triggers_are_coalesced(scheduler):
+    scheduler._poll_time = 10
+    scheduler.register(SYNCING_SERVICE_ID)
+    for _ in range(5):
+        scheduler.trigger(SYNCING_SERVICE_ID, "notion")
+
+    await asyncio.wait_for(scheduler.wait_for_next_cycle(SYNCING_SERVICE_ID), 1)
+
+    waiter = asyncio.create_task(scheduler.wait_for_next_cycle(SYNCING_SERVICE_ID))
+    await asyncio.sleep(0.05)
+    assert not waiter.done()
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+
+
+async def test_lag_counts_wait_for_worker_slot(scheduler):
+    scheduler.register(SYNCING_SERVICE_ID)
+    await scheduler.wait_for_next_cycle(SYNCING_SERVICE_ID)
+
+    # a cycle waiting for its slot lags already
+    await asyncio.sleep(0.1)
+    assert scheduler.lag() >= 0.1
+
+    scheduler.cycle_started(SYNCING_SERVICE_ID)
+    assert scheduler.lag() >= 0.1
+
+
+async def test_lag_is_max_over_window(scheduler):
+    scheduler._lag_window = 0.1
+    scheduler.register(SYNCING_SERVICE_ID)
+    await scheduler.wait_for_next_cycle(SYNCING_SERVICE_ID)
+    await asyncio.sleep(0.05)
+    scheduler.cycle_started(SYNCING_SERVICE_ID)
+
+    await scheduler.wait_for_next_cycle(SYNCING_SERVICE_ID)
+    scheduler.cycle_started(SYNCING_SERVICE_ID)
+    assert scheduler.lag() >= 0.05
+
+    await asyncio.sleep(0.1)
+    assert scheduler.lag() < 0.05
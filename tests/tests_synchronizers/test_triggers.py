@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from config import REDIS_URL
+from redis_client import RedisClient
+from synchronizers.scheduler import SyncScheduler
+from synchronizers.triggers import SyncTriggers
+
+SYNCING_SERVICE_ID = "syncing_service_id"
+CHANNEL = "test_sync_triggers"
+
+
+@pytest.fixture
+async def processes():
+    """Triggers of two processes, the second one runs the sync loop."""
+    processes = []
+    for _ in range(2):
+        triggers = SyncTriggers(RedisClient(REDIS_URL), SyncScheduler(), CHANNEL)
+        triggers.start()
+        processes.append(triggers)
+    processes[1]._scheduler.register(SYNCING_SERVICE_ID)
+    # let both subscribe
+    await asyncio.sleep(0.2)
+    yield processes
+    for triggers in processes:
+        await triggers.stop()
+
+
+async def test_trigger_of_local_loop(processes):
+    _, owner = processes
+
+    assert await owner.trigger(SYNCING_SERVICE_ID, "notion") is True
+    assert owner._scheduler._wakeups[SYNCING_SERVICE_ID].is_set()
+
+
+async def test_trigger_is_relayed_to_owning_process(processes):
+    other, owner = processes
+
+    assert await other.trigger(SYNCING_SERVICE_ID, "notion") is False
+    for _ in range(50):
+        if owner._scheduler._wakeups[SYNCING_SERVICE_ID].is_set():
+            break
+        await asyncio.sleep(0.02)
+
+    assert owner._scheduler._wakeups[SYNCING_SERVICE_ID].is_set()
+    assert not other._scheduler.is_registered(SYNCING_SERVICE_ID)
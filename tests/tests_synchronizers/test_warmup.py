@@ -0,0 +1,50 @@
+import asyncio
+
+from synchronizers.warmup import SyncWarmup
+
+
+async def test_first_cycles_are_capped():
+    warmup = SyncWarmup(window=0, concurrency=2)
+    running = []
+    peaks = []
+
+    async def first_cycle():
+        async with warmup.first_cycle():
+            running.append(1)
+            peaks.append(len(running))
+            await asyncio.sleep(0.01)
+            running.pop()
+
+    await asyncio.gather(*(first_cycle() for _ in range(5)))
+
+    assert max(peaks) == 2
+    assert warmup.pending == 0
+
+
+async def test_first_cycles_are_spread_over_window(mocker):
+    sleep = mocker.patch("asyncio.sleep", mocker.AsyncMock())
+    uniform = mocker.patch("random.uniform", return_value=12.5)
+    warmup = SyncWarmup(window=30, concurrency=1)
+
+    async with warmup.first_cycle():
+        assert warmup.pending == 1
+
+    uniform.assert_called_once_with(0, 30)
+    sleep.assert_awaited_once_with(12.5)
+    assert warmup.pending == 0
+
+
+async def test_cancelled_loop_is_not_pending():
+    warmup = SyncWarmup(window=10, concurrency=1)
+
+    async def first_cycle():
+        async with warmup.first_cycle():
+            pass
+
+    task = asyncio.create_task(first_cycle())
+    await asyncio.sleep(0)
+    assert warmup.pending == 1
+
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    assert warmup.pending == 0
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from synchronizers.watchdog import SyncWatchdog
+
+SYNCING_SERVICE_ID = "syncing_service_id"
+
+
+@pytest.fixture
+def watchdog():
+    return SyncWatchdog(check_interval=10, grace=0)
+
+
+async def loop_forever():
+    await asyncio.sleep(10)
+
+
+async def watch(watchdog, coroutine):
+    restarts = []
+
+    async def restart():
+        restarts.append(SYNCING_SERVICE_ID)
+
+    task = asyncio.create_task(coroutine)
+    watchdog.watch(SYNCING_SERVICE_ID, task, restart)
+    await asyncio.sleep(0)
+    return task, restarts
+
+
+async def test_overdue_loop_is_restarted(watchdog):
+    task, restarts = await watch(watchdog, loop_forever())
+    watchdog.beat(SYNCING_SERVICE_ID, 0)
+    await asyncio.sleep(0.01)
+
+    assert watchdog.stalled() == [SYNCING_SERVICE_ID]
+    assert await watchdog.check() == [SYNCING_SERVICE_ID]
+    assert task.cancelled()
+    assert restarts == [SYNCING_SERVICE_ID]
+    assert watchdog.stats() == {
+        "sync_loops": 0,
+        "stalled_loops": 0,
+        "restarted_loops": 1,
+    }
+
+
+async def test_beating_loop_is_not_restarted(watchdog):
+    task, restarts = await watch(watchdog, loop_forever())
+    watchdog.beat(SYNCING_SERVICE_ID, 10)
+
+    assert await watchdog.check() == []
+    assert restarts == []
+    task.cancel()
+
+
+async def test_loop_waiting_for_slot_is_not_stalled(watchdog):
+    task, _ = await watch(watchdog, loop_forever())
+    watchdog.beat(SYNCING_SERVICE_ID, None)
+    await asyncio.sleep(0.01)
+
+    assert watchdog.stalled() == []
+    task.cancel()
+
+
+async def test_dead_loop_is_restarted(watchdog):
+    async def die():
+        raise RuntimeError("boom")
+
+    _, restarts = await watch(watchdog, die())
+
+    assert await watchdog.check() == [SYNCING_SERVICE_ID]
+    assert restarts == [SYNCING_SERVICE_ID]
+
+
+async def test_stopped_loop_is_forgotten(watchdog):
+    task, restarts = await watch(watchdog, loop_forever())
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert await watchdog.check() == []
+    assert restarts == []
+    assert watchdog.stats()["sync_loops"] == 0
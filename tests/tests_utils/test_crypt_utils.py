@@ -3,7 +3,15 @@ import datetime
 import pytest
 
 from models.models import User
-from utils.crypt_utils import create_password, decode_dict, encode, verify_password
+from utils import auth_cache
+from utils.crypt_utils import (
+    create_password,
+    create_password_async,
+    decode_dict,
+    encode,
+    verify_password,
+    verify_password_async,
+)
 from utils.db_utils import generate_access_token, validate_token
 
 
@@ -43,6 +51,28 @@ async def test_validate_token(user, db):
     assert result.email == user.email
 
 
+async def test_validate_token_cached(user, db, mocker):
+    auth_cache.clear()
+    access_token, _ = generate_access_token(user)
+    await validate_token(access_token, db)
+
+    get_by_email = mocker.patch("utils.db_utils.UserDB.get_by_email")
+    result = await validate_token(access_token, db)
+    assert result.id == user.id
+    assert result.password is None
+    get_by_email.assert_not_called()
+
+
+async def test_validate_token_cache_invalidated(user, db):
+    auth_cache.clear()
+    access_token, _ = generate_access_token(user)
+    await validate_token(access_token, db)
+    assert auth_cache.get_principal(access_token) is not None
+
+    auth_cache.invalidate_user(user.id)
+    assert auth_cache.get_principal(access_token) is None
+
+
 def test_create_password():
     result = create_password("password")
     assert result == "5c9646af43907a512a8a4251189ba3600a0b657d931386618216e45772eef811"
@@ -54,3 +84,14 @@ def test_verify_password():
         "5c9646af43907a512a8a4251189ba3600a0b657d931386618216e45772eef811",
     )
     assert result is True
+
+
+async def test_create_password_async():
+    result = await create_password_async("password")
+    assert result == create_password("password")
+
+
+async def test_verify_password_async():
+    hashed_password = create_password("password")
+    assert await verify_password_async("password", hashed_password) is True
+    assert await verify_password_async("wrong_password", hashed_password) is False
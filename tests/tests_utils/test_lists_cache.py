@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from config import REDIS_URL
+from redis_client import RedisClient
+from utils.lists_cache import AvailableListsCache
+
+SYNCING_SERVICE_ID = "test_lists_cache_service"
+LISTS = {"list_id": {"id": "list_id", "title": "title"}}
+
+
+@pytest.fixture
+async def cache():
+    cache = AvailableListsCache(RedisClient(REDIS_URL), ttl=60, stale_ttl=120)
+    await cache.invalidate(SYNCING_SERVICE_ID)
+    yield cache
+    await cache.invalidate(SYNCING_SERVICE_ID)
+
+
+@pytest.fixture
+def loader():
+    calls = []
+
+    async def load():
+        calls.append(1)
+        return LISTS
+
+    load.calls = calls
+    return load
+
+
+async def test_get_or_load_caches_result(cache, loader):
+    result = await cache.get_or_load(SYNCING_SERVICE_ID, "notion", loader)
+    assert result == LISTS
+
+    result = await cache.get_or_load(SYNCING_SERVICE_ID, "notion", loader)
+    assert result == LISTS
+    assert len(loader.calls) == 1
+
+
+async def test_get_or_load_reads_from_redis(cache, loader):
+    await cache.get_or_load(SYNCING_SERVICE_ID, "notion", loader)
+    cache._local.clear()
+
+    result = await cache.get_or_load(SYNCING_SERVICE_ID, "notion", loader)
+    assert result == LISTS
+    assert len(loader.calls) == 1
+
+
+async def test_prefetch_reads_both_lists_at_once(cache, loader, mocker):
+    await cache.get_or_load(SYNCING_SERVICE_ID, "notion", loader)
+    await cache.get_or_load(SYNCING_SERVICE_ID, "google_tasks", loader)
+    cache._local.clear()
+    get = mocker.spy(cache._redis, "get")
+
+    await cache.prefetch(SYNCING_SERVICE_ID)
+    for name in ("notion", "google_tasks"):
+        assert await cache.get_or_load(SYNCING_SERVICE_ID, name, loader) == LISTS
+
+    get.assert_not_called()
+    assert len(loader.calls) == 2
+
+
+async def test_get_or_load_does_not_cache_empty_result(cache):
+    async def load():
+        return {}
+
+    await cache.get_or_load(SYNCING_SERVICE_ID, "notion", load)
+    assert await cache._get_entry(cache._key(SYNCING_SERVICE_ID, "notion")) is None
+
+
+async def test_stale_entry_is_served_and_revalidated(cache, loader):
+    cache._ttl = 0
+    await cache.get_or_load(SYNCING_SERVICE_ID, "notion", loader)
+
+    result = await cache.get_or_load(SYNCING_SERVICE_ID, "notion", loader)
+    assert result == LISTS
+
+    await asyncio.gather(*cache._revalidations)
+    assert len(loader.calls) == 2
+
+
+async def test_invalidate(cache, loader):
+    await cache.get_or_load(SYNCING_SERVICE_ID, "google_tasks", loader)
+    await cache.invalidate(SYNCING_SERVICE_ID)
+
+    await cache.get_or_load(SYNCING_SERVICE_ID, "google_tasks", loader)
+    assert len(loader.calls) == 2
+
+
+async def test_invalidate_by_other_process(cache, loader):
+    other = AvailableListsCache(cache._redis, ttl=60, stale_ttl=120, local_ttl=0.1)
+    await other.get_or_load(SYNCING_SERVICE_ID, "notion", loader)
+    await cache.invalidate(SYNCING_SERVICE_ID)
+
+    # the local copy outlives the invalidation for local_ttl at most
+    await asyncio.sleep(0.15)
+    await other.get_or_load(SYNCING_SERVICE_ID, "notion", loader)
+    assert len(loader.calls) == 2
@@ -0,0 +1,73 @@
+import json
+import logging
+import queue
+
+import logger as logger_module
+from logger import JsonFormatter, TenantSamplingFilter, get_logger
+
+
+def make_record(msg: str = "message", line: int = 1, **extra) -> logging.LogRecord:
+    record = logging.LogRecord("test", logging.INFO, "path.py", line, msg, None, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_get_logger_attaches_handler_once():
+    get_logger("first")
+    get_logger("second")
+
+    handlers = [
+        handler
+        for handler in logging.getLogger().handlers
+        if isinstance(handler, logger_module._DroppingQueueHandler)
+    ]
+    assert len(handlers) == 1
+    assert not get_logger("first").handlers
+
+
+def test_sampling_limits_records_per_tenant_and_call_site():
+    sampling_filter = TenantSamplingFilter(limit=2, window=60)
+
+    passed = [
+        sampling_filter.filter(make_record(syncing_service_id="tenant"))
+        for _ in range(5)
+    ]
+
+    assert passed == [True, True, False, False, False]
+    assert sampling_filter.filter(make_record(syncing_service_id="other"))
+    assert sampling_filter.filter(make_record(line=2, syncing_service_id="tenant"))
+    assert sampling_filter.filter(make_record())
+
+
+def test_sampling_reports_dropped_records_in_next_window(mocker):
+    now = mocker.patch("logger.time.monotonic", return_value=0)
+    sampling_filter = TenantSamplingFilter(limit=1, window=60)
+    for _ in range(4):
+        sampling_filter.filter(make_record(syncing_service_id="tenant"))
+
+    now.return_value = 61
+    record = make_record(syncing_service_id="tenant")
+
+    assert sampling_filter.filter(record)
+    assert record.getMessage() == "message (3 similar messages dropped)"
+
+
+def test_json_formatter_includes_extra():
+    record = make_record("sync failed", syncing_service_id="tenant")
+
+    data = json.loads(JsonFormatter().format(record))
+
+    assert data["message"] == "sync failed"
+    assert data["level"] == "INFO"
+    assert data["syncing_service_id"] == "tenant"
+
+
+def test_full_queue_drops_records_instead_of_blocking():
+    log_queue = queue.Queue(maxsize=1)
+    handler = logger_module._DroppingQueueHandler(log_queue)
+
+    handler.emit(make_record("first"))
+    handler.emit(make_record("second"))
+
+    assert log_queue.qsize() == 1
+    assert log_queue.get_nowait().getMessage() == "first"
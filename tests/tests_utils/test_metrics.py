@@ -0,0 +1,55 @@
+import aiohttp
+import pytest
+from aiohttp import web
+from prometheus_client import REGISTRY
+
+from utils.metrics import sql_operation, upstream_trace_config
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.parametrize(
+    "statement, operation",
+    [
+        ("SELECT * FROM users", "select"),
+        ("  insert into synced_item VALUES (1)", "insert"),
+        ("UPDATE syncing_service SET ready = true", "update"),
+        ("DELETE FROM users", "delete"),
+        ("BEGIN", "other"),
+        ("", "other"),
+    ],
+)
+def test_sql_operation(statement, operation):
+    assert sql_operation(statement) == operation
+
+
+async def test_upstream_trace_config_counts_by_host_and_status(aiohttp_client):
+    app = web.Application()
+    app.router.add_get("/ok", lambda request: web.json_response({}))
+    app.router.add_get("/missing", lambda request: web.json_response({}, status=404))
+    client = await aiohttp_client(app)
+    host = client.make_url("").host
+
+    ok_before = sample(
+        "upstream_requests_total", host=host, method="GET", status="200"
+    )
+    missing_before = sample(
+        "upstream_requests_total", host=host, method="GET", status="404"
+    )
+
+    async with aiohttp.ClientSession(trace_configs=[upstream_trace_config()]) as session:
+        for path in ("/ok", "/ok", "/missing"):
+            async with session.get(client.make_url(path)) as response:
+                await response.read()
+
+    assert (
+        sample("upstream_requests_total", host=host, method="GET", status="200")
+        == ok_before + 2
+    )
+    assert (
+        sample("upstream_requests_total", host=host, method="GET", status="404")
+        == missing_before + 1
+    )
+    assert sample("upstream_request_duration_seconds_count", host=host) >= 3
@@ -0,0 +1,43 @@
+import pytest
+
+from config import REDIS_URL
+from redis_client import RedisClient
+
+KEYS = ["test_redis_client_1", "test_redis_client_2"]
+
+
+@pytest.fixture
+async def redis_client():
+    redis_client = RedisClient(REDIS_URL)
+    yield redis_client
+    await redis_client.delete(*KEYS)
+
+
+async def test_set_get_delete(redis_client):
+    await redis_client.set(KEYS[0], "value")
+    assert await redis_client.get(KEYS[0]) == "value"
+
+    await redis_client.delete(KEYS[0])
+    assert await redis_client.get(KEYS[0]) is None
+
+
+async def test_get_many(redis_client):
+    await redis_client.set(KEYS[0], "value_1")
+    await redis_client.set(KEYS[1], "value_2")
+
+    result = await redis_client.get_many(KEYS + ["test_redis_client_missing"])
+    assert result == ["value_1", "value_2", None]
+
+
+async def test_clients_share_pool(redis_client):
+    other_client = RedisClient(REDIS_URL)
+    assert other_client.get_client() is redis_client.get_client()
+
+
+async def test_ping(redis_client):
+    assert await redis_client.ping() is True
+
+
+async def test_ping_unavailable():
+    redis_client = RedisClient("redis://localhost:1/0")
+    assert await redis_client.ping() is False
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+async def test_concurrent_calls_share_result():
+    single_flight = SingleFlight()
+    calls = 0
+
+    async def refresh():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "token"
+
+    results = await asyncio.gather(
+        *(single_flight.do("key", refresh) for _ in range(5))
+    )
+
+    assert results == ["token"] * 5
+    assert calls == 1
+    assert not single_flight.in_flight("key")
+
+
+async def test_sequential_calls_are_not_shared():
+    single_flight = SingleFlight()
+    calls = 0
+
+    async def refresh():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await single_flight.do("key", refresh) == 1
+    assert await single_flight.do("key", refresh) == 2
+
+
+async def test_exception_is_shared():
+    single_flight = SingleFlight()
+
+    async def refresh():
+        await asyncio.sleep(0.01)
+        raise ValueError("refresh failed")
+
+    results = await asyncio.gather(
+        single_flight.do("key", refresh),
+        single_flight.do("key", refresh),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+    with pytest.raises(ValueError):
+        await single_flight.do("key", refresh)
+
+
+async def test_cancel_stops_call_for_all_callers():
+    single_flight = SingleFlight()
+    callers = [
+        asyncio.create_task(single_flight.do("key", asyncio.sleep, 10))
+        for _ in range(2)
+    ]
+    await asyncio.sleep(0)
+
+    assert single_flight.cancel("key")
+    results = await asyncio.gather(*callers, return_exceptions=True)
+
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)
+    assert not single_flight.in_flight("key")
+    assert not single_flight.cancel("key")
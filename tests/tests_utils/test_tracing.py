@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+import pytest
+
+from utils.tracing import FileSpanExporter, InMemorySpanExporter, Tracer, traced
+
+SYNCING_SERVICE_ID = "syncing_service_id"
+
+
+@pytest.fixture
+def exporter():
+    return InMemorySpanExporter()
+
+
+@pytest.fixture
+def tracer(exporter, mocker):
+    tracer = Tracer(exporter=exporter, sample_rate=1.0)
+    mocker.patch("utils.tracing.tracer", tracer)
+    return tracer
+
+
+async def test_spans_are_nested(tracer, exporter):
+    with tracer.span("sync", syncing_service_id=SYNCING_SERVICE_ID) as root:
+        with tracer.span("sync.fetch") as child:
+            pass
+
+    assert [span.name for span in exporter.spans] == ["sync.fetch", "sync"]
+    assert child.trace_id == root.trace_id
+    assert child.parent_id == root.span_id
+    assert root.parent_id is None
+    assert child.attributes["syncing_service_id"] == SYNCING_SERVICE_ID
+    assert root.duration >= child.duration
+
+
+async def test_gathered_tasks_are_children(tracer, exporter):
+    async def write(number):
+        with tracer.span("write", number=number):
+            await asyncio.sleep(0)
+
+    with tracer.span("sync.apply") as apply:
+        await asyncio.gather(write(1), write(2))
+
+    writes = exporter.by_name("write")
+    assert len(writes) == 2
+    assert {span.parent_id for span in writes} == {apply.span_id}
+
+
+async def test_error_is_recorded(tracer, exporter):
+    with pytest.raises(ValueError):
+        with tracer.span("sync"):
+            raise ValueError("boom")
+
+    assert exporter.spans[0].error == "ValueError('boom')"
+
+
+async def test_not_sampled_trace_is_not_exported(tracer, exporter):
+    tracer.sample_rate = 0
+
+    with tracer.span("sync"):
+        with tracer.span("sync.fetch"):
+            pass
+
+    assert exporter.spans == []
+
+
+async def test_no_exporter_disables_tracing(tracer, exporter):
+    tracer.set_exporter(None)
+
+    with tracer.span("sync") as span:
+        pass
+
+    assert not span.sampled
+    assert exporter.spans == []
+
+
+async def test_traced_tags_syncing_service_id(tracer, exporter):
+    class Service:
+        _syncing_service_id = SYNCING_SERVICE_ID
+
+        @traced("service.get_all_items")
+        async def get_all_items(self):
+            return []
+
+    assert await Service().get_all_items() == []
+    assert exporter.spans[0].name == "service.get_all_items"
+    assert exporter.spans[0].attributes == {"syncing_service_id": SYNCING_SERVICE_ID}
+
+
+def test_file_exporter(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(exporter=FileSpanExporter(str(path)))
+
+    with tracer.span("sync", syncing_service_id=SYNCING_SERVICE_ID):
+        pass
+    tracer.set_exporter(None)
+
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    assert spans[0]["name"] == "sync"
+    assert spans[0]["attributes"] == {"syncing_service_id": SYNCING_SERVICE_ID}
+    assert spans[0]["duration"] >= 0
@@ -1,3 +1,5 @@
+import json
+
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from models.models import GoogleTasksData, NotionData, SyncingService
@@ -52,3 +54,23 @@ async def google_tasks_data(
         )
     await google_tasks_data.save(db)
     return google_tasks_data
+
+
+def google_batch_response(
+    parts: list[tuple[int, int, dict]], boundary: str = "batch_boundary"
+) -> bytes:
+    """Body of a Google batch response from (part index, status, body)."""
+    lines = []
+    for index, status, body in parts:
+        lines += [
+            f"--{boundary}",
+            "Content-Type: application/http",
+            f"Content-ID: <response-item-{index}>",
+            "",
+            f"HTTP/1.1 {status} Status",
+            "Content-Type: application/json; charset=UTF-8",
+            "",
+            json.dumps(body),
+        ]
+    lines += [f"--{boundary}--", ""]
+    return "\r\n".join(lines).encode()
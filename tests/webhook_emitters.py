@@ -0,0 +1,53 @@
+"""
+Local stand-ins for upstream push events.
+They produce requests shaped and signed like the real ones, so webhook
+routes can be exercised without Notion or Google.
+"""
+
+import datetime
+import json
+from itertools import count
+from uuid import uuid4
+
+from utils.webhook_utils import google_channel_token, notion_signature
+
+_message_numbers = count(1)
+
+
+def notion_event(
+    database_id: str,
+    verification_token: str,
+    event_type: str = "page.properties_updated",
+    page_id: str | None = None,
+    event_id: str | None = None,
+) -> tuple[bytes, dict]:
+    """Return body and headers of a Notion integration webhook delivery."""
+    event = {
+        "id": event_id or str(uuid4()),
+        "timestamp": datetime.datetime.now(datetime.UTC).isoformat(),
+        "type": event_type,
+        "entity": {"id": page_id or str(uuid4()), "type": "page"},
+        "data": {"parent": {"id": database_id, "type": "database"}},
+    }
+    body = json.dumps(event).encode("utf-8")
+    headers = {
+        "Content-Type": "application/json",
+        "X-Notion-Signature": notion_signature(body, verification_token),
+    }
+    return body, headers
+
+
+def google_push_notification(
+    syncing_service_id: str,
+    resource_state: str = "exists",
+    message_number: int | None = None,
+    token: str | None = None,
+) -> dict:
+    """Return headers of a Google push-style channel notification."""
+    return {
+        "X-Goog-Channel-ID": syncing_service_id,
+        "X-Goog-Channel-Token": token or google_channel_token(syncing_service_id),
+        "X-Goog-Resource-State": resource_state,
+        "X-Goog-Message-Number": str(message_number or next(_message_numbers)),
+        "X-Goog-Resource-ID": str(uuid4()),
+    }
@@ -0,0 +1,32 @@
+import hashlib
+from typing import Optional
+
+from cachetools import TTLCache
+
+from config import AUTH_CACHE_SIZE, AUTH_CACHE_TTL
+from schemas.user import User
+
+# token digest -> authenticated user
+_principals = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def get_principal(token: str) -> Optional[User]:
+    return _principals.get(token_digest(token))
+
+
+def set_principal(token: str, user: User) -> None:
+    _principals[token_digest(token)] = user
+
+
+def invalidate_user(user_id: str) -> None:
+    digests = [digest for digest, user in _principals.items() if user.id == user_id]
+    for digest in digests:
+        _principals.pop(digest, None)
+
+
+def clear() -> None:
+    _principals.clear()
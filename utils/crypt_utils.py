@@ -1,13 +1,40 @@
+import asyncio
 import base64
 import hashlib
+import hmac
 import json
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 
 from fastapi.security import OAuth2PasswordBearer
 
-from config import ENCODING_ITERATIONS, SALT
+from config import (
+    ENCODING_ITERATIONS,
+    PASSWORD_HASH_MAX_CONCURRENCY,
+    PASSWORD_HASH_WORKERS,
+    SALT,
+)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# PBKDF2 releases the GIL, so hashing in threads keeps the event loop free.
+# The semaphore caps how many hashes are in flight during login bursts.
+_password_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash",
+)
+_password_semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def _get_password_semaphore() -> asyncio.Semaphore:
+    # asyncio primitives are bound to a single loop, keep one per loop
+    loop = asyncio.get_running_loop()
+    semaphore = _password_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(PASSWORD_HASH_MAX_CONCURRENCY)
+        _password_semaphores[loop] = semaphore
+    return semaphore
+
 
 def encode(data: str | dict) -> str:
     if isinstance(data, dict):
@@ -37,22 +64,33 @@ def decode_dict(data: str) -> dict:
     return json.loads(decoded_data)
 
 
-def create_password(password: str) -> str:
-    hashed_password = hashlib.pbkdf2_hmac(
+def _hash_password(password: str) -> str:
+    return hashlib.pbkdf2_hmac(
         "sha256",
         password.encode("utf-8"),
         SALT,
-        ENCODING_ITERATIONS,
-    )
-    return hashed_password.hex()
+        int(ENCODING_ITERATIONS),
+    ).hex()
+
+
+def create_password(password: str) -> str:
+    return _hash_password(password)
 
 
 def verify_password(password: str, hashed_password: str) -> bool:
-    new_hashed_password = hashlib.pbkdf2_hmac(
-        "sha256",
-        password.encode("utf-8"),
-        SALT,
-        ENCODING_ITERATIONS,
-    ).hex()
+    new_hashed_password = _hash_password(password)
+    return hmac.compare_digest(new_hashed_password, hashed_password or "")
+
+
+async def _run_hashing(func, *args):
+    async with _get_password_semaphore():
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_password_executor, func, *args)
+
+
+async def create_password_async(password: str) -> str:
+    return await _run_hashing(create_password, password)
+
 
-    return new_hashed_password == hashed_password
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    return await _run_hashing(verify_password, password, hashed_password)
@@ -10,6 +10,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from config import ACCESS_TOKEN_EXPIRE_MINUTES, ALGORITHM, SECRET_KEY
 from models.models import User as UserDB
 from models.models import get_db
+from schemas.user import User
+from utils.auth_cache import get_principal, set_principal
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -27,7 +29,13 @@ def generate_access_token(user: UserDB) -> str:
 async def validate_token(
     token: str = Security(oauth2_scheme),
     db: AsyncSession = Depends(get_db),
-) -> Optional[UserDB]:
+) -> Optional[User]:
+    """
+    Return the user owning the token.
+    Users are cached by token digest for a short time, so most requests
+    do not query the database. FastAPI caches `get_db` per request, so the
+    route gets the same session when it needs one.
+    """
     try:
         payload = decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email = payload.get("sub")
@@ -36,8 +44,15 @@ async def validate_token(
         expiration_datetime = datetime.datetime.fromtimestamp(expiration)
         current_datetime = datetime.datetime.now(expiration_datetime.tzinfo)
         if email and expiration and current_datetime < expiration_datetime:
+            user = get_principal(token)
+            if user:
+                return user
+
             user = await UserDB.get_by_email(email, db)
             if user:
+                # the cache holds no password hashes
+                user = User(id=user.id, email=user.email)
+                set_principal(token, user)
                 return user
     except ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
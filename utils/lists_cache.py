@@ -0,0 +1,139 @@
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Optional
+
+import redis
+from cachetools import TTLCache
+
+from config import (
+    AVAILABLE_LISTS_CACHE_SIZE,
+    AVAILABLE_LISTS_CACHE_TTL,
+    AVAILABLE_LISTS_LOCAL_TTL,
+    AVAILABLE_LISTS_STALE_TTL,
+    REDIS_URL,
+)
+from logger import get_logger
+from redis_client import RedisClient
+from utils.single_flight import SingleFlight
+
+logger = get_logger(__name__)
+
+SERVICE_NAMES = ("notion", "google_tasks")
+
+
+class AvailableListsCache:
+    """
+    Per syncing service cache of lists available in Notion and Google Tasks.
+
+    Entries live in an in-process LRU in front of Redis. An entry is fresh
+    for `ttl` seconds, after that it is still served for up to `stale_ttl`
+    seconds while a reload runs in background (stale-while-revalidate).
+    In-process copies expire after `local_ttl` seconds, so an invalidation
+    by another process reaches this one that late at most.
+    """
+
+    KEY_FORMAT = "available_lists:{}:{}"
+
+    def __init__(
+        self,
+        redis_client: RedisClient,
+        ttl: int = AVAILABLE_LISTS_CACHE_TTL,
+        stale_ttl: int = AVAILABLE_LISTS_STALE_TTL,
+        maxsize: int = AVAILABLE_LISTS_CACHE_SIZE,
+        local_ttl: float = AVAILABLE_LISTS_LOCAL_TTL,
+    ) -> None:
+        self._redis = redis_client
+        self._ttl = ttl
+        self._stale_ttl = stale_ttl
+        self._local = TTLCache(maxsize=maxsize, ttl=min(local_ttl, stale_ttl))
+        self._loads = SingleFlight()
+        self._revalidations: set[asyncio.Task] = set()
+        self._generations: dict[str, int] = {}
+
+    async def get_or_load(
+        self,
+        syncing_service_id: str,
+        service_name: str,
+        loader: Callable[[], Awaitable[dict]],
+    ) -> dict:
+        key = self._key(syncing_service_id, service_name)
+        entry = await self._get_entry(key)
+
+        if entry is None:
+            return await self._loads.do(key, self._load, key, loader)
+
+        if entry["fresh_until"] < time.time() and not self._loads.in_flight(key):
+            task = asyncio.create_task(self._loads.do(key, self._load, key, loader))
+            self._revalidations.add(task)
+            task.add_done_callback(self._revalidations.discard)
+
+        return entry["value"]
+
+    async def prefetch(self, syncing_service_id: str) -> None:
+        """Read entries of the service missing in-process in one round trip."""
+        keys = [
+            key
+            for key in (self._key(syncing_service_id, name) for name in SERVICE_NAMES)
+            if key not in self._local
+        ]
+        try:
+            raw_entries = await self._redis.get_many(keys)
+        except redis.RedisError as e:
+            logger.warning(f"Could not read {keys} from redis: {e}")
+            return
+
+        for key, raw_entry in zip(keys, raw_entries):
+            if raw_entry is not None:
+                self._local[key] = json.loads(raw_entry)
+
+    async def invalidate(self, syncing_service_id: str) -> None:
+        keys = [self._key(syncing_service_id, name) for name in SERVICE_NAMES]
+        for key in keys:
+            self._local.pop(key, None)
+            # loads started before invalidation must not store their result
+            self._generations[key] = self._generations.get(key, 0) + 1
+        try:
+            await self._redis.delete(*keys)
+        except redis.RedisError as e:
+            logger.warning(f"Could not invalidate {keys} in redis: {e}")
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[dict]]) -> dict:
+        generation = self._generations.get(key, 0)
+        value = await loader()
+        # empty result means upstream failed or timed out, do not cache it
+        if value and generation == self._generations.get(key, 0):
+            await self._set_entry(key, value)
+        return value
+
+    async def _get_entry(self, key: str) -> Optional[dict]:
+        entry = self._local.get(key)
+        if entry is not None:
+            return entry
+
+        try:
+            raw_entry = await self._redis.get(key)
+        except redis.RedisError as e:
+            logger.warning(f"Could not read {key} from redis: {e}")
+            return None
+
+        if raw_entry is None:
+            return None
+
+        entry = json.loads(raw_entry)
+        self._local[key] = entry
+        return entry
+
+    async def _set_entry(self, key: str, value: dict) -> None:
+        entry = {"value": value, "fresh_until": time.time() + self._ttl}
+        self._local[key] = entry
+        try:
+            await self._redis.set(key, json.dumps(entry), ex=self._stale_ttl)
+        except redis.RedisError as e:
+            logger.warning(f"Could not write {key} to redis: {e}")
+
+    def _key(self, syncing_service_id: str, service_name: str) -> str:
+        return self.KEY_FORMAT.format(service_name, syncing_service_id)
+
+
+available_lists_cache = AvailableListsCache(RedisClient(REDIS_URL))
@@ -0,0 +1,199 @@
+"""
+Prometheus metrics of sync and API hot paths, exposed on /metrics.
+
+Labels only take values from small fixed sets (stage, service, upstream
+host, HTTP status, route template), never tenant or item ids, so the
+number of series does not grow with the number of syncing services.
+"""
+
+import time
+from types import SimpleNamespace
+from typing import Callable, Optional
+
+import aiohttp
+from fastapi import Request
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SQL_OPERATIONS = ("select", "insert", "update", "delete")
+
+SYNC_STAGE_DURATION = Histogram(
+    "sync_stage_duration_seconds",
+    "Duration of sync cycle stages",
+    ["stage"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+SYNC_CYCLE_DURATION = Histogram(
+    "sync_cycle_duration_seconds",
+    "Duration of whole sync cycles, from fetch until all writes finished",
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+SYNC_ITEMS = Counter(
+    "sync_items_total",
+    "Items written by sync",
+    ["service", "operation", "result"],
+)
+SYNC_CYCLES_COALESCED = Counter(
+    "sync_cycles_coalesced_total",
+    "Cycles requested while the service's previous cycle was running, "
+    "joined instead of started",
+)
+SYNC_BUDGET_EXHAUSTED = Counter(
+    "sync_budget_exhausted_total",
+    "Cycles that ran out of budget and left work for the next one",
+    ["stage"],
+)
+SYNC_DEAD_LETTERS = Counter(
+    "sync_dead_letters_total",
+    "Planned writes moved to the dead-letter store after their last attempt",
+    ["target", "operation"],
+)
+SYNC_QUEUED_CYCLES = Gauge(
+    "sync_queued_cycles", "Cycles waiting for a worker slot of the fair queue"
+)
+SYNC_QUEUE_WAIT = Histogram(
+    "sync_queue_wait_seconds",
+    "Time cycles waited for a worker slot of the fair queue",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+SYNC_FAILURES = Counter(
+    "sync_failures_total",
+    "Failed sync cycles by failure kind",
+    ["kind"],
+)
+SYNC_QUARANTINED = Counter(
+    "sync_quarantined_total",
+    "Syncing services quarantined after a permanent failure",
+    ["kind"],
+)
+ACTIVE_SYNC_TASKS = Gauge("sync_active_tasks", "Running sync loops")
+SYNC_STALLED_LOOPS = Gauge(
+    "sync_stalled_loops", "Sync loops with an overdue heartbeat, last check"
+)
+SYNC_LOOP_RESTARTS = Counter(
+    "sync_loop_restarts_total",
+    "Sync loops restarted by the watchdog",
+    ["reason"],
+)
+SCHEDULER_LAG = Gauge(
+    "sync_scheduler_lag_seconds",
+    "Delay between the moment a cycle was due and its start, worker slot "
+    "wait included, last observed",
+)
+# sync pipeline stages, updated when /metrics is scraped
+SYNC_PIPELINE_PENDING = Gauge(
+    "sync_pipeline_pending_messages",
+    "Stage messages read by a consumer but not acked yet",
+    ["stage"],
+)
+SYNC_PIPELINE_LAG = Gauge(
+    "sync_pipeline_lag_messages",
+    "Stage messages not read by any consumer yet",
+    ["stage"],
+)
+SYNC_PIPELINE_IN_PROGRESS = Gauge(
+    "sync_pipeline_in_progress_messages",
+    "Stage messages handled by this process right now",
+    ["stage"],
+)
+SYNC_PIPELINE_DROPPED = Gauge(
+    "sync_pipeline_dropped_messages",
+    "Stage messages dropped by this process after too many deliveries",
+    ["stage"],
+)
+
+UPSTREAM_REQUESTS = Counter(
+    "upstream_requests_total",
+    "Requests to upstream APIs",
+    ["host", "method", "status"],
+)
+UPSTREAM_REQUEST_DURATION = Histogram(
+    "upstream_request_duration_seconds",
+    "Duration of requests to upstream APIs",
+    ["host"],
+)
+TOKEN_REFRESHES = Counter(
+    "token_refreshes_total",
+    "Access token refresh requests",
+    ["service", "result"],
+)
+
+SQL_STATEMENTS = Counter(
+    "sql_statements_total",
+    "SQL statements executed",
+    ["operation"],
+)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Duration of API requests",
+    ["method", "route", "status"],
+)
+
+
+def upstream_trace_config(
+    on_request: Optional[Callable[[], None]] = None,
+) -> aiohttp.TraceConfig:
+    """
+    Trace config counting requests of a ClientSession by host and status.
+    `on_request` is called after every request, successful or not.
+    """
+
+    async def on_request_start(session, context, params) -> None:
+        context.started = time.perf_counter()
+
+    async def on_request_end(session, context, params) -> None:
+        _observe_upstream_request(context, params, str(params.response.status))
+        if on_request is not None:
+            on_request()
+
+    async def on_request_exception(session, context, params) -> None:
+        _observe_upstream_request(context, params, "error")
+        if on_request is not None:
+            on_request()
+
+    trace_config = aiohttp.TraceConfig(trace_config_ctx_factory=SimpleNamespace)
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
+
+
+def _observe_upstream_request(context, params, status: str) -> None:
+    host = params.url.host or "unknown"
+    UPSTREAM_REQUESTS.labels(host=host, method=params.method, status=status).inc()
+    started = getattr(context, "started", None)
+    if started is not None:
+        UPSTREAM_REQUEST_DURATION.labels(host=host).observe(
+            time.perf_counter() - started
+        )
+
+
+def sql_operation(statement: str) -> str:
+    operation = statement.lstrip().split(None, 1)[0].lower() if statement else ""
+    return operation if operation in SQL_OPERATIONS else "other"
+
+
+def count_sql_statements(engine: Engine) -> None:
+    def before_cursor_execute(conn, cursor, statement, *args) -> None:
+        SQL_STATEMENTS.labels(operation=sql_operation(statement)).inc()
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+
+
+async def metrics_middleware(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # route template, not the path, path contains ids
+        route = request.scope.get("route")
+        HTTP_REQUEST_DURATION.labels(
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status),
+        ).observe(time.perf_counter() - started)
@@ -14,10 +14,10 @@ redis = RedisClient(REDIS_URL)
 logger = get_logger(__name__)
 
 
-def set_user_to_session(user: User) -> str:
+async def set_user_to_session(user: User) -> str:
     state_key = str(uuid4())
     logger.info(f"Set user {user.email} to session")
-    redis.set(state_key, user.id)
+    await redis.set(state_key, user.id)
     return state_key
 
 
@@ -25,7 +25,7 @@ async def get_user_from_session(
     state: str,
     db: AsyncSession = Depends(get_db),
 ) -> UserDB:
-    user_id = redis.get(state)
+    user_id = await redis.get(state)
     if user_id is None:
         logger.error(f"Invalid state: {state}")
         raise HTTPException("Invalid state")
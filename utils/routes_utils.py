@@ -6,6 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from models.models import GoogleTasksData, NotionData, SyncingService
 from schemas.services_auth_data import GoogleAuthData, NotionAuthData
+from utils.lists_cache import available_lists_cache
 
 
 def get_dataclass_type(args):
@@ -61,4 +62,12 @@ async def create_or_update_syncing_service(
         )
         await notion_data.save(db)
 
+    # new credentials may see different lists
+    await available_lists_cache.invalidate(service.id)
+
+    # reconnecting is what retries a quarantined service
+    if service.quarantined:
+        await SyncingService.update(user_id, {"quarantine_reason": None}, db)
+        service.quarantine_reason = None
+
     return service
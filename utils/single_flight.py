@@ -0,0 +1,42 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one in-flight call.
+    Every caller gets the result (or the exception) of the first call.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    async def do(
+        self,
+        key: Hashable,
+        func: Callable[..., Awaitable[Any]],
+        *args,
+        **kwargs,
+    ) -> Any:
+        future = self._calls.get(key)
+        if future is None or future.get_loop() is not asyncio.get_running_loop():
+            future = asyncio.ensure_future(func(*args, **kwargs))
+            self._calls[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+
+        # shield so a cancelled caller does not cancel the call for the others
+        return await asyncio.shield(future)
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def cancel(self, key: Hashable) -> bool:
+        """Cancel the in-flight call, for all of its callers."""
+        future = self._calls.get(key)
+        if future is None:
+            return False
+        return future.cancel()
+
+    def _forget(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
@@ -0,0 +1,257 @@
+"""
+Lightweight tracing of sync cycles.
+
+Spans nest through a context variable, so spans opened in tasks created
+inside a span (gathered writes, SQL statements run by the session) become
+its children. Whether a trace is recorded is decided once at its root span
+with `sample_rate`; children follow the decision. Finished spans go to the
+configured SpanExporter.
+"""
+
+import importlib
+import json
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from functools import wraps
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import config
+from logger import get_logger
+from utils.metrics import sql_operation
+
+logger = get_logger(__name__)
+
+SYNCING_SERVICE_ID = "syncing_service_id"
+# statement text is kept for debugging, parameters are never recorded
+MAX_STATEMENT_LENGTH = 200
+
+
+@dataclass(slots=True)
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start_time: float = field(default_factory=time.time)
+    end_time: Optional[float] = None
+    attributes: dict = field(default_factory=dict)
+    error: Optional[str] = None
+    sampled: bool = True
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.end_time is None:
+            return None
+        return self.end_time - self.start_time
+
+    def set_attribute(self, key: str, value) -> None:
+        if self.sampled:
+            self.attributes[key] = value
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        del data["sampled"]
+        data["duration"] = self.duration
+        return data
+
+
+class SpanExporter(ABC):
+
+    @abstractmethod
+    def export(self, span: Span) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        pass
+
+
+class InMemorySpanExporter(SpanExporter):
+
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def clear(self) -> None:
+        self.spans.clear()
+
+    def by_name(self, name: str) -> list[Span]:
+        return [span for span in self.spans if span.name == name]
+
+
+class FileSpanExporter(SpanExporter):
+    """Append spans as JSON lines, buffered by the file object."""
+
+    def __init__(self, path: str) -> None:
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._file.write(json.dumps(span.to_dict()) + "\n")
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+
+    def __init__(
+        self,
+        exporter: Optional[SpanExporter] = None,
+        sample_rate: float = 1.0,
+    ) -> None:
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    def set_exporter(
+        self, exporter: Optional[SpanExporter], sample_rate: Optional[float] = None
+    ) -> None:
+        if self.exporter is not None and self.exporter is not exporter:
+            self.exporter.shutdown()
+        self.exporter = exporter
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def start_span(self, name: str, **attributes) -> Span:
+        """Start span as child of the current one, without making it current."""
+        parent = _current_span.get()
+        if parent is None:
+            sampled = self.exporter is not None and random.random() < self.sample_rate
+            span = Span(name, trace_id=_new_id(128), span_id="", sampled=sampled)
+        else:
+            span = Span(
+                name,
+                trace_id=parent.trace_id,
+                span_id="",
+                parent_id=parent.span_id,
+                sampled=parent.sampled,
+            )
+            if SYNCING_SERVICE_ID in parent.attributes:
+                span.attributes[SYNCING_SERVICE_ID] = parent.attributes[
+                    SYNCING_SERVICE_ID
+                ]
+
+        if span.sampled:
+            span.span_id = _new_id(64)
+            span.attributes.update(
+                {key: value for key, value in attributes.items() if value is not None}
+            )
+        return span
+
+    def end_span(self, span: Span, error: Optional[BaseException] = None) -> None:
+        if not span.sampled:
+            return
+
+        span.end_time = time.time()
+        if error is not None:
+            span.error = repr(error)
+
+        exporter = self.exporter
+        if exporter is None:
+            return
+        try:
+            exporter.export(span)
+        except Exception as e:
+            logger.error(f"Error while exporting span {span.name}: {e!r}")
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        span = self.start_span(name, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, error=e)
+            raise
+        else:
+            self.end_span(span)
+        finally:
+            _current_span.reset(token)
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def traced(name: str):
+    """
+    Run decorated method of a service in a span tagged with the service's
+    syncing_service_id.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            with tracer.span(
+                name, syncing_service_id=getattr(self, "_syncing_service_id", None)
+            ):
+                return await func(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def trace_sql_statements(engine: Engine) -> None:
+    """Record a span for every statement executed inside a sampled trace."""
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, *args):
+        parent = _current_span.get()
+        if parent is None or not parent.sampled:
+            return
+        context._tracing_span = tracer.start_span(
+            f"sql.{sql_operation(statement)}",
+            statement=statement[:MAX_STATEMENT_LENGTH],
+        )
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, *args):
+        span = getattr(context, "_tracing_span", None)
+        if span is not None:
+            tracer.end_span(span)
+            context._tracing_span = None
+
+    def handle_error(exception_context) -> None:
+        context = exception_context.execution_context
+        span = getattr(context, "_tracing_span", None)
+        if span is not None:
+            tracer.end_span(span, error=exception_context.original_exception)
+            context._tracing_span = None
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+
+
+def create_exporter(name: str) -> Optional[SpanExporter]:
+    if not name:
+        return None
+    if name == "file":
+        return FileSpanExporter(config.TRACING_FILE)
+    if name == "memory":
+        return InMemorySpanExporter()
+
+    module_name, _, class_name = name.rpartition(".")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+tracer = Tracer(
+    exporter=create_exporter(config.TRACING_EXPORTER),
+    sample_rate=config.TRACING_SAMPLE_RATE,
+)
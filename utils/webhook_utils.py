@@ -0,0 +1,33 @@
+import hashlib
+import hmac
+
+import config
+
+
+def notion_signature(body: bytes, verification_token: str) -> str:
+    digest = hmac.new(
+        verification_token.encode("utf-8"), body, hashlib.sha256
+    ).hexdigest()
+    return f"sha256={digest}"
+
+
+def verify_notion_signature(body: bytes, signature: str | None) -> bool:
+    verification_token = config.NOTION_WEBHOOK_VERIFICATION_TOKEN
+    if not signature or not verification_token:
+        return False
+    return hmac.compare_digest(notion_signature(body, verification_token), signature)
+
+
+def google_channel_token(channel_id: str) -> str:
+    """Token to register with a push channel, channel id is syncing service id."""
+    return hmac.new(
+        config.GOOGLE_CHANNEL_SECRET.encode("utf-8"),
+        channel_id.encode("utf-8"),
+        hashlib.sha256,
+    ).hexdigest()
+
+
+def verify_google_channel_token(channel_id: str | None, token: str | None) -> bool:
+    if not channel_id or not token or not config.GOOGLE_CHANNEL_SECRET:
+        return False
+    return hmac.compare_digest(google_channel_token(channel_id), token)